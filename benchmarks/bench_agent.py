@@ -0,0 +1,169 @@
+"""Measure PlanAgent overhead offline, with a MockDriver and stub tools instead of OpenAI.
+
+Usage:
+    python benchmarks/bench_agent.py [--steps N] [--tool-calls N] [--latency S] [--concurrency 1,4,16] [--tool stub|scrape] [--step-check MODE]
+
+Reports:
+    overhead     time per agent iteration spent in the framework rather than in driver/tool calls
+    memory       growth of PlanAgent._memory (messages and traced bytes) per iteration
+    throughput   completed runs per second for N concurrent execute (threads) and aexecute (asyncio) runs
+    round trips  sequential driver round trips per plan step in each step check mode
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
+
+# Run as python benchmarks/<script>.py from any directory: the package sits one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compositeai.agents import AgentResult, CondenseMode, PlanAgent, StepCheckMode
+from compositeai.drivers import MockDriver
+from compositeai.tools import BaseTool, HttpClient, WebScrapeTool
+from compositeai.tracing import CollectingTracer, Span
+
+from fixtures import PlanAgentResponder, StubTool, fixture_server
+
+
+def make_agent(args: argparse.Namespace, tool: BaseTool, steps: int, latency: float, step_check: StepCheckMode = None) -> PlanAgent:
+    tool_args = {"url": f"{args.base_url}/page?paragraphs=100"} if args.tool == "scrape" else {"query": "revenue"}
+    driver = MockDriver(responder=PlanAgentResponder(steps, args.tool_calls, tool.name, tool_args), latency=latency)
+    return PlanAgent(
+        driver=driver,
+        name="bench",
+        description="You are a benchmark agent.",
+        tools=[tool],
+        max_iterations=10 * steps + 10,
+        max_concurrency=max(1, args.tool_calls),
+        condense_mode=CondenseMode(args.condense),
+        step_check_mode=step_check or StepCheckMode(args.step_check),
+    )
+
+
+def bench_overhead(args: argparse.Namespace, tool: BaseTool) -> None:
+    per_iteration = []
+    outside_calls = []
+    for _ in range(args.runs):
+        agent = make_agent(args, tool, args.steps, latency=0.0)
+        start = time.perf_counter()
+        execution = agent.execute("Benchmark task")
+        elapsed = time.perf_counter() - start
+        iterations = len(execution.steps) + 1
+        per_iteration.append(elapsed / iterations)
+        outside_calls.append(max(0.0, elapsed - execution.usage.wall_seconds) / iterations)
+    print("overhead")
+    print(f"  per iteration           {statistics.median(per_iteration) * 1e6:10.1f} us (median of {args.runs} runs)")
+    print(f"  outside driver/tools    {statistics.median(outside_calls) * 1e6:10.1f} us")
+
+
+def bench_memory(args: argparse.Namespace, tool: BaseTool) -> None:
+    steps = args.memory_steps
+    agent = make_agent(args, tool, steps, latency=0.0)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    samples = []
+    for output in agent.execute("Benchmark task", stream=True):
+        samples.append((len(agent._memory), tracemalloc.get_traced_memory()[0] - baseline))
+        if isinstance(output, AgentResult):
+            break
+    tracemalloc.stop()
+    messages, traced = samples[-1]
+    print("memory")
+    print(f"  iterations              {len(samples):10d}")
+    print(f"  messages in memory      {messages:10d}")
+    print(f"  traced growth           {traced / 1024:10.1f} KiB ({traced / len(samples) / 1024:.2f} KiB per iteration)")
+
+
+def bench_throughput(args: argparse.Namespace, tool: BaseTool) -> None:
+    print(f"throughput (driver latency {args.latency * 1000:.0f} ms)")
+    for concurrency in args.concurrency:
+        agents = [make_agent(args, tool, args.steps, args.latency) for _ in range(concurrency)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(lambda agent: agent.execute("Benchmark task"), agents))
+        threaded = time.perf_counter() - start
+
+        agents = [make_agent(args, tool, args.steps, args.latency) for _ in range(concurrency)]
+        async def _run_all() -> None:
+            await asyncio.gather(*(agent.aexecute("Benchmark task") for agent in agents))
+        start = time.perf_counter()
+        asyncio.run(_run_all())
+        asynchronous = time.perf_counter() - start
+        print(f"  {concurrency:4d} runs    threads {concurrency / threaded:8.1f} runs/s    asyncio {concurrency / asynchronous:8.1f} runs/s")
+
+
+def round_trips(spans: List[Span], latency: float) -> int:
+    # Driver calls starting within half a call of the first call of a round trip ran alongside it
+    starts = sorted(span.start_time for span in spans if span.kind == "generate")
+    trips = 0
+    trip_start = None
+    for start in starts:
+        if trip_start is None or start - trip_start > latency / 2:
+            trips += 1
+            trip_start = start
+    return trips
+
+
+def bench_round_trips(args: argparse.Namespace, tool: BaseTool) -> None:
+    latency = max(args.latency, 0.01)
+    print(f"round trips ({args.steps} plan steps, driver latency {latency * 1000:.0f} ms)")
+    for mode in StepCheckMode:
+        tracer = CollectingTracer()
+        agent = make_agent(args, tool, args.steps, latency, step_check=mode)
+        agent.tracer = tracer
+        start = time.perf_counter()
+        agent.execute("Benchmark task")
+        elapsed = time.perf_counter() - start
+        spans = tracer.spans
+        trips = round_trips(spans, latency)
+        calls = sum(1 for span in spans if span.kind == "generate")
+        print(f"  {mode.value:12s} {trips / args.steps:6.2f} per step    {trips:4d} round trips    {calls:4d} driver calls    {elapsed:6.2f} s")
+
+
+@contextlib.contextmanager
+def make_tool(args: argparse.Namespace) -> Iterator[BaseTool]:
+    if args.tool == "scrape":
+        with fixture_server() as base_url:
+            args.base_url = base_url
+            http_client = HttpClient()
+            yield WebScrapeTool(http_client=http_client)
+            http_client.close()
+    else:
+        args.base_url = None
+        yield StubTool(latency=args.tool_latency, result_chars=args.result_chars)
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=3, help="Plan steps per run")
+    parser.add_argument("--tool-calls", type=int, default=2, help="Tool calls per action")
+    parser.add_argument("--tool", choices=["stub", "scrape"], default="stub", help="Stub tool, or WebScrapeTool against a local HTTP server")
+    parser.add_argument("--tool-latency", type=float, default=0.0, help="Seconds each stub tool call takes")
+    parser.add_argument("--result-chars", type=int, default=2000, help="Length of stub tool results")
+    parser.add_argument("--condense", choices=[mode.value for mode in CondenseMode], default=CondenseMode.LLM.value)
+    parser.add_argument("--step-check", choices=[mode.value for mode in StepCheckMode], default=StepCheckMode.SEPARATE.value, help="Step check mode for the overhead, memory and throughput benchmarks")
+    parser.add_argument("--runs", type=int, default=20, help="Runs for the overhead benchmark")
+    parser.add_argument("--memory-steps", type=int, default=200, help="Plan steps for the memory benchmark")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds each driver call takes in the throughput benchmark")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16], help="Comma-separated numbers of concurrent runs")
+    args = parser.parse_args()
+
+    with make_tool(args) as tool:
+        bench_overhead(args, tool)
+        bench_memory(args, tool)
+        bench_throughput(args, tool)
+        bench_round_trips(args, tool)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
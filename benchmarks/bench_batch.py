@@ -0,0 +1,54 @@
+"""Compare OpenAIDriver with OpenAIBatchDriver for a bulk execute_many job, against a local fake OpenAI API.
+
+Usage:
+    python benchmarks/bench_batch.py [--tasks N] [--concurrency N] [--latency S] [--batch-latency S]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Run as python benchmarks/<script>.py from any directory: the package sits one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_openai import fake_openai_server
+from fixtures import StubTool
+
+
+def run(driver, args: argparse.Namespace) -> float:
+    from compositeai.agents import CondenseMode, PlanAgent
+    agent = PlanAgent(driver=driver, description="You are a research agent.", tools=[StubTool()], condense_mode=CondenseMode.LOCAL)
+    start = time.perf_counter()
+    results = list(agent.execute_many((f"Research company {index}" for index in range(args.tasks)), concurrency=args.concurrency))
+    elapsed = time.perf_counter() - start
+    failed = [result for result in results if result.error]
+    if failed:
+        raise RuntimeError(f"{len(failed)} runs failed, e.g. {failed[0].error}")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=50, help="Runs in flight, which is also the largest possible batch")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per chat completion")
+    parser.add_argument("--batch-latency", type=float, default=1.0, help="Seconds for a batch to complete")
+    args = parser.parse_args()
+
+    with fake_openai_server(latency=args.latency, batch_latency=args.batch_latency) as server:
+        os.environ["OPENAI_BASE_URL"] = server["base_url"]
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        from compositeai.drivers import OpenAIBatchDriver, OpenAIDriver
+
+        elapsed = run(OpenAIDriver(model="gpt-4o-mini", seed=0), args)
+        requests = len(server["requests"])
+        print(f"{'direct':<8}{elapsed:8.2f} s  {requests:6d} HTTP requests")
+
+        server["requests"].clear()
+        driver = OpenAIBatchDriver(model="gpt-4o-mini", seed=0, max_wait=0.2, poll_interval=0.2)
+        elapsed = run(driver, args)
+        print(f"{'batch':<8}{elapsed:8.2f} s  {len(server['requests']):6d} HTTP requests  {driver.stats.batches} batches of {driver.stats.requests / max(driver.stats.batches, 1):.1f} requests")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""Compare HTML-to-text extraction throughput of the installed parser backends.
+
+Usage:
+    python benchmarks/bench_html_extraction.py [CORPUS_DIR] [--repeat N]
+
+CORPUS_DIR is a directory of saved .html files; without it a synthetic corpus of
+article-like pages of different sizes is generated in memory.
+"""
+import argparse
+import os
+import pathlib
+import random
+import sys
+import time
+from typing import List
+
+# Run as python benchmarks/<script>.py from any directory: the package sits one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compositeai.tools.html_text import available_backends, html_to_text
+
+from fixtures import synthetic_page
+
+
+def load_corpus(directory: pathlib.Path) -> List[bytes]:
+    return [path.read_bytes() for path in sorted(directory.glob("**/*.htm*"))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="?", type=pathlib.Path, help="Directory of .html files")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus per backend")
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        rng = random.Random(0)
+        corpus = [synthetic_page(rng, paragraphs) for paragraphs in (20, 100, 500, 2000, 10000) for _ in range(4)]
+    total_bytes = sum(len(page) for page in corpus)
+    print(f"{len(corpus)} pages, {total_bytes / 1e6:.1f} MB")
+    print(f"{'backend':<12}{'seconds':>10}{'MB/s':>10}{'pages/s':>10}{'chars':>12}")
+
+    for backend in available_backends():
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            chars = sum(len(html_to_text(page, backend)) for page in corpus)
+            best = min(best, time.perf_counter() - start)
+        print(f"{backend:<12}{best:>10.3f}{total_bytes / 1e6 / best:>10.1f}{len(corpus) / best:>10.1f}{chars:>12}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
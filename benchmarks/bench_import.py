@@ -0,0 +1,115 @@
+"""Measure cold start: import time of the compositeai packages and construction time of drivers, tools and agents.
+
+Usage:
+    python benchmarks/bench_import.py [--runs N] [--check] [--max-import-ms MS]
+
+Reports:
+    imports        median time of each import in a fresh interpreter, and the heavy dependencies it loaded
+    construction   time of the first construction in a fresh interpreter (including imports) and of later ones
+
+With --check, exits with status 1 if an import loads a heavy dependency (openai, requests,
+bs4, dotenv, httpx, numpy) it does not need, or an import needing none takes longer than --max-import-ms.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import List, Tuple
+
+
+HEAVY_MODULES = ["openai", "requests", "bs4", "dotenv", "httpx", "numpy"]
+
+# Import statements and the heavy dependencies they are expected to load
+IMPORTS = [
+    ("import compositeai", []),
+    ("import compositeai.agents", []),
+    ("import compositeai.drivers", []),
+    ("import compositeai.tools", []),
+    ("from compositeai.agents import PlanAgent", []),
+    ("from compositeai.drivers import OpenAIDriver", ["openai", "httpx"]),
+    ("from compositeai.tools import WebScrapeTool", ["requests"]),
+]
+
+CONSTRUCTIONS = {
+    "OpenAIDriver": (
+        "from compositeai.drivers import OpenAIDriver",
+        "OpenAIDriver(model='gpt-4o-mini', seed=0)",
+    ),
+    "GoogleSerperApiTool": (
+        "from compositeai.tools import GoogleSerperApiTool",
+        "GoogleSerperApiTool()",
+    ),
+    "PlanAgent": (
+        "from compositeai.agents import PlanAgent\nfrom compositeai.drivers import MockDriver\nfrom compositeai.tools import TestTool",
+        "PlanAgent(driver=MockDriver(), name='a', description='d', tools=[TestTool()])",
+    ),
+}
+
+_TIMED = """
+import sys, time
+start = time.perf_counter()
+{setup}
+first = time.perf_counter()
+{statement}
+end = time.perf_counter()
+repeat = {repeat}
+for _ in range(repeat):
+    {statement}
+again = time.perf_counter()
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(first - start, end - first, (again - end) / max(repeat, 1), ",".join(heavy))
+"""
+
+
+def run_fresh(setup: str, statement: str = "pass", repeat: int = 0) -> Tuple[float, float, float, List[str]]:
+    """Seconds for setup, the first statement and each repeat, in a new interpreter, and heavy modules loaded"""
+    code = _TIMED.format(setup=setup, statement=statement, repeat=repeat, heavy=HEAVY_MODULES)
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-bench")}
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env).stdout.split()
+    return float(output[0]), float(output[1]), float(output[2]), output[3].split(",") if len(output) > 3 else []
+
+
+def bench_imports(args: argparse.Namespace) -> List[str]:
+    failures = []
+    print(f"imports (median of {args.runs} fresh interpreters)")
+    for statement, expected in IMPORTS:
+        results = [run_fresh(statement) for _ in range(args.runs)]
+        seconds = statistics.median(result[0] for result in results)
+        heavy = results[0][3]
+        print(f"  {statement:45s} {seconds * 1000:8.1f} ms    loads {', '.join(heavy) or '-'}")
+        # Imports must not pull in the dependencies of modules that were not asked for
+        unexpected = sorted(set(heavy) - set(expected))
+        if unexpected:
+            failures.append(f"{statement} loads {', '.join(unexpected)}")
+        if not expected and seconds * 1000 > args.max_import_ms:
+            failures.append(f"{statement} took {seconds * 1000:.1f} ms")
+    return failures
+
+
+def bench_construction(args: argparse.Namespace) -> None:
+    print("construction")
+    for name, (setup, statement) in CONSTRUCTIONS.items():
+        results = [run_fresh(setup, statement, repeat=100) for _ in range(args.runs)]
+        imports = statistics.median(result[0] for result in results)
+        first = statistics.median(result[1] for result in results)
+        again = statistics.median(result[2] for result in results)
+        print(f"  {name:22s} imports {imports * 1000:8.1f} ms    first {first * 1000:8.2f} ms    later {again * 1e6:8.1f} us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if a package import regressed")
+    parser.add_argument("--max-import-ms", type=float, default=250.0, help="Import time budget per package for --check")
+    args = parser.parse_args()
+
+    failures = bench_imports(args)
+    bench_construction(args)
+    if args.check and failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""Measure resident memory per agent session, with message contents kept in memory or in a blob store.
+
+Usage:
+    python benchmarks/bench_memory.py [--sessions N] [--steps N] [--tool-calls N] [--result-chars N] [--shared F]
+
+Each configuration runs in a fresh interpreter: N PlanAgent sessions run concurrently and
+are kept alive (as long-running agents would be), with raw tool results in their history
+(condensing off). Every tool call of a session returns a different page, so the whole of every
+result stays in the history. Reports the growth of the process RSS per session next to the
+tool results it holds, and what the blob store holds.
+--shared is the fraction of sessions fetching the same pages as each other, e.g. popular pages.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+
+_CHILD = """
+import gc, itertools, json, random, sys
+from typing import Any
+from pydantic import PrivateAttr
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, {benchmarks!r})
+from compositeai.agents import CondenseMode, PlanAgent
+from compositeai.blobs import MemoryBlobStore, SQLiteBlobStore
+from compositeai.drivers import MockDriver
+from compositeai.tools import BaseTool
+from fixtures import PlanAgentResponder
+
+args = json.loads({args!r})
+VOCABULARY = [f"word{{index}}" for index in range(5000)]
+
+
+class PageTool(BaseTool):
+    # Returns the next page on every call, so no two results of a session are the same
+    name: str = "fetch_page"
+    description: str = "Fetch a page"
+    _pages: Any = PrivateAttr(default_factory=itertools.count)
+
+    def func(self, query: str) -> str:
+        # Text about as compressible as a real page, the same for the same query and page
+        rng = random.Random(f"{{query}} {{next(self._pages)}}")
+        return " ".join(rng.choices(VOCABULARY, k=args["result_chars"] // 5))[:args["result_chars"]]
+
+
+def rss() -> int:
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * 4096
+
+
+store = {{"none": None, "memory": MemoryBlobStore(), "sqlite": SQLiteBlobStore(path=args["path"]) if args["path"] else None}}[args["store"]]
+rng = random.Random(0)
+
+
+def session(index: int) -> PlanAgent:
+    shared = rng.random() < args["shared"]
+    query = "shared page" if shared else f"page for session {{index}}"
+    tool = PageTool()
+    responder = PlanAgentResponder(args["steps"], args["tool_calls"], tool.name, {{"query": query}})
+    agent = PlanAgent(
+        driver=MockDriver(responder=responder),
+        description="You are a research agent.",
+        tools=[tool],
+        max_iterations=10 * args["steps"] + 10,
+        condense_mode=CondenseMode.OFF,
+        blob_store=store,
+    )
+    for _ in agent.execute(f"Research company {{index}}", stream=True):
+        pass
+    return agent
+
+
+gc.collect()
+before = rss()
+with ThreadPoolExecutor(max_workers=16) as executor:
+    agents = list(executor.map(session, range(args["sessions"])))
+gc.collect()
+after = rss()
+print(json.dumps({{
+    "rss_per_session": (after - before) / args["sessions"],
+    "messages": sum(len(agent._memory) for agent in agents) / len(agents),
+    "result_bytes": sum(len(message.content) for agent in agents for message in agent._memory if message.role == "tool") / len(agents),
+    "stored_bytes": store.stats.stored_bytes if store is not None else 0,
+    "deduplicated": store.stats.deduplicated if store is not None else 0,
+}}))
+"""
+
+
+def measure(args: argparse.Namespace, store: str, path: str) -> dict:
+    child_args = {
+        "store": store,
+        "path": path,
+        "sessions": args.sessions,
+        "steps": args.steps,
+        "tool_calls": args.tool_calls,
+        "result_chars": args.result_chars,
+        "shared": args.shared,
+    }
+    code = _CHILD.format(benchmarks=os.path.dirname(os.path.abspath(__file__)), args=json.dumps(child_args))
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--tool-calls", type=int, default=2)
+    parser.add_argument("--result-chars", type=int, default=20000)
+    parser.add_argument("--shared", type=float, default=0.5, help="Fraction of sessions fetching the same page")
+    args = parser.parse_args()
+    if not os.path.exists("/proc/self/statm"):
+        sys.exit("RSS is read from /proc/self/statm, which needs Linux")
+
+    print(f"memory ({args.sessions} sessions, {args.steps} steps, {args.tool_calls} tool calls of {args.result_chars} chars per step)")
+    with tempfile.TemporaryDirectory() as directory:
+        for store in ("none", "memory", "sqlite"):
+            result = measure(args, store, os.path.join(directory, "blobs.sqlite3"))
+            print(
+                f"  blob store {store:7s}  RSS {result['rss_per_session'] / 1024:9.1f} KiB per session"
+                f"    {result['messages']:.0f} messages with {result['result_bytes'] / 1024:.1f} KiB of tool results per session"
+                f"    stored {result['stored_bytes'] / 1024:9.1f} KiB ({result['deduplicated']} deduplicated)"
+            )
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""Measure how much of PlanAgent's prompts a provider could serve from its prompt cache, against a local fake OpenAI API.
+
+Usage:
+    python benchmarks/bench_prompt_cache.py [--runs N] [--description-chars N] [--step-check MODE]
+
+Reports the prompt and cached tokens of a run, in total and by phase, with and without a
+stable prompt prefix. The fake API counts a prompt's longest prefix shared with any earlier
+prompt (tools, then messages) as cached, in 128 token blocks once 1024 tokens long, like OpenAI.
+"""
+import argparse
+import os
+import sys
+
+# Run as python benchmarks/<script>.py from any directory: the package sits one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_openai import fake_openai_server
+from fixtures import WORDS, StubTool
+
+
+def run(args: argparse.Namespace, stable_prompt_prefix: bool) -> None:
+    from compositeai.agents import CondenseMode, PlanAgent, StepCheckMode
+    from compositeai.drivers import OpenAIDriver
+    from compositeai.tracing import ExecutionUsage
+
+    # A long description, as agents with detailed instructions have, is what makes prefixes worth caching
+    description = "You are a research agent. " + " ".join(WORDS[index % len(WORDS)] for index in range(args.description_chars // 6))
+    usage = ExecutionUsage()
+    for index in range(args.runs):
+        agent = PlanAgent(
+            driver=OpenAIDriver(model="gpt-4o-mini", seed=0),
+            description=description,
+            tools=[StubTool()],
+            condense_mode=CondenseMode.LLM,
+            step_check_mode=StepCheckMode(args.step_check),
+            stable_prompt_prefix=stable_prompt_prefix,
+        )
+        execution = agent.execute(f"Research company {index}")
+        for phase, totals in execution.usage.by_phase.items():
+            phase_totals = usage.by_phase.setdefault(phase, type(totals)())
+            phase_totals.prompt_tokens += totals.prompt_tokens
+            phase_totals.cached_tokens += totals.cached_tokens
+        usage.prompt_tokens += execution.usage.prompt_tokens
+        usage.cached_tokens += execution.usage.cached_tokens
+    print(f"stable_prompt_prefix={stable_prompt_prefix}")
+    print(f"  {'total':10s} prompt {usage.prompt_tokens:8d}    cached {usage.cached_tokens:8d}    hit rate {usage.prompt_cache_hit_rate:6.1%}")
+    for phase, totals in sorted(usage.by_phase.items()):
+        print(f"  {phase:10s} prompt {totals.prompt_tokens:8d}    cached {totals.cached_tokens:8d}    hit rate {totals.prompt_cache_hit_rate:6.1%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="Runs of the same agent, one after the other")
+    parser.add_argument("--description-chars", type=int, default=6000)
+    parser.add_argument("--step-check", default="separate", choices=["separate", "merged", "speculative"])
+    args = parser.parse_args()
+
+    with fake_openai_server() as server:
+        os.environ["OPENAI_BASE_URL"] = server["base_url"]
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        for stable_prompt_prefix in (False, True):
+            server["prompts"].clear()
+            run(args, stable_prompt_prefix)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""Measure retrieval memory offline: vector index latency and PlanAgent prompt size as runs grow.
+
+Usage:
+    python benchmarks/bench_retrieval.py [--entries 1000,10000,50000] [--dimensions 256] [--queries N] [--steps 5,20,60] [--top-k K]
+
+Reports:
+    index     batched embedding and add time per entry, and search latency (median and p99) by index size
+    prompts   largest prompt (messages and characters) sent by a PlanAgent run, with and without retrieval
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from typing import List, Optional, Tuple
+
+# Run as python benchmarks/<script>.py from any directory: the package sits one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compositeai.agents import CondenseMode, HashingEmbedder, PlanAgent, RetrievalMemory, VectorIndex
+from compositeai.agents.retrieval import _numpy
+from compositeai.drivers import DriverInput, DriverResponse, MockDriver
+
+from fixtures import WORDS, PlanAgentResponder, StubTool
+
+
+def bench_index(args: argparse.Namespace) -> None:
+    rng = random.Random(0)
+    embedder = HashingEmbedder(dimensions=args.dimensions)
+    queries = embedder.embed([" ".join(rng.choices(WORDS, k=8)) for _ in range(args.queries)])
+    print(f"index ({args.dimensions} dimensions, {'numpy' if _numpy() is not None else 'pure Python'})")
+    for entries in args.entries:
+        texts = [" ".join(rng.choices(WORDS, k=40)) for _ in range(entries)]
+        index = VectorIndex()
+        start = time.perf_counter()
+        index.add(embedder.embed(texts), list(range(entries)))
+        added = time.perf_counter() - start
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, args.top_k)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"  {entries:7d} entries    add {added / entries * 1e6:6.1f} us/entry    search {statistics.median(latencies) * 1e6:8.1f} us median {p99 * 1e6:8.1f} us p99")
+
+
+def largest_prompt(steps: int, retrieval: Optional[RetrievalMemory]) -> Tuple[int, int]:
+    tool = StubTool()
+    responder = PlanAgentResponder(steps, 2, tool.name, {"query": "revenue"})
+    largest = (0, 0)
+
+    def measure(input: DriverInput) -> DriverResponse:
+        nonlocal largest
+        messages = list(input.memory or []) + input.messages
+        size = (len(messages), sum(len(getattr(message, "content", None) or "") for message in messages))
+        largest = max(largest, size, key=lambda size: size[1])
+        return responder(input)
+
+    agent = PlanAgent(
+        driver=MockDriver(responder=measure),
+        name="bench",
+        description="You are a benchmark agent.",
+        tools=[tool],
+        max_iterations=10 * steps + 10,
+        condense_mode=CondenseMode.LOCAL,
+        retrieval_memory=retrieval,
+    )
+    agent.execute("Benchmark task")
+    return largest
+
+
+def bench_prompts(args: argparse.Namespace) -> None:
+    print(f"prompts (largest prompt of a run, top_k {args.top_k})")
+    for steps in args.steps:
+        full = largest_prompt(steps, None)
+        retrieved = largest_prompt(steps, RetrievalMemory(top_k=args.top_k))
+        print(f"  {steps:4d} steps    full history {full[0]:5d} messages {full[1]:9d} chars    retrieval {retrieved[0]:5d} messages {retrieved[1]:9d} chars")
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=_int_list, default=[1000, 10000, 50000])
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--steps", type=_int_list, default=[5, 20, 60])
+    parser.add_argument("--top-k", type=int, default=6)
+    args = parser.parse_args()
+    bench_index(args)
+    bench_prompts(args)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,228 @@
+"""Local stand-in for the OpenAI API: chat completions, files and batches, answering like a PlanAgent run"""
+import contextlib
+import json
+import os
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+def plan_agent_responder(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Assistant message for a chat completion request made by a PlanAgent"""
+    messages = body["messages"]
+    prompt = messages[-1].get("content") or ""
+    if "ANSWER AGAIN" in prompt:
+        # Asked again after an answer that could not be parsed: answer the original prompt
+        return plan_agent_responder({**body, "messages": messages[:-2]})
+    if "WRITE A BRIEF PLAN" in prompt:
+        return {"role": "assistant", "content": json.dumps({"steps": ["Look it up", "Answer"]})}
+    if "WORK ON THE CURRENT STEP" in prompt:
+        tools = body.get("tools") or []
+        if tools and "Look it up" in prompt and not any(message["role"] == "tool" for message in messages):
+            name = tools[0]["function"]["name"]
+            arguments = {argument: "revenue" for argument in tools[0]["function"]["parameters"]["required"]}
+            tool_call = {"id": f"call_{uuid.uuid4().hex[:8]}", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+            return {"role": "assistant", "content": None, "tool_calls": [tool_call]}
+        return {"role": "assistant", "content": "Worked on the step."}
+    if "DO YOU BELIEVE" in prompt:
+        return {"role": "assistant", "content": json.dumps({"complete": True})}
+    if "EXTRACT" in prompt:
+        return {"role": "assistant", "content": "The relevant info."}
+    if (body.get("response_format") or {}).get("type") == "json_schema":
+        schema = body["response_format"]["json_schema"]["schema"]
+        return {"role": "assistant", "content": json.dumps(example_instance(schema, schema))}
+    return {"role": "assistant", "content": "Final answer."}
+
+
+def example_instance(schema: Dict[str, Any], root: Dict[str, Any]) -> Any:
+    """Value matching a JSON schema, with "final" for every string"""
+    if "$ref" in schema:
+        definition = root
+        for part in schema["$ref"].lstrip("#/").split("/"):
+            definition = definition[part]
+        return example_instance(definition, root)
+    if "anyOf" in schema:
+        return example_instance(schema["anyOf"][0], root)
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: example_instance(property, root) for name, property in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [example_instance(schema.get("items", {}), root)]
+    if kind in ("number", "integer"):
+        return 1
+    if kind == "boolean":
+        return True
+    if kind == "null":
+        return None
+    return "final"
+
+
+def serialized_prompt(body: Dict[str, Any]) -> str:
+    """Tools and then messages, the order in which OpenAI caches a prompt's prefix"""
+    return json.dumps(body.get("tools")) + "".join(json.dumps(item) for item in body["messages"])
+
+
+def cached_prompt_tokens(prompt: str, earlier_prompts: List[str]) -> int:
+    """Tokens OpenAI would serve from its prompt cache: the longest prefix shared with an earlier
+    prompt, in blocks of 128 tokens, once it is at least 1024 tokens long"""
+    shared = max((len(os.path.commonprefix([prompt, earlier])) for earlier in earlier_prompts), default=0) // 4
+    return shared // 128 * 128 if shared >= 1024 else 0
+
+
+def chat_completion(body: Dict[str, Any], message: Dict[str, Any], earlier_prompts: Optional[List[str]] = None) -> Dict[str, Any]:
+    prompt = serialized_prompt(body)
+    prompt_tokens = len(prompt) // 4
+    cached_tokens = cached_prompt_tokens(prompt, earlier_prompts) if earlier_prompts is not None else 0
+    completion_tokens = len(json.dumps(message)) // 4
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body["model"],
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if message.get("tool_calls") else "stop", "logprobs": None}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        },
+    }
+
+
+@contextlib.contextmanager
+def fake_openai_server(
+    responder: Callable[[Dict[str, Any]], Dict[str, Any]] = plan_agent_responder,
+    latency: float = 0.0,
+    batch_latency: float = 0.0,
+) -> Iterator[Dict[str, Any]]:
+    """Serve the fake API on localhost, yielding its state with the base_url to give OpenAI clients.
+
+    Chat completions take latency seconds; a batch completes batch_latency seconds after
+    it is created. state["requests"] lists the (method, path) of every HTTP request.
+    Chat completions report the cached tokens of a prompt cache holding every earlier prompt.
+    Append status codes to state["failures"] to fail the next chat completions with them, in order,
+    including the requests in a batch; append "failed" or "expired" to state["batch_statuses"] to end
+    the next batches that way, an expired batch answering only the first half of its requests.
+    """
+    state: Dict[str, Any] = {"requests": [], "files": {}, "batches": {}, "prompts": [], "failures": [], "batch_statuses": []}
+    lock = threading.Lock()
+
+    def _batch(batch_id: str) -> Dict[str, Any]:
+        # Complete the batch once its time has come, writing one result line per request
+        batch = state["batches"][batch_id]
+        if batch["status"] == "in_progress" and time.time() >= batch["_done_at"]:
+            status = state["batch_statuses"].pop(0) if state["batch_statuses"] else "completed"
+            if status == "failed":
+                # Rejected as a whole, like a batch with an invalid input file: there are no results
+                error = {"code": "invalid_request", "message": "Fake batch failure", "line": None, "param": None}
+                batch.update(status="failed", failed_at=int(time.time()), errors={"object": "list", "data": [error]})
+                return {key: value for key, value in batch.items() if not key.startswith("_")}
+            lines = state["files"][batch["input_file_id"]].splitlines()
+            # An expired batch only gets through the first half of its requests
+            finished = len(lines) // 2 if status == "expired" else len(lines)
+            results, errors = [], []
+            for index, line in enumerate(lines):
+                request = json.loads(line)
+                result = {"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request["custom_id"], "response": None, "error": None}
+                failure = state["failures"].pop(0) if index < finished and state["failures"] else None
+                if index >= finished:
+                    result["error"] = {"code": "batch_expired", "message": "This request could not be executed before the completion window expired."}
+                elif failure is not None:
+                    body = {"error": {"message": f"Fake error {failure}", "type": "fake"}}
+                    result["response"] = {"status_code": failure, "request_id": uuid.uuid4().hex, "body": body}
+                else:
+                    completion = chat_completion(request["body"], responder(request["body"]))
+                    result["response"] = {"status_code": 200, "request_id": uuid.uuid4().hex, "body": completion}
+                (results if result["response"] and result["response"]["status_code"] == 200 else errors).append(json.dumps(result))
+            for key, file_lines in (("output_file_id", results), ("error_file_id", errors)):
+                if file_lines:
+                    batch[key] = f"file-{uuid.uuid4().hex}"
+                    state["files"][batch[key]] = "\n".join(file_lines)
+            batch.update(status=status, **{f"{status}_at": int(time.time())})
+            batch["request_counts"] = {"total": len(lines), "completed": len(results), "failed": len(errors)}
+        return {key: value for key, value in batch.items() if not key.startswith("_")}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def _send(self, status: int, body: Any, content_type: str = "application/json", headers: Optional[Dict[str, str]] = None) -> None:
+            data = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def do_GET(self) -> None:
+            with lock:
+                state["requests"].append(("GET", self.path))
+                parts = self.path.strip("/").split("/")
+                if parts[1:2] == ["batches"] and len(parts) == 3 and parts[2] in state["batches"]:
+                    return self._send(200, _batch(parts[2]))
+                if parts[1:2] == ["files"] and len(parts) == 4 and parts[2] in state["files"]:
+                    return self._send(200, state["files"][parts[2]], "application/octet-stream")
+            self._send(404, {"error": {"message": "Not found"}})
+
+        def do_POST(self) -> None:
+            body = self._body()
+            with lock:
+                state["requests"].append(("POST", self.path))
+            if self.path.endswith("/chat/completions"):
+                request = json.loads(body)
+                if latency:
+                    time.sleep(latency)
+                with lock:
+                    status = state["failures"].pop(0) if state["failures"] else None
+                if status is not None:
+                    # Rate limits say when to come back, like OpenAI's
+                    headers = {"retry-after-ms": "10"} if status == 429 else None
+                    return self._send(status, {"error": {"message": f"Fake error {status}", "type": "fake"}}, headers=headers)
+                with lock:
+                    earlier_prompts = list(state["prompts"])
+                    state["prompts"].append(serialized_prompt(request))
+                return self._send(200, chat_completion(request, responder(request), earlier_prompts))
+            if self.path.endswith("/files"):
+                message = BytesParser(policy=HTTP).parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + body
+                )
+                content = next(part for part in message.iter_parts() if part.get_param("name", header="content-disposition") == "file")
+                file_id = f"file-{uuid.uuid4().hex}"
+                with lock:
+                    state["files"][file_id] = content.get_payload(decode=True).decode("utf-8")
+                return self._send(200, {
+                    "id": file_id, "object": "file", "bytes": len(state["files"][file_id]), "created_at": int(time.time()),
+                    "filename": "batch.jsonl", "purpose": "batch", "status": "processed",
+                })
+            if self.path.endswith("/batches"):
+                request = json.loads(body)
+                batch_id = f"batch_{uuid.uuid4().hex}"
+                with lock:
+                    state["batches"][batch_id] = {
+                        "id": batch_id, "object": "batch", "endpoint": request["endpoint"], "input_file_id": request["input_file_id"],
+                        "completion_window": request["completion_window"], "status": "in_progress", "created_at": int(time.time()),
+                        "output_file_id": None, "error_file_id": None, "_done_at": time.time() + batch_latency,
+                    }
+                    return self._send(200, _batch(batch_id))
+            self._send(404, {"error": {"message": "Not found"}})
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["base_url"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    try:
+        yield state
+    finally:
+        server.shutdown()
+        server.server_close()
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""Offline fixtures shared by the benchmarks: stub tools, a local HTTP server and simulated agent runs"""
+import contextlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+from urllib.parse import parse_qs, urlsplit
+
+from compositeai.drivers import DriverInput, DriverResponse
+from compositeai.drivers.mock_driver import json_response, text_response, tool_calls_response
+from compositeai.tools import BaseTool
+
+
+WORDS = "agent plan tool result search website market revenue growth model data report quarter".split()
+
+
+class StubTool(BaseTool):
+    """Tool returning deterministic text of a fixed size after a fixed delay"""
+    name: str = "stub_search"
+    description: str = "Search for information given a query"
+    latency: float = 0.0
+    result_chars: int = 2000
+
+    def func(self, query: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        text = f"Results for {query}: " + " ".join(WORDS)
+        return (text * (self.result_chars // len(text) + 1))[:self.result_chars]
+
+
+def synthetic_page(rng: random.Random, paragraphs: int) -> bytes:
+    """Article-like HTML page with navigation, scripts and styles around the text"""
+    def sentence() -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+    body = []
+    for index in range(paragraphs):
+        if index % 10 == 0:
+            body.append(f"<h2>Section {index // 10}</h2>")
+        body.append(f"<div class='c'><p>{sentence()} <a href='/x{index}'>{rng.choice(WORDS)}</a> <b>{sentence()}</b></p></div>")
+        if index % 25 == 0:
+            body.append("<script>window.dataLayer = window.dataLayer || []; dataLayer.push({'e': %d});</script>" % index)
+    page = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Page</title><style>.c {{ margin: 0 }}</style></head>
+<body><header><nav><ul>{"".join(f"<li><a href='/{w}'>{w}</a></li>" for w in WORDS)}</ul></nav></header>
+<main><article>{"".join(body)}</article></main>
+<aside>Related</aside><footer>Copyright</footer></body></html>"""
+    return page.encode("utf-8")
+
+
+@contextlib.contextmanager
+def fixture_server(latency: float = 0.0) -> Iterator[str]:
+    """Serve synthetic pages on localhost, yielding the base URL.
+
+    GET /page?paragraphs=N returns an HTML page, GET /file?type=T&bytes=N a body of N bytes
+    with content type T, and POST /search returns Serper-style results; every response is
+    delayed by latency seconds. GET requests also take:
+
+        delay=S                       wait S more seconds before responding
+        failures=N&status=C           answer the first N requests for the same URL with status C
+        retry_after=R                 ... and a Retry-After: R header
+
+    GET /stats returns the number of requests for each URL and the most requests served at once.
+    """
+    stats = {"requests": {}, "in_flight": 0, "peak": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def _send(self, body: bytes, content_type: str, status: int = 200, headers: dict = None) -> None:
+            if latency:
+                time.sleep(latency)
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            url = urlsplit(self.path)
+            params = {name: values[0] for name, values in parse_qs(url.query).items()}
+            if url.path == "/stats":
+                with lock:
+                    body = json.dumps({"requests": stats["requests"], "peak": stats["peak"]})
+                self._send(body.encode("utf-8"), "application/json")
+                return
+            with lock:
+                count = stats["requests"][self.path] = stats["requests"].get(self.path, 0) + 1
+                stats["in_flight"] += 1
+                stats["peak"] = max(stats["peak"], stats["in_flight"])
+            try:
+                if "delay" in params:
+                    time.sleep(float(params["delay"]))
+                if count <= int(params.get("failures", 0)):
+                    headers = {"Retry-After": params["retry_after"]} if "retry_after" in params else None
+                    self._send(b"Try again later", "text/plain", int(params.get("status", 503)), headers)
+                elif url.path == "/file":
+                    self._send(b"x" * int(params.get("bytes", 1000)), params.get("type", "application/octet-stream"))
+                else:
+                    paragraphs = int(params.get("paragraphs", 100))
+                    self._send(synthetic_page(random.Random(url.path), paragraphs), "text/html; charset=utf-8")
+            finally:
+                with lock:
+                    stats["in_flight"] -= 1
+
+        def do_POST(self) -> None:
+            query = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}").get("q", "")
+            organic = [{"title": f"{query} {index}", "link": f"/page?paragraphs={index}", "snippet": " ".join(WORDS)} for index in range(10)]
+            self._send(json.dumps({"organic": organic}).encode("utf-8"), "application/json")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class PlanAgentResponder:
+    """MockDriver responder for a PlanAgent run calling tool_calls tools once on every step of its plan.
+
+    Works in every step check mode: the first action of a step calls the tools, along with
+    step_complete if it is offered, and later ones answer in text.
+    """
+
+    def __init__(self, steps: int, tool_calls: int, tool_name: str, tool_args: dict):
+        self.steps = steps
+        self.tool_calls = tool_calls
+        self.tool_name = tool_name
+        self.tool_args = tool_args
+        self._started = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, input: DriverInput) -> DriverResponse:
+        prompt = input.messages[-1].content
+        if "WRITE A BRIEF PLAN" in prompt:
+            return json_response({"steps": [f"Step {index}" for index in range(self.steps)]})
+        if "DO YOU BELIEVE" in prompt:
+            return json_response({"complete": True})
+        if "EXTRACT" in prompt:
+            return text_response("Condensed result " + " ".join(WORDS))
+        if "WORK ON THE CURRENT STEP" in prompt:
+            step = re.search(r"Step \d+", prompt).group()
+            with self._lock:
+                first = step not in self._started
+                self._started.add(step)
+            completion = [("step_complete", {"summary": f"Finished {step}"})] if any(tool.name == "step_complete" for tool in input.tools or []) else []
+            if first and (self.tool_calls or completion):
+                return tool_calls_response([(self.tool_name, self.tool_args)] * self.tool_calls + completion)
+            return text_response(f"Finished {step}")
+        return text_response("Final answer")
\ No newline at end of file
@@ -0,0 +1,23 @@
+from typing import Any, Callable, Dict, List, Tuple
+import importlib
+
+
+def lazy_exports(package: str, exports: Dict[str, str]) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """Module __getattr__ and __dir__ (PEP 562) importing each name from its module on first use.
+
+    exports maps exported names to the modules defining them, so importing a package does
+    not import every submodule - and the dependencies (openai, requests, ...) they pull in.
+    """
+    def __getattr__(name: str) -> Any:
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module), name)
+        # Later lookups find the name in the package and skip __getattr__
+        setattr(importlib.import_module(package), name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(importlib.import_module(package))) | set(exports))
+
+    return __getattr__, __dir__
\ No newline at end of file
@@ -1,8 +1,51 @@
-from compositeai.agents.base_agent import (
-    BaseAgent, 
-    AgentOutput, 
-    AgentStep, 
-    AgentResult, 
-    AgentExecution,
-)
-from compositeai.agents.plan_agent import PlanAgent
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+from compositeai._lazy import lazy_exports
+
+
+_EXPORTS = {
+    "BaseAgent": "compositeai.agents.base_agent",
+    "AgentOutput": "compositeai.agents.base_agent",
+    "AgentChunk": "compositeai.agents.base_agent",
+    "AgentStep": "compositeai.agents.base_agent",
+    "AgentResult": "compositeai.agents.base_agent",
+    "AgentExecution": "compositeai.agents.base_agent",
+    "AgentTaskResult": "compositeai.agents.base_agent",
+    "PlanAgent": "compositeai.agents.plan_agent",
+    "MemoryManager": "compositeai.agents.memory",
+    "RetrievalMemory": "compositeai.agents.retrieval",
+    "VectorIndex": "compositeai.agents.retrieval",
+    "BaseEmbedder": "compositeai.agents.retrieval",
+    "HashingEmbedder": "compositeai.agents.retrieval",
+    "OpenAIEmbedder": "compositeai.agents.retrieval",
+    "CondenseMode": "compositeai.agents.condense",
+    "StepCheckMode": "compositeai.agents.step_check",
+    "AgentTeam": "compositeai.agents.team",
+    "AgentTool": "compositeai.agents.team",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+if TYPE_CHECKING:
+    from compositeai.agents.base_agent import (
+        BaseAgent, 
+        AgentOutput, 
+        AgentChunk,
+        AgentStep, 
+        AgentResult, 
+        AgentExecution,
+        AgentTaskResult,
+    )
+    from compositeai.agents.plan_agent import PlanAgent
+    from compositeai.agents.memory import MemoryManager
+    from compositeai.agents.retrieval import (
+        RetrievalMemory,
+        VectorIndex,
+        BaseEmbedder,
+        HashingEmbedder,
+        OpenAIEmbedder,
+    )
+    from compositeai.agents.condense import CondenseMode
+    from compositeai.agents.step_check import StepCheckMode
+    from compositeai.agents.team import AgentTeam, AgentTool
\ No newline at end of file
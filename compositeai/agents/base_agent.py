@@ -1,9 +1,15 @@
-from typing import Generator, List, Optional, Union, Any
-from pydantic import BaseModel, Field
+from typing import AsyncGenerator, AsyncIterable, Coroutine, Dict, Generator, Iterable, List, Optional, Tuple, Union, Any
+from pydantic import BaseModel, Field, PrivateAttr
 from abc import abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import asyncio
+import itertools
 
 from compositeai.tools import BaseTool
-from compositeai.drivers import BaseDriver
+from compositeai.checkpoint import BaseCheckpointStore, CheckpointWriter, message_from_dict
+from compositeai.drivers import BaseDriver, DriverMemory, DriverMessage, DriverPriority, DriverToolCallChunk
+from compositeai.ratelimit import TokenBucket
+from compositeai.tracing import BaseTracer, ExecutionUsage, Span
     
 
 class AgentOutput(BaseModel):
@@ -18,9 +24,28 @@ class AgentStep(AgentOutput):
     content: Any = Field("Intermediate step of agent execution")
 
 
+class AgentChunk(AgentOutput):
+    content: Any = Field(default=None, description="Incremental text generated while an agent step is in progress")
+    tool_calls: Optional[List[DriverToolCallChunk]] = Field(default=None, description="Incremental tool call fragments generated while an agent step is in progress")
+
+
 class AgentExecution(BaseModel):
     steps: List[AgentStep] = Field("Intermediate steps that the agent has taken during execution")
     result: AgentResult = Field("Final result of agent execution")
+    usage: ExecutionUsage = Field(default_factory=ExecutionUsage, description="Tokens, timings and cache hits of the driver and tool calls made")
+
+
+class AgentTaskResult(BaseModel):
+    index: int = Field(description="Position of the task in the tasks given to execute_many")
+    task: str
+    input: Optional[str] = Field(default=None)
+    execution: Optional[AgentExecution] = Field(default=None, description="Result of the run, None if it failed")
+    error: Optional[str] = Field(default=None, description="Exception that ended the run, if any")
+    exception: Optional[Any] = Field(default=None, exclude=True)
+
+
+# A task, or a (task, input) pair
+AgentTask = Union[str, Tuple[str, Optional[str]]]
 
 
 class BaseAgent(BaseModel):
@@ -31,16 +56,42 @@ class BaseAgent(BaseModel):
     tools: Optional[List[BaseTool]] = Field(default=None)
     max_iterations: Optional[int] = Field(default=10, ge=0)
     response_format: Optional[Any] = Field(default="text")
+    tracer: Optional[BaseTracer] = Field(default=None, description="Receives a span for every driver and tool call")
+    priority: DriverPriority = Field(default=DriverPriority.INTERACTIVE, description="Priority of the agent's driver requests when the driver is rate limited")
+    checkpoint_store: Optional[BaseCheckpointStore] = Field(default=None, description="Where runs executed with a checkpoint_id are saved after each iteration")
+    _usage: ExecutionUsage = PrivateAttr(default_factory=ExecutionUsage)
+    _checkpoint_writer: Optional[CheckpointWriter] = PrivateAttr(default=None)
+    
+
+    @property
+    def usage(self) -> ExecutionUsage:
+        """Usage of the current or last execution"""
+        return self._usage
     
 
-    def execute(self, task: str, input: Optional[str] = None, stream: bool = False) -> Union[Generator, AgentExecution]:
+    def execute(self, task: str, input: Optional[str] = None, stream: bool = False, stream_tokens: bool = False, checkpoint_id: Optional[str] = None) -> Union[Generator, AgentExecution]:
+        """Run the agent on a task.
+
+        With a checkpoint_id, the run is saved to checkpoint_store after every iteration and,
+        if a checkpoint with that ID exists, resumed from it instead of starting over (task
+        and input are then already in the restored history). The checkpoint is removed once
+        the run produces its result.
+        """
         # Initial processing on task/input
-        self.exec_init(task=task, input=input)
+        self._start_execution(task=task, input=input, checkpoint_id=checkpoint_id)
 
         def _execute_stream() -> Generator:
             for _ in range(self.max_iterations):
-                output = self.iterate()
-                yield output
+                # With stream_tokens, AgentChunk deltas are yielded before each step's output
+                if stream_tokens:
+                    for output in self.iterate_stream():
+                        if not isinstance(output, AgentChunk):
+                            self._save_checkpoint(output)
+                        yield output
+                else:
+                    output = self.iterate()
+                    self._save_checkpoint(output)
+                    yield output
                 if isinstance(output, AgentResult):
                     return
             # At this point, maximum number of iterations reached
@@ -50,10 +101,11 @@ class BaseAgent(BaseModel):
             steps = []
             for _ in range(self.max_iterations):
                 output = self.iterate()
+                self._save_checkpoint(output)
                 if isinstance(output, AgentStep):
                     steps.append(output)
                 if isinstance(output, AgentResult):
-                    return AgentExecution(steps=steps, result=output)
+                    return AgentExecution(steps=steps, result=output, usage=self._usage)
             # At this point, maximum number of iterations reached
             raise RuntimeError("Maximum number of iterations reached.")
         
@@ -62,7 +114,191 @@ class BaseAgent(BaseModel):
         else:
             return _execute_no_stream()
 
+
+    def aexecute(self, task: str, input: Optional[str] = None, stream: bool = False, checkpoint_id: Optional[str] = None) -> Union[AsyncGenerator, Coroutine]:
+        """Async counterpart of execute - returns an async generator if streaming, otherwise a coroutine to await"""
+        # Initial processing on task/input
+        self._start_execution(task=task, input=input, checkpoint_id=checkpoint_id)
+
+        async def _aexecute_stream() -> AsyncGenerator:
+            for _ in range(self.max_iterations):
+                output = await self.aiterate()
+                self._save_checkpoint(output)
+                yield output
+                if isinstance(output, AgentResult):
+                    return
+            # At this point, maximum number of iterations reached
+            raise RuntimeError("Maximum number of iterations reached.")
+
+        async def _aexecute_no_stream() -> AgentExecution:
+            steps = []
+            for _ in range(self.max_iterations):
+                output = await self.aiterate()
+                self._save_checkpoint(output)
+                if isinstance(output, AgentStep):
+                    steps.append(output)
+                if isinstance(output, AgentResult):
+                    return AgentExecution(steps=steps, result=output, usage=self._usage)
+            # At this point, maximum number of iterations reached
+            raise RuntimeError("Maximum number of iterations reached.")
+
+        if stream:
+            return _aexecute_stream()
+        else:
+            return _aexecute_no_stream()
+
     
+    def execute_many(
+        self,
+        tasks: Iterable[AgentTask],
+        concurrency: int = 4,
+        rate_limiter: Optional[TokenBucket] = None,
+        priority: DriverPriority = DriverPriority.BATCH,
+    ) -> Generator[AgentTaskResult, None, None]:
+        """Run every task through a fresh copy of this agent, yielding results as runs finish.
+
+        Up to concurrency runs execute at the same time in worker threads; the rate limiter,
+        which may be shared with other callers, is acquired before each run starts. Runs use
+        the given driver request priority, batch by default, so interactive runs sharing a
+        rate limited driver go first. A run
+        that raises is reported in its AgentTaskResult and does not affect the others.
+        Tasks are consumed lazily, so tasks can be a generator over a large input.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        tasks = enumerate(tasks)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = set()
+            while True:
+                # Keep the pool busy without queueing the whole input
+                for index, task in itertools.islice(tasks, concurrency - len(pending)):
+                    pending.add(executor.submit(self._execute_task, index, task, rate_limiter, priority))
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+
+    async def aexecute_many(
+        self,
+        tasks: Union[Iterable[AgentTask], AsyncIterable[AgentTask]],
+        concurrency: int = 4,
+        rate_limiter: Optional[TokenBucket] = None,
+        priority: DriverPriority = DriverPriority.BATCH,
+    ) -> AsyncGenerator[AgentTaskResult, None]:
+        """Async counterpart of execute_many, running the copies with aexecute on the event loop"""
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if isinstance(tasks, AsyncIterable):
+            task_iterator = tasks.__aiter__()
+        else:
+            task_iterator = _aiter(tasks)
+        index = 0
+        exhausted = False
+        pending = set()
+        try:
+            while True:
+                while not exhausted and len(pending) < concurrency:
+                    try:
+                        task = await task_iterator.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.ensure_future(self._aexecute_task(index, task, rate_limiter, priority)))
+                    index += 1
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+    def fresh_copy(self) -> "BaseAgent":
+        """Copy of the agent sharing its configuration (driver, tools, ...) but with empty per-run state"""
+        agent = self.model_copy()
+        agent.reset()
+        return agent
+
+
+    def reset(self) -> None:
+        """Clear per-run state so the agent can execute a new task - extended by subclasses with state"""
+        self._usage = ExecutionUsage()
+        self._checkpoint_writer = None
+
+
+    def checkpoint_memory(self) -> DriverMemory:
+        """History saved with checkpoints - implemented by subclasses that support checkpointing"""
+        raise NotImplementedError("Checkpointing is not supported by this agent")
+
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        """JSON-serializable per-run state besides the history, saved with checkpoints"""
+        raise NotImplementedError("Checkpointing is not supported by this agent")
+
+
+    def restore_checkpoint(self, messages: List[DriverMessage], state: Dict[str, Any]) -> None:
+        """Restore the history and per-run state of a saved checkpoint"""
+        raise NotImplementedError("Checkpointing is not supported by this agent")
+
+
+    def _start_execution(self, task: str, input: Optional[str], checkpoint_id: Optional[str]) -> None:
+        self._usage = ExecutionUsage()
+        self._checkpoint_writer = None
+        if checkpoint_id is not None:
+            if self.checkpoint_store is None:
+                raise ValueError("A checkpoint_store is required to execute with a checkpoint_id")
+            self._checkpoint_writer = CheckpointWriter(self.checkpoint_store, checkpoint_id)
+            saved = self.checkpoint_store.load(checkpoint_id)
+            if saved is not None:
+                messages, state = saved
+                self.restore_checkpoint([message_from_dict(message) for message in messages], state)
+                self._checkpoint_writer.resumed(self.checkpoint_memory())
+                return
+        self.exec_init(task=task, input=input)
+        self._save_checkpoint(None)
+
+
+    def _save_checkpoint(self, output: Optional[AgentOutput]) -> None:
+        if self._checkpoint_writer is None:
+            return
+        if isinstance(output, AgentResult):
+            # A finished run has nothing left to resume
+            self.checkpoint_store.delete(self._checkpoint_writer.checkpoint_id)
+            self._checkpoint_writer = None
+        else:
+            self._checkpoint_writer.save(self.checkpoint_memory(), self.checkpoint_state())
+
+
+    def _execute_task(self, index: int, task: AgentTask, rate_limiter: Optional[TokenBucket], priority: DriverPriority) -> AgentTaskResult:
+        task, input = _split_task(task)
+        try:
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            agent = self.fresh_copy()
+            agent.priority = priority
+            execution = agent.execute(task=task, input=input)
+        except Exception as e:
+            return AgentTaskResult(index=index, task=task, input=input, error=repr(e), exception=e)
+        return AgentTaskResult(index=index, task=task, input=input, execution=execution)
+
+
+    async def _aexecute_task(self, index: int, task: AgentTask, rate_limiter: Optional[TokenBucket], priority: DriverPriority) -> AgentTaskResult:
+        task, input = _split_task(task)
+        try:
+            if rate_limiter is not None:
+                await rate_limiter.aacquire()
+            agent = self.fresh_copy()
+            agent.priority = priority
+            execution = await agent.aexecute(task=task, input=input)
+        except Exception as e:
+            return AgentTaskResult(index=index, task=task, input=input, error=repr(e), exception=e)
+        return AgentTaskResult(index=index, task=task, input=input, execution=execution)
+
+
     @abstractmethod
     def exec_init(self, task: str, input: Optional[str] = None) -> None:
         """Used to initial processing of the task or given prior input - called first in execute"""
@@ -72,4 +308,33 @@ class BaseAgent(BaseModel):
     @abstractmethod
     def iterate(self) -> AgentOutput:
         """An iteration of a the agent execution that returns a useful output - called in execute"""
-        raise NotImplementedError("Method must be implemented by a subclass")
\ No newline at end of file
+        raise NotImplementedError("Method must be implemented by a subclass")
+
+
+    def iterate_stream(self) -> Generator[AgentOutput, None, None]:
+        """Token-level iteration of the agent execution - yields AgentChunk deltas, then the iteration output"""
+        yield self.iterate()
+
+
+    async def aiterate(self) -> AgentOutput:
+        """Async iteration of the agent execution - called in aexecute, runs iterate in a worker thread unless overridden"""
+        return await asyncio.to_thread(self.iterate)
+
+
+    def record_span(self, span: Span) -> None:
+        """Add a finished driver or tool call to the execution usage and pass it to the tracer"""
+        self._usage.add(span)
+        if self.tracer is not None:
+            self.tracer.on_span(span)
+
+
+def _split_task(task: AgentTask) -> Tuple[str, Optional[str]]:
+    if isinstance(task, str):
+        return task, None
+    task, input = task
+    return task, input
+
+
+async def _aiter(iterable: Iterable) -> AsyncGenerator:
+    for item in iterable:
+        yield item
\ No newline at end of file
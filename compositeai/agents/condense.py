@@ -0,0 +1,193 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from enum import Enum
+import re
+
+from compositeai.drivers.base_driver import (
+    DriverInput,
+    DriverMemory,
+    SystemMessage,
+)
+from compositeai.structured import loads
+
+
+class CondenseMode(Enum):
+    OFF = 'off'
+    LOCAL = 'local'
+    LLM = 'llm'
+    BATCHED = 'batched'
+
+
+NOTHING_RELEVANT = "NOTHING RELEVANT"
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_BLOCK_PATTERN = re.compile(r"\n\s*\n|(?<=[.!?])\s+")
+
+
+def condense_locally(text: str, query: str, max_chars: int) -> str:
+    """Condense text without an LLM, keeping the passages that share the most words with query.
+
+    Whitespace is collapsed first; text still longer than max_chars is split into paragraphs
+    and sentences, and the best scoring passages are kept in their original order.
+    """
+    blocks = [" ".join(block.split()) for block in _BLOCK_PATTERN.split(text)]
+    blocks = [block for block in blocks if block]
+    condensed = "\n".join(blocks)
+    if len(condensed) <= max_chars:
+        return condensed
+
+    query_words = set(_WORD_PATTERN.findall(query.lower()))
+    def _score(block: str) -> float:
+        words = _WORD_PATTERN.findall(block.lower())
+        if not words:
+            return 0.0
+        return sum(word in query_words for word in words) / len(words) ** 0.5
+
+    # Greedily keep the best passages that fit, then restore document order
+    ranked = sorted(range(len(blocks)), key=lambda index: _score(blocks[index]), reverse=True)
+    kept = []
+    length = 0
+    for index in ranked:
+        if length + len(blocks[index]) + 1 > max_chars:
+            continue
+        kept.append(index)
+        length += len(blocks[index]) + 1
+    if not kept:
+        return blocks[ranked[0]][:max_chars]
+    return "\n".join(blocks[index] for index in sorted(kept))
+
+
+def split_chunks(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """Split text into chunks of at most max_tokens tokens, breaking between paragraphs and sentences.
+
+    Passages longer than a chunk on their own are cut at the character length that
+    matches max_tokens at their own characters-per-token rate.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for block in _BLOCK_PATTERN.split(text):
+        block = block.strip()
+        if not block:
+            continue
+        tokens = count_tokens(block)
+        if tokens > max_tokens:
+            pieces = _split_block(block, tokens, max_tokens)
+        else:
+            pieces = [(block, tokens)]
+        for piece, piece_tokens in pieces:
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append("\n".join(current))
+                current = []
+                current_tokens = 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def _split_block(block: str, tokens: int, max_tokens: int) -> List[Tuple[str, int]]:
+    size = max(1, len(block) * max_tokens // tokens)
+    return [(block[start:start + size], max_tokens) for start in range(0, len(block), size)]
+
+
+def map_chunk_input(chunk: str, index: int, total: int, current_plan_step: str) -> DriverInput:
+    """Request extracting the info relevant to the current step from one chunk of a long tool result"""
+    map_prompt = f"""
+    EXTRACT THE INFO RELEVANT TO THE CURRENT STEP FROM THE FOLLOWING PART ({index} OF {total}) OF A LONG TOOL RESULT.
+    KEEP ALL RELEVANT FACTS AND FIGURES. IF NOTHING IS RELEVANT, REPLY WITH {NOTHING_RELEVANT} ONLY.
+
+    CURRENT STEP: {current_plan_step}
+
+    {chunk}
+    """
+    return DriverInput(
+        messages=[SystemMessage(role="system", content=map_prompt)],
+        temperature=0.0,
+    )
+
+
+def reduce_input(notes: List[str], current_plan_step: str) -> DriverInput:
+    """Request combining notes taken from consecutive parts of a long tool result into one"""
+    sections = "\n\n".join(f"NOTES {index}:\n{note}" for index, note in enumerate(notes, 1))
+    reduce_prompt = f"""
+    COMBINE THE FOLLOWING NOTES, TAKEN FROM CONSECUTIVE PARTS OF ONE TOOL RESULT, INTO ONE SUMMARY OF THE INFO RELEVANT TO THE CURRENT STEP.
+    KEEP ALL RELEVANT FACTS AND FIGURES AND DROP REPETITION.
+
+    CURRENT STEP: {current_plan_step}
+
+    {sections}
+    """
+    return DriverInput(
+        messages=[SystemMessage(role="system", content=reduce_prompt)],
+        temperature=0.0,
+    )
+
+
+def is_relevant(note: Optional[str]) -> bool:
+    """Whether a chunk's note has content, rather than being empty or NOTHING RELEVANT"""
+    return bool(note) and not note.strip().upper().startswith(NOTHING_RELEVANT)
+
+
+def condense_input(result: str, current_plan_step: str, memory: Optional[DriverMemory]) -> DriverInput:
+    """Request extracting the relevant info from one tool result.
+
+    With memory, the request follows the agent's full history; without it (a dedicated
+    condense driver) only the current plan step and the raw result are sent.
+    """
+    if memory is not None:
+        condense_prompt = f"""
+        EXTRACT THE MOST RELAVANT INFO FROM THE FOLLOWING:
+
+        {result}
+        """
+    else:
+        condense_prompt = f"""
+        EXTRACT THE MOST RELAVANT INFO FOR THE CURRENT STEP FROM THE FOLLOWING.
+
+        CURRENT STEP: {current_plan_step}
+
+        {result}
+        """
+    return DriverInput(
+        memory=memory,
+        messages=[SystemMessage(role="system", content=condense_prompt)],
+        temperature=0.0,
+    )
+
+
+def batched_condense_input(results: List[Tuple[str, str]], current_plan_step: str, memory: Optional[DriverMemory]) -> DriverInput:
+    """Request extracting the relevant info from several (tool_call_id, result) pairs in one call"""
+    sections = "\n\n".join(f"RESULT {tool_call_id}:\n{result}" for tool_call_id, result in results)
+    condense_prompt = f"""
+    EXTRACT THE MOST RELAVANT INFO FOR THE CURRENT STEP FROM EACH OF THE FOLLOWING RESULTS.
+
+    CURRENT STEP: {current_plan_step}
+
+    {sections}
+
+    The output should be a JSON object mapping each result ID to the info extracted from that result, for example {{"<result ID>": "<extracted info>"}}.
+    """
+    return DriverInput(
+        memory=memory,
+        messages=[SystemMessage(role="system", content=condense_prompt)],
+        temperature=0.0,
+        response_format="json_object",
+    )
+
+
+def parse_batched_condense(content: str, results: List[Tuple[str, str]], max_chars: int) -> Dict[str, str]:
+    """Map each tool_call_id to its extracted info, condensing locally any result the driver left out"""
+    try:
+        extracted = loads(content)
+    except (TypeError, ValueError):
+        extracted = {}
+    if not isinstance(extracted, dict):
+        extracted = {}
+    condensed = {}
+    for tool_call_id, result in results:
+        observation = extracted.get(tool_call_id)
+        if not isinstance(observation, str) or not observation:
+            observation = condense_locally(result, "", max_chars)
+        condensed[tool_call_id] = observation
+    return condensed
@@ -0,0 +1,87 @@
+from typing import List, Optional, Tuple
+from pydantic import BaseModel, Field
+
+from compositeai.drivers.base_driver import (
+    BaseDriver,
+    DriverInput,
+    DriverMemory,
+    DriverMessage,
+    SystemMessage,
+    UserMessage,
+    ToolMessage,
+)
+
+
+SUMMARY_PREFIX = "SUMMARY OF EARLIER PROGRESS:"
+
+
+class MemoryManager(BaseModel):
+    """Keeps an agent's conversation history within a token budget.
+
+    The leading system/user messages (agent description and task) are always kept. The rest
+    of the history is split into turns - an assistant message together with the tool messages
+    answering its tool calls - so compaction never separates a tool call from its result.
+    When the history exceeds max_tokens, every turn except the most recent keep_recent is
+    replaced by a single summary message.
+    """
+    max_tokens: int = Field(ge=1, description="Token budget for the conversation history")
+    keep_recent: int = Field(default=4, ge=0, description="Number of most recent turns that are never compacted")
+    summary_max_tokens: Optional[int] = Field(default=None, ge=1, description="Maximum tokens for each generated summary")
+
+
+    def history_tokens(self, memory: DriverMemory, driver: BaseDriver) -> int:
+        """Estimated token count of the history, counted by the driver like the prompts it is sent in"""
+        return driver.estimate_prompt_tokens(DriverInput(messages=[], memory=memory))
+
+
+    def select_compaction(self, memory: DriverMemory, driver: BaseDriver) -> Optional[Tuple[int, int]]:
+        """Range of messages to compact into a summary, or None if the history is within budget"""
+        if self.history_tokens(memory, driver) <= self.max_tokens:
+            return None
+        turns = self._turn_starts(memory)
+        if len(turns) <= self.keep_recent:
+            return None
+        start = turns[0]
+        end = turns[-self.keep_recent] if self.keep_recent else len(memory)
+        # A lone previous summary is already as compact as it gets
+        if end - start == 1 and self._is_summary(memory[start]):
+            return None
+        return start, end
+
+
+    def summary_input(self, memory: DriverMemory, start: int, end: int) -> DriverInput:
+        """Request asking the driver to summarize the messages between start and end"""
+        summary_prompt = """
+        SUMMARIZE THE PROGRESS MADE IN THE CONVERSATION ABOVE SINCE THE TASK WAS GIVEN.
+        KEEP EVERY FACT, NUMBER, NAME AND SOURCE THAT MAY BE NEEDED TO COMPLETE THE TASK.
+        """
+        return DriverInput(
+            messages=list(memory[:self._head_end(memory)]) + list(memory[start:end]) + [SystemMessage(role="system", content=summary_prompt)],
+            max_tokens=self.summary_max_tokens,
+            temperature=0.0,
+        )
+
+
+    def apply_summary(self, memory: DriverMemory, start: int, end: int, summary: str) -> None:
+        """Replace the messages between start and end with the summary"""
+        memory.replace(start, end, [SystemMessage(role="system", content=f"{SUMMARY_PREFIX}\n\n{summary}")])
+
+
+    def _head_end(self, memory: DriverMemory) -> int:
+        # Leading description/task messages, which are never compacted
+        head_end = 0
+        while head_end < len(memory) and isinstance(memory[head_end], (SystemMessage, UserMessage)) and not self._is_summary(memory[head_end]):
+            head_end += 1
+        return head_end
+
+
+    def _turn_starts(self, memory: DriverMemory) -> List[int]:
+        # Indices where a turn begins; tool messages always belong to the turn of their tool call
+        return [
+            index for index in range(self._head_end(memory), len(memory))
+            if not isinstance(memory[index], ToolMessage)
+        ]
+
+
+    def _is_summary(self, message: DriverMessage) -> bool:
+        return isinstance(message, SystemMessage) and message.content.startswith(SUMMARY_PREFIX)
@@ -1,23 +1,54 @@
-from typing import List, Optional
+from typing import Any, Dict, Generator, List, NamedTuple, Optional, Set, Tuple
 from pydantic import BaseModel, PrivateAttr, Field
 from enum import Enum
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import itertools
 import json
+import time
 
 from compositeai.agents.base_agent import (
     AgentOutput, 
+    AgentChunk,
     AgentStep, 
     AgentResult, 
     BaseAgent,
 )
+from compositeai.agents.condense import (
+    CondenseMode,
+    condense_locally,
+    condense_input,
+    batched_condense_input,
+    parse_batched_condense,
+    split_chunks,
+    map_chunk_input,
+    reduce_input,
+    is_relevant,
+)
+from compositeai.agents.memory import MemoryManager
+from compositeai.agents.prompts import PromptTemplate, schema_text
+from compositeai.agents.retrieval import MemoryRetriever, RetrievalMemory
+from compositeai.agents.step_check import StepCheckMode, StepCompleteTool
+from compositeai.blobs import BaseBlobStore
+from compositeai.cache import BaseCache
 from compositeai.drivers.base_driver import (
+    BaseDriver,
     DriverInput, 
-    DriverToolChoice, 
+    DriverMemory,
     DriverMessage,
+    DriverResponse,
+    DriverResponseChunk,
+    DriverToolChoice, 
+    DriverToolCall,
     SystemMessage,
     UserMessage,
     AssistantMessage,
     ToolMessage,
 )
+from compositeai.structured import StructuredOutputError, loads, parse_model, repair_json
+from compositeai.tools import BaseTool
+from compositeai.tracing import Span
 
 
 class NextStep(Enum):
@@ -28,30 +59,172 @@ class NextStep(Enum):
 
 
 class Plan(BaseModel):
-    steps: List[str] = Field("List of steps to take to complete task")
+    steps: List[str] = Field(description="List of steps to take to complete task")
 
 
 class StepCheck(BaseModel):
     complete: bool = Field(description="true if the current step is complete")
 
 
+##### Prompt templates, prepared on first use and shared by every agent
+
+_FORMAT_INSTRUCTIONS = """
+The output should be formatted as a JSON instance that conforms to the JSON schema below.
+
+As an example, for the schema {{"properties": {{"foo": {{"title": "Foo", "description": "a list of strings", "type": "array", "items": {{"type": "string"}}}}}}, "required": ["foo"]}}
+the object {{"foo": ["bar", "baz"]}} is a well-formatted instance of the schema. The object {{"properties": {{"foo": ["bar", "baz"]}}}} is not well-formatted.
+
+Here is the output schema:
+```
+{schema}
+```
+"""
+
+_PLAN_PROMPT = PromptTemplate("""
+WRITE A BRIEF PLAN FOR WHAT YOU SHOULD DO AT THIS POINT IN TIME.
+""" + _FORMAT_INSTRUCTIONS, schema=lambda: schema_text(Plan))
+
+_ACTION_PROMPT = PromptTemplate("""
+WORK ON THE CURRENT STEP ONLY (DO NOT MOVE AHEAD):
+
+{step}
+""")
+
+_MERGED_ACTION_PROMPT = PromptTemplate("""
+WORK ON THE CURRENT STEP ONLY (DO NOT MOVE AHEAD):
+
+{step}
+
+ONCE THE CURRENT STEP IS COMPLETE, CALL {tool}. IF THE TOOLS YOU CALL NOW ARE THE LAST ONES THE STEP NEEDS, CALL {tool} ALONG WITH THEM.
+""")
+
+_STEP_CHECK_PROMPT = PromptTemplate("""
+DO YOU BELIEVE THAT THE CURRENT STEP HAS BEEN COMPLETED?
+
+CURRENT STEP: {step}
+""" + _FORMAT_INSTRUCTIONS, schema=lambda: schema_text(StepCheck))
+
+_RETRY_PROMPT = PromptTemplate("""
+YOUR ANSWER COULD NOT BE PARSED: {error}
+
+ANSWER AGAIN WITH ONLY A JSON INSTANCE OF THE OUTPUT SCHEMA.
+""")
+
+_OUTPUT_PROMPT = PromptTemplate("""
+GIVEN YOUR PROGRESS, PRODUCE A FINAL RESULT THAT BEST ANSWERS THE ORIGINAL USER TASK.
+""")
+
+
+##### Requests yielded by step generators, carried out by _run (sync) or _arun (async)
+
+class _Generate(NamedTuple):
+    input: DriverInput
+    # Surface token deltas to the caller when iterating with iterate_stream
+    stream: bool = False
+    # Driver to use instead of the agent's driver
+    driver: Optional[BaseDriver] = None
+    # Agent phase reported in tracing spans
+    phase: Optional[str] = None
+
+
+class _CallTool(NamedTuple):
+    tool: BaseTool
+    args: Dict[str, Any]
+
+
+class _Parallel(NamedTuple):
+    steps: List[Generator]
+    # Maximum steps running at the same time, max_concurrency if None
+    limit: Optional[int] = None
+
+
+def _single(request: Any) -> Generator:
+    # Wrap one request as a step generator that returns its result
+    return (yield request)
+
+
 class PlanAgent(BaseAgent):
-    _memory: List[DriverMessage] = PrivateAttr(default=[])
+    max_concurrency: int = Field(default=1, ge=1, description="Maximum number of tool calls from a single action to run at the same time")
+    condense_mode: CondenseMode = Field(default=CondenseMode.LLM, description="How tool results are condensed before being added to memory")
+    condense_driver: Optional[BaseDriver] = Field(default=None, description="Cheaper driver for condensing, given only the current step and the raw result")
+    condense_min_chars: int = Field(default=0, ge=0, description="Tool results shorter than this are kept as they are")
+    condense_max_chars: int = Field(default=4000, ge=1, description="Maximum length of locally condensed tool results")
+    condense_chunk_tokens: Optional[int] = Field(default=None, ge=1, description="In LLM and batched condensing, tool results longer than this many tokens are condensed in chunks of this size and combined (map-reduce) - never if None, e.g. 4000 for results that would not fit one condense call")
+    condense_fan_out: int = Field(default=8, ge=2, description="Chunks condensed at the same time, and notes combined per reduce call")
+    condense_max_depth: int = Field(default=2, ge=0, description="Maximum rounds of combining notes - notes left after the last round are joined as they are")
+    condense_cache: Optional[BaseCache] = Field(default=None, description="Cache of condensed chunks, keyed on the plan step and chunk text")
+    memory_manager: Optional[MemoryManager] = Field(default=None, description="Compacts older history into summaries to stay within a token budget")
+    retrieval_memory: Optional[RetrievalMemory] = Field(default=None, description="Sends prompts only the recent history and the earlier observations relevant to the current step")
+    step_check_mode: StepCheckMode = Field(default=StepCheckMode.SEPARATE, description="How the agent checks that a step of the plan is complete")
+    merged_check_after: int = Field(default=3, ge=1, description="With a merged step check, actions in a row that call tools without step_complete before a separate step check runs")
+    structured_retries: int = Field(default=1, ge=0, description="Extra driver calls asking again for a plan or step check that could not be parsed")
+    blob_store: Optional[BaseBlobStore] = Field(default=None, description="Store keeping large message contents out of memory until a request is sent, shareable between agents")
+    blob_min_chars: int = Field(default=4096, ge=0, description="Message contents at least this long are kept in the blob store")
+    stable_prompt_prefix: bool = Field(default=False, description="Offer the same tools on every call with history (not callable outside actions), so providers can cache the prompt prefix - costs the tool schemas' tokens on plan, step check, condense and output calls, worth it with long descriptions and histories")
+    _memory: DriverMemory = PrivateAttr(default_factory=DriverMemory)
     _initial_plan: List[str] = PrivateAttr(default=[])
     _current_plan_index: int = PrivateAttr(default=0)
     _next_step: NextStep = PrivateAttr(default=NextStep.PLAN)
+    # Actions in a row that called tools without step_complete, with a merged step check
+    _unchecked_actions: int = PrivateAttr(default=0)
+    _tool_index: Dict[str, BaseTool] = PrivateAttr(default_factory=dict)
+    _step_complete_tool: StepCompleteTool = PrivateAttr(default_factory=StepCompleteTool)
+    # (next step, plan index, response) of a call made ahead of time by a speculative step check
+    _speculated: Optional[Tuple[NextStep, int, DriverResponse]] = PrivateAttr(default=None)
+    _retriever: Optional[MemoryRetriever] = PrivateAttr(default=None)
 
 
     def __init__(self, **data):
         # Superclass init
         super().__init__(**data)
+        # Start with the agent description in memory
+        self.reset()
+
+
+    def reset(self) -> None:
+        super().reset()
         # Add agent description as system message for LLM
+        self._memory = self._new_memory()
         self._memory.append(
             SystemMessage(
                 role="system",
                 content=self.description,
             ),
         )
+        self._initial_plan = []
+        self._current_plan_index = 0
+        self._next_step = NextStep.PLAN
+        self._unchecked_actions = 0
+        self._speculated = None
+        # Index tools by name for dispatching tool calls (copies may have been given other tools)
+        self._tool_index = {tool.get_schema().name: tool for tool in self.tools or []}
+        self._retriever = self.retrieval_memory.retriever() if self.retrieval_memory is not None else None
+
+
+    def _new_memory(self, messages: Optional[List[DriverMessage]] = None) -> DriverMemory:
+        return DriverMemory(messages, blob_store=self.blob_store, blob_min_chars=self.blob_min_chars)
+
+
+    def checkpoint_memory(self) -> DriverMemory:
+        return self._memory
+
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        return {
+            "initial_plan": self._initial_plan,
+            "current_plan_index": self._current_plan_index,
+            "next_step": self._next_step.value,
+            "unchecked_actions": self._unchecked_actions,
+        }
+
+
+    def restore_checkpoint(self, messages: List[DriverMessage], state: Dict[str, Any]) -> None:
+        self._memory = self._new_memory(messages)
+        self._initial_plan = state["initial_plan"]
+        self._current_plan_index = state["current_plan_index"]
+        self._next_step = NextStep(state["next_step"])
+        self._unchecked_actions = state.get("unchecked_actions", 0)
+        self._speculated = None
 
 
     def exec_init(self, task: str, input: Optional[str] = None) -> None:
@@ -68,6 +241,35 @@ class PlanAgent(BaseAgent):
         
 
     def iterate(self) -> AgentOutput:
+        return self._run(self._iteration())
+
+
+    def iterate_stream(self) -> Generator[AgentOutput, None, None]:
+        output = yield from self._run_stream(self._iteration())
+        yield output
+
+
+    async def aiterate(self) -> AgentOutput:
+        return await self._arun(self._iteration())
+
+
+    def _iteration(self) -> Generator:
+        # Keep memory within budget before running the next step
+        if self.memory_manager is not None:
+            yield from self._compact_memory()
+        return (yield from self._next_step_generator())
+
+
+    def _compact_memory(self) -> Generator:
+        compaction = self.memory_manager.select_compaction(self._memory, self.driver)
+        if compaction is None:
+            return
+        start, end = compaction
+        response = yield _Generate(self.memory_manager.summary_input(self._memory, start, end), phase="compact")
+        self.memory_manager.apply_summary(self._memory, start, end, response.content)
+
+
+    def _next_step_generator(self) -> Generator:
         # Run iteration based on next step
         match self._next_step:
             case NextStep.PLAN:
@@ -80,36 +282,184 @@ class PlanAgent(BaseAgent):
                 return self._output()
             
 
-    def _plan(self) -> AgentStep:
+    def _run(self, steps: Generator, submitted: Optional[float] = None) -> Any:
+        """Carry out the requests yielded by a step generator synchronously and return its result"""
+        # Time spent waiting for a worker thread counts as queue time of the first request
+        queued = time.perf_counter() - submitted if submitted is not None else 0.0
+        result = None
+        while True:
+            try:
+                request = steps.send(result)
+            except StopIteration as stop:
+                return stop.value
+            if isinstance(request, _Generate):
+                result = self._generate(request, queued)
+            elif isinstance(request, _CallTool):
+                result = self._call_tool(request, queued)
+            elif isinstance(request, _Parallel):
+                # Bounded by max_concurrency unless given a limit; map preserves the order of the given steps
+                workers = min(request.limit or self.max_concurrency, len(request.steps))
+                if workers > 1:
+                    with ThreadPoolExecutor(max_workers=workers) as executor:
+                        result = list(executor.map(self._run, request.steps, itertools.repeat(time.perf_counter())))
+                else:
+                    result = [self._run(step) for step in request.steps]
+            else:
+                raise TypeError(f"Unknown step request: {request!r}")
+            queued = 0.0
+
+
+    def _run_stream(self, steps: Generator) -> Generator[AgentChunk, None, Any]:
+        """Like _run, but streams driver output as AgentChunk deltas for requests marked to stream"""
+        result = None
+        while True:
+            try:
+                request = steps.send(result)
+            except StopIteration as stop:
+                return stop.value
+            if isinstance(request, _Generate) and request.stream:
+                driver = request.driver or self.driver
+                request.input.priority = self.priority
+                start = time.perf_counter()
+                try:
+                    for chunk in driver.generate_stream(input=request.input):
+                        if isinstance(chunk, DriverResponseChunk):
+                            yield AgentChunk(content=chunk.content, tool_calls=chunk.tool_calls)
+                        else:
+                            result = chunk
+                except Exception as e:
+                    self._record_generate(request, driver, start, 0.0, error=e)
+                    raise
+                self._record_generate(request, driver, start, 0.0, result)
+            else:
+                # Anything not marked to stream runs exactly as in _run
+                result = self._run(_single(request))
+
+
+    async def _arun(self, steps: Generator, submitted: Optional[float] = None) -> Any:
+        """Carry out the requests yielded by a step generator on the running event loop and return its result"""
+        # Time spent waiting for the concurrency semaphore counts as queue time of the first request
+        queued = time.perf_counter() - submitted if submitted is not None else 0.0
+        result = None
+        while True:
+            try:
+                request = steps.send(result)
+            except StopIteration as stop:
+                return stop.value
+            if isinstance(request, _Generate):
+                result = await self._agenerate(request, queued)
+            elif isinstance(request, _CallTool):
+                result = await self._acall_tool(request, queued)
+            elif isinstance(request, _Parallel):
+                # Bounded by max_concurrency unless given a limit; gather preserves the order of the given steps
+                semaphore = asyncio.Semaphore(request.limit or self.max_concurrency)
+                async def _bounded(step: Generator) -> Any:
+                    submitted = time.perf_counter()
+                    async with semaphore:
+                        return await self._arun(step, submitted)
+                result = list(await asyncio.gather(*(_bounded(step) for step in request.steps)))
+            else:
+                raise TypeError(f"Unknown step request: {request!r}")
+            queued = 0.0
+
+
+    def _generate(self, request: _Generate, queued: float) -> DriverResponse:
+        driver = request.driver or self.driver
+        request.input.priority = self.priority
+        start = time.perf_counter()
+        try:
+            response = driver.generate(input=request.input)
+        except Exception as e:
+            self._record_generate(request, driver, start, queued, error=e)
+            raise
+        self._record_generate(request, driver, start, queued, response)
+        return response
+
+
+    async def _agenerate(self, request: _Generate, queued: float) -> DriverResponse:
+        driver = request.driver or self.driver
+        request.input.priority = self.priority
+        start = time.perf_counter()
+        try:
+            response = await driver.agenerate(input=request.input)
+        except Exception as e:
+            self._record_generate(request, driver, start, queued, error=e)
+            raise
+        self._record_generate(request, driver, start, queued, response)
+        return response
+
+
+    def _call_tool(self, request: _CallTool, queued: float) -> Any:
+        start = time.perf_counter()
+        try:
+            run = request.tool.invoke(request.args)
+        except Exception as e:
+            self._record_tool(request, start, queued, error=e)
+            raise
+        self._record_tool(request, start, queued, run.cached)
+        return run.result
+
+
+    async def _acall_tool(self, request: _CallTool, queued: float) -> Any:
+        start = time.perf_counter()
+        try:
+            run = await request.tool.ainvoke(request.args)
+        except Exception as e:
+            self._record_tool(request, start, queued, error=e)
+            raise
+        self._record_tool(request, start, queued, run.cached)
+        return run.result
+
+
+    def _record_generate(self, request: _Generate, driver: BaseDriver, start: float, queued: float, response: Optional[DriverResponse] = None, error: Optional[Exception] = None) -> None:
+        wall_seconds = time.perf_counter() - start
+        # Cached responses cost no tokens
+        usage = response.usage if response is not None and not response.cached else None
+        self.record_span(Span(
+            kind="generate",
+            name=str(driver.model),
+            phase=request.phase,
+            agent=self.name,
+            start_time=time.time() - wall_seconds,
+            wall_seconds=wall_seconds,
+            queue_seconds=queued,
+            prompt_tokens=usage.prompt_tokens if usage is not None else 0,
+            completion_tokens=usage.completion_tokens if usage is not None else 0,
+            cached_tokens=usage.cached_tokens if usage is not None else 0,
+            cached=response.cached if response is not None else False,
+            error=repr(error) if error is not None else None,
+        ))
+
+
+    def _record_tool(self, request: _CallTool, start: float, queued: float, cached: bool = False, error: Optional[Exception] = None) -> None:
+        wall_seconds = time.perf_counter() - start
+        self.record_span(Span(
+            kind="tool",
+            name=request.tool.name,
+            phase="action",
+            agent=self.name,
+            start_time=time.time() - wall_seconds,
+            wall_seconds=wall_seconds,
+            queue_seconds=queued,
+            cached=cached,
+            error=repr(error) if error is not None else None,
+        ))
+
+
+    def _plan(self) -> Generator[Any, Any, AgentStep]:
         # Generate a plan formatted as list of steps 
-        plan_prompt = f"""
-        WRITE A BRIEF PLAN FOR WHAT YOU SHOULD DO AT THIS POINT IN TIME.
-
-        The output should be formatted as a JSON instance that conforms to the JSON schema below.
-
-        As an example, for the schema {{"properties": {{"foo": {{"title": "Foo", "description": "a list of strings", "type": "array", "items": {{"type": "string"}}}}}}, "required": ["foo"]}}
-        the object {{"foo": ["bar", "baz"]}} is a well-formatted instance of the schema. The object {{"properties": {{"foo": ["bar", "baz"]}}}} is not well-formatted.
-
-        Here is the output schema:
-        ```
-        {Plan.model_json_schema()}
-        ```
-        """
-        messages = self._memory + [SystemMessage(role="system", content=plan_prompt)]
-        driver_input = DriverInput(
-            messages=messages,
+        driver_input = self._with_prompt_tools(DriverInput(
+            memory=self._memory,
+            messages=[SystemMessage(role="system", content=_PLAN_PROMPT.render())],
             temperature=0.0,
             response_format="json_object",
-        )
-        response = self.driver.generate(input=driver_input)
+        ))
+        plan = yield from self._generate_structured(driver_input, Plan, stream=True, phase="plan")
+        plan_list = plan.steps
 
-        # Parse response
-        plan_dict = json.loads(response.content)
-        plan_list = plan_dict["steps"]
-
-        # Add to state and set next step as ACTION
+        # Add to state and set next step as ACTION (or OUTPUT if there is nothing to do)
         self._initial_plan = plan_list
-        self._next_step = NextStep.ACTION
+        self._next_step = NextStep.ACTION if plan_list else NextStep.OUTPUT
 
         # Format plan into single string and stream result as AgentStep
         plan_str = ""
@@ -118,25 +468,28 @@ class PlanAgent(BaseAgent):
         return AgentStep(content=plan_str)
     
     
-    def _action(self) -> AgentStep:
+    def _action(self) -> Generator[Any, Any, AgentStep]:
         # Get current step in plan
         current_plan_step = self._initial_plan[self._current_plan_index]
 
-        # Generate action based on the step
-        system_message = f"""
-        WORK ON THE CURRENT STEP ONLY (DO NOT MOVE AHEAD):
-
-        {current_plan_step}
-        """
-        driver_input = DriverInput(
-            messages=self._memory + [SystemMessage(role="system", content=system_message)],
-            tools=self.tools,
-            tool_choice=DriverToolChoice.AUTO,
-            temperature=0.0,
-        )
-        response = self.driver.generate(input=driver_input)
+        # Generate action based on the step, unless a speculative step check already did
+        response = self._take_speculated(NextStep.ACTION)
+        if response is None:
+            response = yield _Generate(self._action_input(current_plan_step), stream=True, phase="action")
         tool_calls = response.tool_calls
 
+        # Merged step check: the model calls step_complete instead of answering a separate step check
+        completion = None
+        if self.step_check_mode == StepCheckMode.MERGED and tool_calls:
+            completion = next((tool_call for tool_call in tool_calls if tool_call.name == self._step_complete_tool.name), None)
+            if completion is not None:
+                tool_calls = [tool_call for tool_call in tool_calls if tool_call is not completion]
+        if completion is not None and not tool_calls:
+            self._memory.append(AssistantMessage(role="assistant", content=response.content, tool_calls=[completion]))
+            self._memory.append(ToolMessage(role="tool", content="Step marked complete.", tool_call_id=completion.id))
+            self._complete_step()
+            return AgentStep(content=f"{response.content or completion.args}\n\nCompleted Task: {current_plan_step}")
+
         # If no tools called, 
         if not tool_calls:
             # Record response in memory
@@ -146,55 +499,32 @@ class PlanAgent(BaseAgent):
         
         # If tools called, go to OBSERVE step and stream tool calls as AgentStep
         else:
-            tool_messages = []
-            observations = ""
-            for tool_call in tool_calls:
-                # Get function call info
-                function_name = tool_call.name
-                function_args = json.loads(tool_call.args)
-                tool_call_id = tool_call.id
-
-                # Iterate through provided tools to check if driver_response function call matches one
-                no_match_flag = True
-                for tool in self.tools:
-                    # If match, run tool function on arguments for result, and append to memory
-                    if tool.get_schema().name == function_name:
-                        no_match_flag = False
-                        function_result = str(tool.func(**function_args))
-                        
-                        # Otherwise, condense tool call result using LLM
-                        condense_prompt = f"""
-                        EXTRACT THE MOST RELAVANT INFO FROM THE FOLLOWING:
-
-                        {function_result}
-                        """
-                        condense_message = SystemMessage(role="system", content=condense_prompt)
-                        driver_input = DriverInput(
-                            messages=self._memory + [condense_message],
-                            temperature=0.0,
-                        )
-                        response = self.driver.generate(input=driver_input)
-                        observation = response.content
-
-                        # Put condensed result into tool message
-                        tool_message = ToolMessage(
-                            role="tool", 
-                            content=observation,
-                            tool_call_id=tool_call_id,
-                        )
-                        tool_messages.append(tool_message)
-
-                        # Add to overall observations
-                        observations += "\n\n" + observation
-                
-                # If driver_response function call matches none of the given tools
-                if no_match_flag:
-                    raise Exception("Driver called function, function call does not match any of the provided tools.")
-                
+            # Run tool calls (and their condense calls) concurrently, bounded by max_concurrency;
+            # results come back in order so each ToolMessage stays matched to its tool_call_id
+            batched: Set[str] = set()
+            tool_messages = yield _Parallel([self._tool_call(tool_call, current_plan_step, batched) for tool_call in tool_calls])
+            if batched:
+                tool_messages = yield from self._condense_batch(tool_messages, current_plan_step, batched)
+            observations = "".join("\n\n" + tool_message.content for tool_message in tool_messages)
+
             # Once tool messages has been obtained from the results of function calls, add to memory
-            self._memory.append(AssistantMessage(role="assistant", tool_calls=tool_calls))
-            self._memory += tool_messages
-            self._next_step = NextStep.OBSERVE
+            if completion is None:
+                self._memory.append(AssistantMessage(role="assistant", tool_calls=tool_calls))
+                self._memory.extend(tool_messages)
+                # With a merged step check, the next action call checks whether the step is complete -
+                # unless the model has kept calling tools without step_complete, then a separate check does
+                self._next_step = NextStep.OBSERVE
+                if self.step_check_mode == StepCheckMode.MERGED:
+                    self._unchecked_actions += 1
+                    if self._unchecked_actions < self.merged_check_after:
+                        self._next_step = NextStep.ACTION
+            else:
+                # step_complete called alongside the step's last tools: the step is complete once
+                # their results are in memory, without another driver call
+                self._memory.append(AssistantMessage(role="assistant", tool_calls=tool_calls + [completion]))
+                self._memory.extend(tool_messages)
+                self._memory.append(ToolMessage(role="tool", content="Step marked complete.", tool_call_id=completion.id))
+                self._complete_step()
 
             # Return string concatenated version of condensed tool call results
             tool_observe = f"""
@@ -205,55 +535,256 @@ class PlanAgent(BaseAgent):
             return AgentStep(content=tool_observe)
 
 
-    def _observe(self) -> AgentStep:
-        # Check if step has been completed
-        current_plan_step = self._initial_plan[self._current_plan_index]
-        step_check_prompt = f"""
-        DO YOU BELIEVE THAT THE CURRENT STEP HAS BEEN COMPLETED?
+    def _action_input(self, current_plan_step: str) -> DriverInput:
+        if self.step_check_mode == StepCheckMode.MERGED:
+            system_message = _MERGED_ACTION_PROMPT.render(step=current_plan_step, tool=self._step_complete_tool.name)
+        else:
+            system_message = _ACTION_PROMPT.render(step=current_plan_step)
+        return DriverInput(
+            memory=self._prompt_memory(current_plan_step),
+            messages=[SystemMessage(role="system", content=system_message)],
+            tools=self._prompt_tools(),
+            tool_choice=DriverToolChoice.AUTO,
+            temperature=0.0,
+        )
 
-        CURRENT STEP: {current_plan_step}
 
-        The output should be formatted as a JSON instance that conforms to the JSON schema below.
+    def _tool_call(self, tool_call: DriverToolCall, current_plan_step: str, batched: Set[str]) -> Generator[Any, Any, ToolMessage]:
+        # Get function call info
+        function_name = tool_call.name
+        tool_call_id = tool_call.id
+        try:
+            function_args = loads(tool_call.args)
+        except ValueError:
+            try:
+                function_args = loads(repair_json(tool_call.args))
+            except ValueError as e:
+                # Let the model correct its call rather than ending the run
+                return ToolMessage(role="tool", content=f"Error: arguments of {function_name} are not valid JSON ({e}).", tool_call_id=tool_call_id)
+
+        # Look up the provided tool matching the driver_response function call
+        tool = self._tool_index.get(function_name)
+        if tool is None:
+            # If driver_response function call matches none of the given tools
+            raise Exception("Driver called function, function call does not match any of the provided tools.")
+
+        # Run tool function on arguments for result
+        function_result = str((yield _CallTool(tool, tool.parse_args(function_args))))
+
+        # Condense tool call result (batched condensing happens once all tool calls are done)
+        if self.condense_mode == CondenseMode.OFF or len(function_result) < self.condense_min_chars:
+            observation = function_result
+        elif self.condense_mode == CondenseMode.LOCAL:
+            observation = condense_locally(function_result, current_plan_step, self.condense_max_chars)
+        elif self._needs_map_reduce(function_result):
+            observation = yield from self._map_reduce(function_result, current_plan_step)
+        elif self.condense_mode == CondenseMode.LLM:
+            driver_input = self._with_prompt_tools(condense_input(function_result, current_plan_step, self._condense_memory(current_plan_step)))
+            response = yield _Generate(driver_input, driver=self.condense_driver, phase="condense")
+            observation = response.content
+        else:
+            # Left for the batched condense call, along with the other results of the action
+            batched.add(tool_call_id)
+            observation = function_result
+
+        # Put condensed result into tool message
+        return ToolMessage(
+            role="tool", 
+            content=observation,
+            tool_call_id=tool_call_id,
+        )
 
-        As an example, for the schema {{"properties": {{"foo": {{"title": "Foo", "description": "a list of strings", "type": "array", "items": {{"type": "string"}}}}}}, "required": ["foo"]}}
-        the object {{"foo": ["bar", "baz"]}} is a well-formatted instance of the schema. The object {{"properties": {{"foo": ["bar", "baz"]}}}} is not well-formatted.
 
-        Here is the output schema:
-        ```
-        {StepCheck.model_json_schema()}
-        ```
-        """
-        driver_input = DriverInput(
-            messages=self._memory + [SystemMessage(role="system", content=step_check_prompt)],
+    def _condense_batch(self, tool_messages: List[ToolMessage], current_plan_step: str, batched: Set[str]) -> Generator[Any, Any, List[ToolMessage]]:
+        # Condense the results of an action left raw by _tool_call (not short, not map-reduced) in a single driver call
+        results = [
+            (tool_message.tool_call_id, tool_message.content) for tool_message in tool_messages
+            if tool_message.tool_call_id in batched
+        ]
+        driver_input = self._with_prompt_tools(batched_condense_input(results, current_plan_step, self._condense_memory(current_plan_step)))
+        response = yield _Generate(driver_input, driver=self.condense_driver, phase="condense")
+        condensed = parse_batched_condense(response.content, results, self.condense_max_chars)
+        return [
+            ToolMessage(role="tool", content=condensed.get(tool_message.tool_call_id, tool_message.content), tool_call_id=tool_message.tool_call_id)
+            for tool_message in tool_messages
+        ]
+
+
+    def _needs_map_reduce(self, result: str) -> bool:
+        # Results too long for one condense call, when condensing with the LLM (per result or batched)
+        if self.condense_chunk_tokens is None or self.condense_mode not in (CondenseMode.LLM, CondenseMode.BATCHED):
+            return False
+        # A token is at least a character, so short results need no counting
+        if len(result) <= self.condense_chunk_tokens:
+            return False
+        return (self.condense_driver or self.driver).count_tokens(result) > self.condense_chunk_tokens
+
+
+    def _map_reduce(self, result: str, current_plan_step: str) -> Generator[Any, Any, str]:
+        # Condense the chunks of a long result concurrently, then combine their notes fan_out at a time
+        driver = self.condense_driver or self.driver
+        chunks = split_chunks(result, self.condense_chunk_tokens, driver.count_tokens)
+        notes = yield _Parallel(
+            [self._map_chunk(chunk, index, len(chunks), current_plan_step) for index, chunk in enumerate(chunks, 1)],
+            limit=self.condense_fan_out,
+        )
+        notes = [note for note in notes if is_relevant(note)]
+        for _ in range(self.condense_max_depth):
+            if len(notes) <= 1:
+                break
+            groups = [notes[start:start + self.condense_fan_out] for start in range(0, len(notes), self.condense_fan_out)]
+            notes = yield _Parallel([self._reduce_notes(group, current_plan_step) for group in groups], limit=self.condense_fan_out)
+        if not notes:
+            return "Nothing relevant to the current step."
+        return "\n\n".join(notes)
+
+
+    def _map_chunk(self, chunk: str, index: int, total: int, current_plan_step: str) -> Generator[Any, Any, str]:
+        key = None
+        if self.condense_cache is not None:
+            model = (self.condense_driver or self.driver).model
+            key = hashlib.sha256(json.dumps([model, current_plan_step, chunk], ensure_ascii=False).encode("utf-8")).hexdigest()
+            cached = self.condense_cache.get(key)
+            if cached is not None:
+                return cached
+        response = yield _Generate(map_chunk_input(chunk, index, total, current_plan_step), driver=self.condense_driver, phase="condense")
+        if key is not None and response.content is not None:
+            self.condense_cache.set(key, response.content)
+        return response.content
+
+
+    def _reduce_notes(self, notes: List[str], current_plan_step: str) -> Generator[Any, Any, str]:
+        if len(notes) == 1:
+            return notes[0]
+        response = yield _Generate(reduce_input(notes, current_plan_step), driver=self.condense_driver, phase="condense")
+        return response.content
+
+
+    def _condense_memory(self, current_plan_step: str) -> Optional[DriverMemory]:
+        # A dedicated condense driver only gets the current step and the result, not the full history
+        return self._prompt_memory(current_plan_step) if self.condense_driver is None else None
+
+
+    def _prompt_memory(self, query: Optional[str] = None) -> DriverMemory:
+        # History sent with a prompt about query (the task if None) - all of it, unless retrieval picks the relevant part
+        if self._retriever is None:
+            return self._memory
+        return self._retriever.view(self._memory, query)
+
+
+    def _observe(self) -> Generator[Any, Any, AgentStep]:
+        # Check if step has been completed
+        current_plan_step = self._initial_plan[self._current_plan_index]
+        self._unchecked_actions = 0
+        driver_input = self._with_prompt_tools(DriverInput(
+            memory=self._prompt_memory(current_plan_step),
+            messages=[SystemMessage(role="system", content=_STEP_CHECK_PROMPT.render(step=current_plan_step))],
             temperature=0.0,
             response_format="json_object"
-        )
-        completed = self.driver.generate(input=driver_input)
-        completed = json.loads(completed.content)["complete"]
+        ))
+        # A speculative step check also makes the call that follows a completed step, at the same
+        # time - the check adds nothing to memory, so that call gets the same input either way
+        speculated = None
+        if self.step_check_mode == StepCheckMode.SPECULATIVE:
+            step_check, speculated = yield _Parallel([self._generate_structured(driver_input, StepCheck, phase="observe"), _single(self._following_generate())], limit=2)
+        else:
+            step_check = yield from self._generate_structured(driver_input, StepCheck, phase="observe")
+        completed = step_check.complete
 
         # If current step is completed, move on to next step
         if completed:
-            self._current_plan_index += 1
-
-            # If there are no more steps left, go to output
-            self._next_step = NextStep.ACTION
-            if self._current_plan_index >= len(self._initial_plan):
-                self._next_step = NextStep.OUTPUT
-            
+            self._complete_step()
+            if speculated is not None:
+                self._speculated = (self._next_step, self._current_plan_index, speculated)
             return AgentStep(content=f"Completed Task: {current_plan_step}")
         else:
+            # Otherwise keep working on the current step
+            self._next_step = NextStep.ACTION
             return AgentStep(content=f"Continuing Task: {current_plan_step}")
 
 
-    def _output(self) -> AgentResult:
-        # Check if step has been completed
-        result_prompt = f"""
-        GIVEN YOUR PROGRESS, PRODUCE A FINAL RESULT THAT BEST ANSWERS THE ORIGINAL USER TASK.
-        """
-        driver_input = DriverInput(
-            messages=self._memory + [SystemMessage(role="system", content=result_prompt)],
+    def _generate_structured(self, driver_input: DriverInput, model: type, stream: bool = False, phase: Optional[str] = None, response: Optional[DriverResponse] = None) -> Generator[Any, Any, BaseModel]:
+        # Structured outputs where the driver supports them, otherwise JSON mode checked against the model;
+        # response is one already made for driver_input, e.g. by a speculative step check
+        if self.driver.supports_structured_output():
+            driver_input.response_format = model
+        if response is None:
+            response = yield _Generate(driver_input, stream=stream, phase=phase)
+        for attempt in range(self.structured_retries + 1):
+            try:
+                return parse_model(response.content, model)
+            except StructuredOutputError as e:
+                if attempt == self.structured_retries:
+                    raise
+                # Ask again once the answer could not be repaired locally, showing what was wrong
+                retry_messages = driver_input.messages + [
+                    AssistantMessage(role="assistant", content=e.content if isinstance(e.content, str) else None),
+                    SystemMessage(role="system", content=_RETRY_PROMPT.render(error=e)),
+                ]
+                response = yield _Generate(driver_input.model_copy(update={"messages": retry_messages}), phase=phase)
+
+
+    def _complete_step(self) -> None:
+        self._current_plan_index += 1
+        self._unchecked_actions = 0
+
+        # If there are no more steps left, go to output
+        self._next_step = NextStep.ACTION
+        if self._current_plan_index >= len(self._initial_plan):
+            self._next_step = NextStep.OUTPUT
+
+
+    def _following_generate(self) -> _Generate:
+        # Driver call that comes after the current step is complete
+        next_index = self._current_plan_index + 1
+        if next_index < len(self._initial_plan):
+            return _Generate(self._action_input(self._initial_plan[next_index]), phase="action")
+        return _Generate(self._output_input(), phase="output")
+
+
+    def _take_speculated(self, next_step: NextStep) -> Optional[DriverResponse]:
+        # Response made ahead of time for this step, if any - it is used at most once
+        speculated, self._speculated = self._speculated, None
+        if speculated is not None and speculated[:2] == (next_step, self._current_plan_index):
+            return speculated[2]
+        return None
+
+
+    def _output(self) -> Generator[Any, Any, AgentResult]:
+        response = self._take_speculated(NextStep.OUTPUT)
+        driver_input = self._output_input()
+        if isinstance(self.response_format, type) and issubclass(self.response_format, BaseModel):
+            # Validated (and repaired or asked again) like the plan, so the result is always an instance
+            result = yield from self._generate_structured(driver_input, self.response_format, stream=True, phase="output", response=response)
+            return AgentResult(content=result)
+        if response is None:
+            response = yield _Generate(driver_input, stream=True, phase="output")
+        return AgentResult(content=response.content)
+
+
+    def _output_input(self) -> DriverInput:
+        return self._with_prompt_tools(DriverInput(
+            memory=self._prompt_memory(),
+            messages=[SystemMessage(role="system", content=_OUTPUT_PROMPT.render())],
             temperature=0.0,
             response_format=self.response_format,
-        )
-        response = self.driver.generate(input=driver_input)
-        return AgentResult(content=response.content)
\ No newline at end of file
+        ))
+
+
+    def _prompt_tools(self) -> Optional[List[BaseTool]]:
+        # Tools offered in actions, always in the same order
+        if self.step_check_mode == StepCheckMode.MERGED:
+            return (self.tools or []) + [self._step_complete_tool]
+        return self.tools
+
+
+    def _with_prompt_tools(self, driver_input: DriverInput) -> DriverInput:
+        # Providers cache prompts by prefix, and tools come before the messages: offering the
+        # action's tools on every call with history (with tool choice none outside actions)
+        # keeps the tools, description and history prefix the same from one call to the next
+        if self.stable_prompt_prefix and driver_input.memory is not None and driver_input.tools is None:
+            tools = self._prompt_tools()
+            if tools:
+                driver_input.tools = tools
+                driver_input.tool_choice = DriverToolChoice.NONE
+        return driver_input
\ No newline at end of file
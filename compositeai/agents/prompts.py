@@ -0,0 +1,53 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import functools
+import json
+import string
+import textwrap
+
+
+@functools.cache
+def schema_text(model: type) -> str:
+    """JSON schema of a pydantic model, serialized the same way every time"""
+    return json.dumps(model.model_json_schema(), sort_keys=True)
+
+
+class PromptTemplate:
+    """Prompt text with {field} placeholders, prepared once instead of on every call.
+
+    The text is dedented and split into literal parts and fields on first use. Constants
+    (values, or functions returning them, e.g. a JSON schema) are filled in at that point, so
+    rendering only joins the parts with the values that change between calls - and a template
+    without other fields renders the same string object every time.
+    """
+
+    def __init__(self, text: str, **constants: Union[Any, Callable[[], Any]]):
+        self.text = text
+        self.constants = constants
+        self._parts: Optional[List[Tuple[str, Optional[str]]]] = None
+
+    def render(self, **values: Any) -> str:
+        parts = self._parts if self._parts is not None else self._compile()
+        if len(parts) == 1 and parts[0][1] is None:
+            return parts[0][0]
+        return "".join(literal + (str(values[field]) if field is not None else "") for literal, field in parts)
+
+    def _compile(self) -> List[Tuple[str, Optional[str]]]:
+        constants: Dict[str, str] = {
+            name: str(value() if callable(value) else value) for name, value in self.constants.items()
+        }
+        parts = []
+        literal = ""
+        for text, field, spec, conversion in string.Formatter().parse(textwrap.dedent(self.text).strip()):
+            literal += text
+            if field is None:
+                continue
+            if spec or conversion:
+                raise ValueError(f"Prompt template field {field} cannot have a format spec or conversion.")
+            if field in constants:
+                literal += constants[field]
+            else:
+                parts.append((literal, field))
+                literal = ""
+        parts.append((literal, None))
+        self._parts = parts
+        return parts
\ No newline at end of file
@@ -0,0 +1,384 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from abc import abstractmethod
+from array import array
+from pydantic import BaseModel, Field, PrivateAttr
+import bisect
+import functools
+import itertools
+import json
+import math
+import os
+import re
+import sys
+import threading
+import zlib
+
+from compositeai.drivers.base_driver import (
+    DriverMemory,
+    DriverMessage,
+    DriverToolCall,
+    SystemMessage,
+    UserMessage,
+    AssistantMessage,
+    ToolMessage,
+)
+
+
+RETRIEVED_PREFIX = "RELEVANT OBSERVATIONS FROM EARLIER IN THE TASK:"
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+@functools.cache
+def _numpy() -> Any:
+    # numpy is optional and slow to import, so it is only imported once vectors are needed
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class BaseEmbedder(BaseModel):
+    @abstractmethod
+    def embed(self, texts: List[str]) -> Sequence[Sequence[float]]:
+        """One vector per text, embedded in as few calls as possible - implemented by subclass"""
+        raise NotImplementedError("Method must be implemented by a subclass")
+
+
+class HashingEmbedder(BaseEmbedder):
+    """Local embedding by feature hashing of words and word pairs, without a model or network calls.
+
+    Texts are similar when they share terms, not meaning - use a model embedder such as
+    OpenAIEmbedder to match observations worded differently from the step.
+    """
+    dimensions: int = Field(default=256, ge=1, description="Length of the vectors")
+
+
+    def embed(self, texts: List[str]) -> Sequence[Sequence[float]]:
+        # A term adds 1 to its column, or subtracts 1 with its code offset by dimensions
+        codes = [self._codes(text) for text in texts]
+        np = _numpy()
+        if np is None:
+            vectors = []
+            for text_codes in codes:
+                vector = [0.0] * self.dimensions
+                for code in text_codes:
+                    if code < self.dimensions:
+                        vector[code] += 1.0
+                    else:
+                        vector[code - self.dimensions] -= 1.0
+                vectors.append(vector)
+            return vectors
+        # Count every text's codes at once, in a row of 2 * dimensions cells per text
+        width = 2 * self.dimensions
+        rows = np.repeat(np.arange(len(texts)) * width, [len(text_codes) for text_codes in codes])
+        flat = np.fromiter(itertools.chain.from_iterable(codes), dtype=np.intp, count=len(rows))
+        counts = np.bincount(rows + flat, minlength=len(texts) * width).reshape(len(texts), 2, self.dimensions)
+        return (counts[:, 0] - counts[:, 1]).astype(np.float32)
+
+
+    def _codes(self, text: str) -> List[int]:
+        words = _WORD_PATTERN.findall(text.lower())
+        terms = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+        return [_term_code(term, self.dimensions) for term in terms]
+
+
+@functools.lru_cache(maxsize=65536)
+def _term_code(term: str, dimensions: int) -> int:
+    # crc32 rather than hash(), which changes between processes and would break saved indexes
+    digest = zlib.crc32(term.encode("utf-8"))
+    return digest % dimensions + (dimensions if digest & 0x80000000 else 0)
+
+
+class OpenAIEmbedder(BaseEmbedder):
+    """Embeddings from the OpenAI API, sent in batches of up to batch_size texts per request"""
+    model: str = Field(default="text-embedding-3-small", description="OpenAI embedding model")
+    dimensions: Optional[int] = Field(default=None, ge=1, description="Shortened vector length, the model's full length if None")
+    batch_size: int = Field(default=512, ge=1, description="Maximum texts per request")
+
+
+    def embed(self, texts: List[str]) -> Sequence[Sequence[float]]:
+        from compositeai.config import load_env
+        from compositeai.drivers.openai_driver import get_openai_client
+
+        load_env()
+        client = get_openai_client()
+        options = {"dimensions": self.dimensions} if self.dimensions is not None else {}
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            # The API rejects empty strings
+            batch = [text or " " for text in texts[start:start + self.batch_size]]
+            response = client.embeddings.create(model=self.model, input=batch, **options)
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return vectors
+
+
+class VectorIndex(BaseModel):
+    """In-process cosine similarity index, each vector stored with an item (any JSON value).
+
+    Vectors are normalized as they are added and kept as the columns of one float32 matrix
+    that grows by doubling, so a search is a single vector-matrix product and a partial sort.
+    With a sparse query (e.g. from HashingEmbedder), only the rows of its nonzero dimensions
+    are read. Uses numpy when it is installed, plain Python (much slower on large indexes)
+    otherwise.
+    """
+    dimensions: Optional[int] = Field(default=None, ge=1, description="Length of the vectors, taken from the first vectors added if None")
+    _matrix: Any = PrivateAttr(default=None)
+    _size: int = PrivateAttr(default=0)
+    _items: List[Any] = PrivateAttr(default_factory=list)
+
+
+    def __len__(self) -> int:
+        return self._size
+
+
+    def add(self, vectors: Sequence[Sequence[float]], items: List[Any]) -> None:
+        """Add vectors, items[i] being returned by searches matching vectors[i]"""
+        if len(vectors) != len(items):
+            raise ValueError(f"Got {len(vectors)} vectors for {len(items)} items.")
+        if not items:
+            return
+        np = _numpy()
+        if np is None:
+            rows = [_normalized([float(value) for value in vector]) for vector in vectors]
+            self._check_dimensions(len(rows[0]))
+            if any(len(row) != self.dimensions for row in rows):
+                raise ValueError(f"Vectors must all have {self.dimensions} dimensions.")
+            if self._matrix is None:
+                self._matrix = []
+            self._matrix.extend(rows)
+        else:
+            rows = np.asarray(vectors, dtype=np.float32)
+            if rows.ndim != 2:
+                raise ValueError(f"Vectors must all have {self.dimensions or rows.shape[-1]} dimensions.")
+            self._check_dimensions(rows.shape[1])
+            norms = np.linalg.norm(rows, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            end = self._size + len(rows)
+            if self._matrix is None or end > self._matrix.shape[1]:
+                capacity = max(end, 2 * (0 if self._matrix is None else self._matrix.shape[1]), 64)
+                matrix = np.zeros((self.dimensions, capacity), dtype=np.float32)
+                if self._matrix is not None:
+                    matrix[:, :self._size] = self._matrix[:, :self._size]
+                self._matrix = matrix
+            self._matrix[:, self._size:end] = (rows / norms).T
+        self._items.extend(items)
+        self._size += len(items)
+
+
+    def search(self, vector: Sequence[float], top_k: int, limit: Optional[int] = None) -> List[Tuple[float, Any]]:
+        """(cosine similarity, item) of the top_k closest vectors, best first
+
+        Only the first limit vectors added are searched, all of them if limit is None.
+        """
+        count = self._size if limit is None else max(0, min(limit, self._size))
+        if count == 0 or top_k <= 0:
+            return []
+        np = _numpy()
+        if np is None:
+            query = _normalized([float(value) for value in vector])
+            nonzero = [(dimension, value) for dimension, value in enumerate(query) if value]
+            scores = [sum(row[dimension] * value for dimension, value in nonzero) for row in self._matrix[:count]]
+            best = sorted(range(count), key=lambda index: -scores[index])[:top_k]
+            return [(scores[index], self._items[index]) for index in best]
+        query = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        query = query / norm
+        nonzero = np.flatnonzero(query)
+        if 2 * len(nonzero) < len(query):
+            # Rows of zero dimensions add nothing to the scores, and most of the time is spent reading the matrix
+            scores = query[nonzero] @ self._matrix[nonzero, :count]
+        else:
+            scores = query @ self._matrix[:, :count]
+        if top_k < count:
+            best = np.argpartition(scores, count - top_k)[count - top_k:]
+        else:
+            best = np.arange(count)
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(float(scores[index]), self._items[index]) for index in best]
+
+
+    def clear(self) -> None:
+        self._matrix = None
+        self._size = 0
+        self._items = []
+
+
+    def save(self, path: str) -> None:
+        """Write the index to a file: a JSON header line, then the vectors as little-endian float32"""
+        header = {"dimensions": self.dimensions, "count": self._size, "items": self._items}
+        np = _numpy()
+        if self._size == 0:
+            data = b""
+        elif np is None:
+            values = array("f", (value for row in self._matrix for value in row))
+            if sys.byteorder != "little":
+                values.byteswap()
+            data = values.tobytes()
+        else:
+            data = self._matrix[:, :self._size].T.astype("<f4").tobytes()
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(json.dumps(header, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n")
+            file.write(data)
+        os.replace(temporary, path)
+
+
+    @classmethod
+    def load(cls, path: str) -> "VectorIndex":
+        """Index written by save"""
+        with open(path, "rb") as file:
+            header = json.loads(file.readline())
+            data = file.read()
+        index = cls(dimensions=header["dimensions"])
+        count = header["count"]
+        if count == 0:
+            return index
+        np = _numpy()
+        if np is None:
+            values = array("f")
+            values.frombytes(data)
+            if sys.byteorder != "little":
+                values.byteswap()
+            dimensions = index.dimensions
+            index._matrix = [list(values[row * dimensions:(row + 1) * dimensions]) for row in range(count)]
+        else:
+            index._matrix = np.ascontiguousarray(np.frombuffer(data, dtype="<f4").reshape(count, index.dimensions).T, dtype=np.float32)
+        index._items = header["items"]
+        index._size = count
+        return index
+
+
+    def _check_dimensions(self, dimensions: int) -> None:
+        if self.dimensions is None:
+            self.dimensions = dimensions
+        elif dimensions != self.dimensions:
+            raise ValueError(f"Vectors must all have {self.dimensions} dimensions, got {dimensions}.")
+
+
+def _normalized(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else vector
+
+
+class RetrievalMemory(BaseModel):
+    """Sends an agent's prompts only the part of a long history relevant to the current step.
+
+    Prompts get the leading system/user messages (agent description, task and any summary of
+    compacted history), the most recent messages, and the top_k earlier observations most
+    similar to the current step - so prompt size stays about the same however long a run
+    gets. Observations are tool results and text answers, indexed by each run as they are added.
+    """
+    embedder: BaseEmbedder = Field(default_factory=HashingEmbedder, description="Embeds observations and queries")
+    top_k: int = Field(default=6, ge=0, description="Earlier observations retrieved for each prompt")
+    recent_messages: int = Field(default=6, ge=0, description="Number of most recent messages always sent as they are")
+    min_score: float = Field(default=0.0, ge=-1.0, le=1.0, description="Observations less similar to the query than this are never retrieved")
+
+
+    def retriever(self) -> "MemoryRetriever":
+        """Index for a single run"""
+        return MemoryRetriever(self)
+
+
+class MemoryRetriever:
+    """Keeps a VectorIndex of one run's observations in step with its memory"""
+
+    def __init__(self, settings: RetrievalMemory):
+        self.settings = settings
+        self.index = VectorIndex()
+        self._positions: List[int] = []
+        self._tool_calls: Dict[str, DriverToolCall] = {}
+        self._queries: Dict[str, Any] = {}
+        self._indexed = 0
+        self._version: Optional[int] = None
+        # Last view built, for the (version, length, retrieved positions) it was built for
+        self._view: Optional[Tuple[Tuple[int, int, Tuple[int, ...]], DriverMemory]] = None
+        self._retrieved_message: Optional[Tuple[Tuple[int, Tuple[int, ...]], SystemMessage]] = None
+        self._lock = threading.Lock()
+
+    def view(self, memory: DriverMemory, query: Optional[str] = None) -> DriverMemory:
+        """Memory to send in a prompt about query (the task if None)"""
+        head_end = _head_end(memory)
+        # Recent messages start at a turn, so no tool message is sent without its tool call
+        recent_start = max(head_end, len(memory) - self.settings.recent_messages)
+        while recent_start > head_end and isinstance(memory[recent_start], ToolMessage):
+            recent_start -= 1
+        with self._lock:
+            self._update(memory, head_end)
+            earlier = bisect.bisect_left(self._positions, recent_start)
+            # Nothing would be left out
+            if earlier <= self.settings.top_k:
+                return memory
+            if query is None:
+                query = next((message.content for message in reversed(memory[:head_end]) if isinstance(message, UserMessage)), "")
+            results = self.index.search(self._query_vector(query), self.settings.top_k, limit=earlier)
+            positions = tuple(sorted(position for score, position in results if score >= self.settings.min_score))
+            # The view only changes with memory and with what is retrieved, so prompts in between share
+            # it, along with the driver conversions cached in it
+            key = (memory.version, len(memory), positions)
+            if self._view is not None and self._view[0] == key:
+                return self._view[1]
+            inserted = [self._retrieved(memory, positions)] if positions else []
+            view = memory.derived(head_end, inserted, recent_start, base=self._view[1] if self._view is not None else None)
+            self._view = (key, view)
+        return view
+
+    def _retrieved(self, memory: DriverMemory, positions: Tuple[int, ...]) -> SystemMessage:
+        # The same observations give the same message object, so views can share its conversions
+        key = (memory.version, positions)
+        if self._retrieved_message is None or self._retrieved_message[0] != key:
+            # Texts are built again from memory rather than kept in the index, which would copy every content
+            observations = "\n\n".join(f"[{number}] {self._observation(memory[position])}" for number, position in enumerate(positions, 1))
+            self._retrieved_message = (key, SystemMessage(role="system", content=f"{RETRIEVED_PREFIX}\n\n{observations}"))
+        return self._retrieved_message[1]
+
+    def _update(self, memory: DriverMemory, head_end: int) -> None:
+        # Index messages added since the last update, or everything again if history was rewritten
+        if self._version != memory.version or len(memory) < self._indexed:
+            self.index.clear()
+            self._positions = []
+            self._tool_calls = {}
+            self._indexed = 0
+        positions = []
+        texts = []
+        for position in range(max(self._indexed, head_end), len(memory)):
+            text = self._observation(memory[position])
+            if text:
+                positions.append(position)
+                texts.append(text)
+        if texts:
+            # One embedding call for every new observation
+            self.index.add(self.settings.embedder.embed(texts), positions)
+            self._positions.extend(positions)
+        self._indexed = len(memory)
+        self._version = memory.version
+
+    def _observation(self, message: DriverMessage) -> Optional[str]:
+        if isinstance(message, AssistantMessage):
+            for tool_call in message.tool_calls or []:
+                self._tool_calls[tool_call.id] = tool_call
+            return message.content
+        if isinstance(message, ToolMessage):
+            tool_call = self._tool_calls.get(message.tool_call_id)
+            if tool_call is None:
+                return message.content
+            return f"{tool_call.name}({tool_call.args}):\n{message.content}"
+        return None
+
+    def _query_vector(self, query: str) -> Any:
+        # Each step is asked about several times, so its embedding is kept for the run
+        vector = self._queries.get(query)
+        if vector is None:
+            vector = self._queries[query] = self.settings.embedder.embed([query])[0]
+        return vector
+
+
+def _head_end(memory: DriverMemory) -> int:
+    # Leading description/task messages (and summaries of compacted history), always sent
+    head_end = 0
+    while head_end < len(memory) and isinstance(memory[head_end], (SystemMessage, UserMessage)):
+        head_end += 1
+    return head_end
\ No newline at end of file
@@ -0,0 +1,26 @@
+from enum import Enum
+
+from compositeai.tools import BaseTool
+
+
+class StepCheckMode(Enum):
+    # A separate step check call after every action
+    SEPARATE = 'separate'
+    # The action call offers a step_complete tool, called on its own or along with the step's last tools;
+    # a separate check only runs when the model answers without tools, or keeps calling tools without it
+    MERGED = 'merged'
+    # The step check runs at the same time as the action or output call that would come after it
+    SPECULATIVE = 'speculative'
+
+
+class StepCompleteTool(BaseTool):
+    name: str = "step_complete"
+    description: str = "Call this once the current step of the plan is complete, with a short summary of its outcome. It can be called together with the last tools the step needs."
+
+
+    def __init__(self, **data):
+        super().__init__(**data)
+
+
+    def func(self, summary: str) -> str:
+        return summary
\ No newline at end of file
@@ -0,0 +1,208 @@
+from typing import AsyncGenerator, Awaitable, Callable, Coroutine, Dict, Generator, List, Optional, Tuple, TypeVar, Union, Any
+from pydantic import BaseModel, Field, PrivateAttr
+import asyncio
+import re
+import threading
+
+from compositeai.agents.base_agent import AgentExecution, BaseAgent
+from compositeai.cache import BaseCache
+from compositeai.drivers import BaseDriver, CachedDriver
+from compositeai.tools import BaseTool
+from compositeai.tracing import BaseTracer
+
+
+T = TypeVar("T")
+
+
+class DelegationLimit(BaseModel):
+    """Bounds the sub-agent runs in flight at one delegation depth of a team.
+
+    A run holds its slot until it finishes, including while its own sub-agents run - which
+    is why a team has one limit per depth: a run only ever waits for slots deeper than its
+    own, so nested delegation cannot deadlock.
+    """
+    max_concurrency: int = Field(ge=1, description="Maximum runs at the same time")
+    _semaphore: threading.BoundedSemaphore = PrivateAttr()
+
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+
+
+    def run(self, func: Callable[[], T]) -> T:
+        """Call func once a slot is free"""
+        with self._semaphore:
+            return func()
+
+
+    async def arun(self, func: Callable[[], Awaitable[T]]) -> T:
+        """Async run - waits for a slot without blocking the event loop"""
+        # Threads block on the semaphore; coroutines poll it
+        while not self._semaphore.acquire(blocking=False):
+            await asyncio.sleep(0.01)
+        try:
+            return await func()
+        finally:
+            self._semaphore.release()
+
+
+class AgentTool(BaseTool):
+    """Exposes an agent as a tool, so that another agent can delegate sub-tasks to it.
+
+    Every call runs a fresh copy of the agent, so calls made at the same time do not share
+    history. With a limiter, shared by the tools of a team, calls wait for a free slot first.
+    """
+    agent: BaseAgent
+    limiter: Optional[DelegationLimit] = Field(default=None, description="Limits the agent runs in flight across every tool sharing it")
+
+
+    def __init__(self, **data):
+        # Named and described after the agent unless given
+        agent = data["agent"]
+        data.setdefault("name", re.sub(r"[^a-zA-Z0-9_-]", "_", agent.name)[:64])
+        data.setdefault("description", agent.description)
+        super().__init__(**data)
+
+
+    def func(self, task: str) -> str:
+        def _run() -> AgentExecution:
+            return self.agent.fresh_copy().execute(task=task)
+        try:
+            if self.limiter is None:
+                execution = _run()
+            else:
+                execution = self.limiter.run(_run)
+        except Exception as e:
+            return f"Error using {self.name}: {e!r}"
+        return _result_text(execution.result.content)
+
+
+    async def afunc(self, task: str) -> str:
+        def _run() -> Coroutine:
+            return self.agent.fresh_copy().aexecute(task=task)
+        try:
+            if self.limiter is None:
+                execution = await _run()
+            else:
+                execution = await self.limiter.arun(_run)
+        except Exception as e:
+            return f"Error using {self.name}: {e!r}"
+        return _result_text(execution.result.content)
+
+
+class AgentTeam(BaseModel):
+    """Runs a team of agents from its entry agent, the one with is_entry set.
+
+    Agents delegate sub-tasks to other agents through AgentTools - by default the entry
+    agent can delegate to every other agent, and delegates can describe any graph without
+    cycles. Sub-agent runs requested in the same action run at the same time, bounded by
+    max_concurrency at each delegation depth across the whole team (an agent's depth being
+    its longest chain of delegations from the entry agent). The agents given are not changed: the team runs
+    copies of them, sharing the team's caches and tracer.
+    """
+    agents: List[BaseAgent]
+    delegates: Optional[Dict[str, List[str]]] = Field(default=None, description="Names of the agents each agent can delegate to, by agent name")
+    max_concurrency: int = Field(default=4, ge=1, description="Maximum sub-agent runs at the same time at each delegation depth across the team")
+    tool_cache: Optional[BaseCache] = Field(default=None, description="Cache shared by every tool in the team that has none, including delegation to other agents")
+    response_cache: Optional[BaseCache] = Field(default=None, description="Cache of driver responses shared by every agent in the team")
+    tracer: Optional[BaseTracer] = Field(default=None, description="Receives the spans of every agent in the team that has no tracer")
+    _entry: BaseAgent = PrivateAttr()
+    _limits: List[DelegationLimit] = PrivateAttr(default_factory=list)
+    _depths: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        entries = [agent for agent in self.agents if agent.is_entry]
+        if len(entries) != 1:
+            raise ValueError(f"A team needs exactly one entry agent (is_entry=True), found {len(entries)}.")
+        names = [agent.name for agent in self.agents]
+        if len(set(names)) != len(names):
+            raise ValueError("Agents in a team must have unique names.")
+        delegates = self.delegates or {}
+        unknown = (set(delegates) | {name for targets in delegates.values() for name in targets}) - set(names)
+        if unknown:
+            raise ValueError(f"Delegates refer to agents not in the team: {sorted(unknown)}")
+        self._measure_depths(entries[0].name, ())
+        self._limits = [DelegationLimit(max_concurrency=self.max_concurrency) for _ in range(max(self._depths.values()))]
+        self._entry = self._build(entries[0].name, {})
+
+
+    @property
+    def entry(self) -> BaseAgent:
+        """The team's copy of the entry agent, with the tools delegating to other agents"""
+        return self._entry
+
+
+    def execute(self, task: str, input: Optional[str] = None, stream: bool = False, stream_tokens: bool = False, checkpoint_id: Optional[str] = None) -> Union[Generator, AgentExecution]:
+        """Run the team on a task through the entry agent - see BaseAgent.execute"""
+        return self._entry.fresh_copy().execute(task=task, input=input, stream=stream, stream_tokens=stream_tokens, checkpoint_id=checkpoint_id)
+
+
+    def aexecute(self, task: str, input: Optional[str] = None, stream: bool = False, checkpoint_id: Optional[str] = None) -> Union[AsyncGenerator, Coroutine]:
+        """Async counterpart of execute - see BaseAgent.aexecute"""
+        return self._entry.fresh_copy().aexecute(task=task, input=input, stream=stream, checkpoint_id=checkpoint_id)
+
+
+    def _delegate_names(self, agent: BaseAgent) -> List[str]:
+        if self.delegates is not None:
+            return self.delegates.get(agent.name, [])
+        if agent.is_entry:
+            return [other.name for other in self.agents if other is not agent]
+        return []
+
+
+    def _measure_depths(self, name: str, path: Tuple[str, ...]) -> None:
+        # Longest chain of delegations from the entry agent to each agent it can reach
+        if name in path:
+            raise ValueError(f"Agents delegate to each other in a cycle: {' -> '.join(path + (name,))}")
+        if self._depths.get(name, -1) >= len(path):
+            return
+        self._depths[name] = len(path)
+        agent = next(agent for agent in self.agents if agent.name == name)
+        for delegate in self._delegate_names(agent):
+            self._measure_depths(delegate, path + (name,))
+
+
+    def _build(self, name: str, built: Dict[str, BaseAgent]) -> BaseAgent:
+        # Copy of the named agent with the team's caches and tools for its delegates, built depth first
+        if name in built:
+            return built[name]
+        agent = next(agent for agent in self.agents if agent.name == name)
+        # Runs of a delegate take a slot of its own depth, always deeper than the delegating agent's
+        delegates = [
+            AgentTool(agent=self._build(delegate, built), limiter=self._limits[self._depths[delegate] - 1])
+            for delegate in self._delegate_names(agent)
+        ]
+        update: Dict[str, Any] = {
+            "tools": [self._with_cache(tool) for tool in (agent.tools or []) + delegates] or None,
+            "driver": self._with_response_cache(agent.driver),
+        }
+        if self.tracer is not None and agent.tracer is None:
+            update["tracer"] = self.tracer
+        # Let sub-agents requested in one action run at the same time
+        if delegates and "max_concurrency" in type(agent).model_fields:
+            update["max_concurrency"] = max(agent.max_concurrency, self.max_concurrency)
+        copy = agent.model_copy(update=update)
+        copy.reset()
+        built[name] = copy
+        return copy
+
+
+    def _with_cache(self, tool: BaseTool) -> BaseTool:
+        if self.tool_cache is None or tool.cache is not None:
+            return tool
+        return tool.model_copy(update={"cache": self.tool_cache})
+
+
+    def _with_response_cache(self, driver: BaseDriver) -> BaseDriver:
+        if self.response_cache is None or isinstance(driver, CachedDriver):
+            return driver
+        return CachedDriver(driver=driver, cache=self.response_cache)
+
+
+def _result_text(content: Any) -> str:
+    if isinstance(content, BaseModel):
+        return content.model_dump_json()
+    return str(content)
\ No newline at end of file
@@ -0,0 +1,150 @@
+from typing import Dict, Optional
+from abc import abstractmethod
+from pydantic import BaseModel, Field, PrivateAttr
+import hashlib
+import sqlite3
+import threading
+import zlib
+
+
+# First byte of a stored blob: how the rest of it is encoded
+_RAW = b"r"
+_ZLIB = b"z"
+
+
+class BlobStats(BaseModel):
+    puts: int = Field(default=0, description="Contents stored, including ones already in the store")
+    deduplicated: int = Field(default=0, description="Puts of a content that was already in the store")
+    gets: int = Field(default=0, description="Contents read back")
+    stored_bytes: int = Field(default=0, description="Bytes written by this process, after compression")
+
+
+class BaseBlobStore(BaseModel):
+    """Content-addressed store for large message contents, kept out of the agents' memory.
+
+    Contents are keyed by their sha256 digest, so identical contents (e.g. the same page
+    fetched by many runs) are stored once, and compressed with zlib unless that does not make
+    them smaller. One store is meant to be shared by every agent in a process; blobs are not
+    removed one by one, as any run may still refer to them.
+    """
+    compress_level: int = Field(default=1, ge=0, le=9, description="zlib level for stored contents, 0 to store them uncompressed")
+    stats: BlobStats = Field(default_factory=BlobStats)
+    _stats_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def put(self, content: str) -> str:
+        """Store content and return its digest"""
+        data = content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        stored = 0
+        if not self._contains(digest):
+            blob = self._encode(data)
+            if self._put(digest, blob):
+                stored = len(blob)
+        with self._stats_lock:
+            self.stats.puts += 1
+            self.stats.deduplicated += not stored
+            self.stats.stored_bytes += stored
+        return digest
+
+    def get(self, digest: str) -> str:
+        """Content stored under digest - raises KeyError if there is none"""
+        blob = self._get(digest)
+        if blob is None:
+            raise KeyError(digest)
+        with self._stats_lock:
+            self.stats.gets += 1
+        data = blob[1:]
+        if blob[:1] == _ZLIB:
+            data = zlib.decompress(data)
+        return data.decode("utf-8")
+
+    def _encode(self, data: bytes) -> bytes:
+        if self.compress_level:
+            compressed = zlib.compress(data, self.compress_level)
+            if len(compressed) < len(data):
+                return _ZLIB + compressed
+        return _RAW + data
+
+    @abstractmethod
+    def _contains(self, digest: str) -> bool:
+        """Whether a blob is stored under digest - implemented by subclass"""
+        raise NotImplementedError("Method must be implemented by a subclass")
+
+    @abstractmethod
+    def _put(self, digest: str, blob: bytes) -> bool:
+        """Store blob under digest unless there is one already - returns whether it was stored - implemented by subclass"""
+        raise NotImplementedError("Method must be implemented by a subclass")
+
+    @abstractmethod
+    def _get(self, digest: str) -> Optional[bytes]:
+        """Blob stored under digest, or None - implemented by subclass"""
+        raise NotImplementedError("Method must be implemented by a subclass")
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every blob, once no agent refers to them anymore"""
+        raise NotImplementedError("Method must be implemented by a subclass")
+
+
+class MemoryBlobStore(BaseBlobStore):
+    """In-process store - contents stay in memory, but deduplicated and compressed"""
+    _blobs: Dict[str, bytes] = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def _contains(self, digest: str) -> bool:
+        return digest in self._blobs
+
+    def _put(self, digest: str, blob: bytes) -> bool:
+        with self._lock:
+            if digest in self._blobs:
+                return False
+            self._blobs[digest] = blob
+            return True
+
+    def _get(self, digest: str) -> Optional[bytes]:
+        return self._blobs.get(digest)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._blobs.clear()
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+
+class SQLiteBlobStore(BaseBlobStore):
+    """Blobs in a SQLite database file, read back from disk (or the OS page cache) when a request is sent"""
+    path: str = Field(default=".compositeai_blobs.sqlite3", description="Path of the SQLite database file")
+    _connection: sqlite3.Connection = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        # Spilled contents are only needed while the process runs, so writes are not synced to disk
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=OFF")
+        with self._lock, self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, blob BLOB NOT NULL)")
+
+    def _contains(self, digest: str) -> bool:
+        with self._lock:
+            return self._connection.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone() is not None
+
+    def _put(self, digest: str, blob: bytes) -> bool:
+        with self._lock, self._connection:
+            cursor = self._connection.execute("INSERT OR IGNORE INTO blobs (digest, blob) VALUES (?, ?)", (digest, blob))
+            return cursor.rowcount > 0
+
+    def _get(self, digest: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._connection.execute("SELECT blob FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        return row[0] if row is not None else None
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM blobs")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
\ No newline at end of file
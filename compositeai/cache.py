@@ -0,0 +1,126 @@
+from typing import Optional
+from abc import abstractmethod
+from collections import OrderedDict
+from pydantic import BaseModel, Field, PrivateAttr
+import sqlite3
+import threading
+import time
+
+
+class CacheStats(BaseModel):
+    hits: int = Field(default=0, description="Number of lookups that found a live entry")
+    misses: int = Field(default=0, description="Number of lookups that found no live entry")
+    shared: int = Field(default=0, description="Number of misses served by an identical call already in flight")
+    saved_seconds: float = Field(default=0.0, description="Time the original calls took for every hit and shared miss")
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class BaseCache(BaseModel):
+    ttl: Optional[float] = Field(default=None, gt=0, description="Seconds before an entry expires (never if None)")
+    stats: CacheStats = Field(default_factory=CacheStats)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the value stored for key, or None if missing or expired"""
+        value = self._get(key)
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """Store value for key, expiring after ttl seconds"""
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        self._set(key, value, expires_at)
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        """Backend lookup that ignores expired entries - implemented by subclass"""
+        raise NotImplementedError("Method must be implemented by a subclass")
+
+    @abstractmethod
+    def _set(self, key: str, value: str, expires_at: Optional[float]) -> None:
+        """Backend store - implemented by subclass"""
+        raise NotImplementedError("Method must be implemented by a subclass")
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry from the cache"""
+        raise NotImplementedError("Method must be implemented by a subclass")
+
+
+class MemoryCache(BaseCache):
+    """In-process LRU cache"""
+    max_size: int = Field(default=1024, ge=1, description="Maximum number of entries kept before evicting the least recently used")
+    _entries: OrderedDict = PrivateAttr(default_factory=OrderedDict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key: str, value: str, expires_at: Optional[float]) -> None:
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache(BaseCache):
+    """On-disk cache that persists across processes"""
+    path: str = Field(default=".compositeai_cache.sqlite3", description="Path of the SQLite database file")
+    _connection: sqlite3.Connection = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= time.time():
+                with self._connection:
+                    self._connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            return value
+
+    def _set(self, key: str, value: str, expires_at: Optional[float]) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM cache")
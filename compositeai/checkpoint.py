@@ -0,0 +1,200 @@
+from typing import Any, Dict, List, Optional, Tuple
+from abc import abstractmethod
+from pydantic import BaseModel, Field, PrivateAttr
+import json
+import os
+import pathlib
+import re
+import sqlite3
+import threading
+
+from compositeai.drivers.base_driver import (
+    DriverMemory,
+    DriverMessage,
+    SystemMessage,
+    UserMessage,
+    AssistantMessage,
+    ToolMessage,
+)
+
+
+_MESSAGE_CLASSES = {
+    "system": SystemMessage,
+    "user": UserMessage,
+    "assistant": AssistantMessage,
+    "tool": ToolMessage,
+}
+
+
+def message_to_dict(message: DriverMessage) -> Dict[str, Any]:
+    return message.model_dump(mode="json", exclude_none=True)
+
+
+def message_from_dict(data: Dict[str, Any]) -> DriverMessage:
+    return _MESSAGE_CLASSES[data["role"]].model_validate(data)
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+class BaseCheckpointStore(BaseModel):
+    """Stores the history and state of agent runs, keyed by checkpoint ID.
+
+    History is written incrementally: each save appends only the messages added since the
+    previous one, unless the history was rewritten (e.g. compacted), which replaces it.
+    """
+
+    @abstractmethod
+    def write(self, checkpoint_id: str, messages: List[Dict[str, Any]], state: Dict[str, Any], replace: bool) -> None:
+        """Append messages (or replace all messages if replace) and set the state - implemented by subclass"""
+        raise NotImplementedError("Method must be implemented by a subclass")
+
+    @abstractmethod
+    def load(self, checkpoint_id: str) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        """Messages and latest state of a checkpoint, or None if there is none - implemented by subclass"""
+        raise NotImplementedError("Method must be implemented by a subclass")
+
+    @abstractmethod
+    def delete(self, checkpoint_id: str) -> None:
+        """Remove a checkpoint - implemented by subclass"""
+        raise NotImplementedError("Method must be implemented by a subclass")
+
+
+class FileCheckpointStore(BaseCheckpointStore):
+    """One JSON lines file per checkpoint, appended to after each iteration"""
+    directory: str = Field(default=".compositeai_checkpoints", description="Directory holding the checkpoint files")
+    fsync: bool = Field(default=False, description="Flush every write to disk before returning")
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def write(self, checkpoint_id: str, messages: List[Dict[str, Any]], state: Dict[str, Any], replace: bool) -> None:
+        # Lines are {"m": message} or {"s": state}; the last state line wins
+        lines = "".join(_dumps({"m": message}) + "\n" for message in messages) + _dumps({"s": state}) + "\n"
+        path = self._path(checkpoint_id)
+        with self._lock:
+            if replace:
+                temporary = path.with_suffix(".tmp")
+                with open(temporary, "w", encoding="utf-8") as file:
+                    file.write(lines)
+                    self._sync(file)
+                os.replace(temporary, path)
+            else:
+                with open(path, "a", encoding="utf-8") as file:
+                    file.write(lines)
+                    self._sync(file)
+
+    def load(self, checkpoint_id: str) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        path = self._path(checkpoint_id)
+        if not path.exists():
+            return None
+        messages = []
+        state = None
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut off by a crash mid-write, only possible at the end of the file
+                    break
+                if "m" in entry:
+                    messages.append(entry["m"])
+                else:
+                    state = entry["s"]
+        # Messages after the last state belong to a save that did not complete
+        if state is None:
+            return None
+        return messages[:state["messages"]], state
+
+    def delete(self, checkpoint_id: str) -> None:
+        with self._lock:
+            self._path(checkpoint_id).unlink(missing_ok=True)
+
+    def _path(self, checkpoint_id: str) -> pathlib.Path:
+        return pathlib.Path(self.directory) / (re.sub(r"[^A-Za-z0-9_.-]", "_", checkpoint_id) + ".jsonl")
+
+    def _sync(self, file: Any) -> None:
+        if self.fsync:
+            file.flush()
+            os.fsync(file.fileno())
+
+
+class SQLiteCheckpointStore(BaseCheckpointStore):
+    """Checkpoints in a SQLite database, one row per message"""
+    path: str = Field(default=".compositeai_checkpoints.sqlite3", description="Path of the SQLite database file")
+    _connection: sqlite3.Connection = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoint_messages (checkpoint_id TEXT NOT NULL, position INTEGER NOT NULL, message TEXT NOT NULL, PRIMARY KEY (checkpoint_id, position))"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoint_states (checkpoint_id TEXT PRIMARY KEY, state TEXT NOT NULL)"
+            )
+
+    def write(self, checkpoint_id: str, messages: List[Dict[str, Any]], state: Dict[str, Any], replace: bool) -> None:
+        # Messages and state are written in one transaction
+        start = state["messages"] - len(messages)
+        with self._lock, self._connection:
+            if replace:
+                self._connection.execute("DELETE FROM checkpoint_messages WHERE checkpoint_id = ?", (checkpoint_id,))
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO checkpoint_messages (checkpoint_id, position, message) VALUES (?, ?, ?)",
+                [(checkpoint_id, start + offset, _dumps(message)) for offset, message in enumerate(messages)],
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO checkpoint_states (checkpoint_id, state) VALUES (?, ?)",
+                (checkpoint_id, _dumps(state)),
+            )
+
+    def load(self, checkpoint_id: str) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT state FROM checkpoint_states WHERE checkpoint_id = ?", (checkpoint_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            state = json.loads(row[0])
+            rows = self._connection.execute(
+                "SELECT message FROM checkpoint_messages WHERE checkpoint_id = ? AND position < ? ORDER BY position",
+                (checkpoint_id, state["messages"]),
+            ).fetchall()
+        return [json.loads(message) for message, in rows], state
+
+    def delete(self, checkpoint_id: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM checkpoint_messages WHERE checkpoint_id = ?", (checkpoint_id,))
+            self._connection.execute("DELETE FROM checkpoint_states WHERE checkpoint_id = ?", (checkpoint_id,))
+
+
+class CheckpointWriter:
+    """Saves one run to a store, writing only what changed since the previous save"""
+
+    def __init__(self, store: BaseCheckpointStore, checkpoint_id: str):
+        self.store = store
+        self.checkpoint_id = checkpoint_id
+        self._written = 0
+        self._version: Optional[int] = None
+
+    def save(self, memory: DriverMemory, state: Dict[str, Any]) -> None:
+        # Rewritten history (or a first save) replaces the stored messages instead of appending
+        replace = self._version != memory.version or len(memory) < self._written
+        start = 0 if replace else self._written
+        messages = [message_to_dict(message) for message in memory[start:]]
+        self.store.write(self.checkpoint_id, messages, {**state, "messages": len(memory)}, replace)
+        self._written = len(memory)
+        self._version = memory.version
+
+    def resumed(self, memory: DriverMemory) -> None:
+        """Mark memory restored from the store as already written"""
+        self._written = len(memory)
+        # The next save still replaces the stored history: appends would follow whatever an
+        # interrupted save left after the last complete one, e.g. a torn line that ends loading
+        self._version = None
\ No newline at end of file
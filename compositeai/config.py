@@ -0,0 +1,28 @@
+from typing import Optional
+import os
+import threading
+
+
+_env_loaded = False
+_env_lock = threading.Lock()
+
+
+def load_env() -> None:
+    """Load a .env file from the working directory (or a parent) into os.environ, once per process.
+
+    Variables already set in the environment are not overridden.
+    """
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _env_lock:
+        if not _env_loaded:
+            from dotenv import find_dotenv, load_dotenv
+            load_dotenv(find_dotenv(usecwd=True))
+            _env_loaded = True
+
+
+def get_env(name: str, default: Optional[str] = None) -> Optional[str]:
+    """Environment variable, after loading the .env file the first time"""
+    load_env()
+    return os.getenv(name, default)
\ No newline at end of file
@@ -1,12 +1,59 @@
-from compositeai.drivers.base_driver import (
-    DriverMessage,
-    DriverToolChoice,
-    DriverToolCall,
-    DriverInput,
-    BaseDriver,
-    SystemMessage,
-    UserMessage,
-    AssistantMessage,
-    ToolMessage,
-)
-from compositeai.drivers.openai_driver import OpenAIDriver
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+from compositeai._lazy import lazy_exports
+
+
+_EXPORTS = {
+    "DriverMessage": "compositeai.drivers.base_driver",
+    "DriverToolChoice": "compositeai.drivers.base_driver",
+    "DriverPriority": "compositeai.drivers.base_driver",
+    "DriverToolCall": "compositeai.drivers.base_driver",
+    "DriverToolCallChunk": "compositeai.drivers.base_driver",
+    "DriverResponse": "compositeai.drivers.base_driver",
+    "DriverResponseChunk": "compositeai.drivers.base_driver",
+    "DriverUsage": "compositeai.drivers.base_driver",
+    "DriverInput": "compositeai.drivers.base_driver",
+    "DriverMemory": "compositeai.drivers.base_driver",
+    "BaseDriver": "compositeai.drivers.base_driver",
+    "SystemMessage": "compositeai.drivers.base_driver",
+    "UserMessage": "compositeai.drivers.base_driver",
+    "AssistantMessage": "compositeai.drivers.base_driver",
+    "ToolMessage": "compositeai.drivers.base_driver",
+    "RequestScheduler": "compositeai.drivers.scheduler",
+    "SchedulerStats": "compositeai.drivers.scheduler",
+    "OpenAIDriver": "compositeai.drivers.openai_driver",
+    "get_openai_client": "compositeai.drivers.openai_driver",
+    "get_async_openai_client": "compositeai.drivers.openai_driver",
+    "OpenAIBatchDriver": "compositeai.drivers.openai_batch_driver",
+    "BatchStats": "compositeai.drivers.openai_batch_driver",
+    "CachedDriver": "compositeai.drivers.cached_driver",
+    "MockDriver": "compositeai.drivers.mock_driver",
+    "RecordingDriver": "compositeai.drivers.mock_driver",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+if TYPE_CHECKING:
+    from compositeai.drivers.base_driver import (
+        DriverMessage,
+        DriverToolChoice,
+        DriverPriority,
+        DriverToolCall,
+        DriverToolCallChunk,
+        DriverResponse,
+        DriverResponseChunk,
+        DriverUsage,
+        DriverInput,
+        DriverMemory,
+        BaseDriver,
+        SystemMessage,
+        UserMessage,
+        AssistantMessage,
+        ToolMessage,
+    )
+    from compositeai.drivers.scheduler import RequestScheduler, SchedulerStats
+    from compositeai.drivers.openai_driver import OpenAIDriver, get_openai_client, get_async_openai_client
+    from compositeai.drivers.openai_batch_driver import OpenAIBatchDriver, BatchStats
+    from compositeai.drivers.cached_driver import CachedDriver
+    from compositeai.drivers.mock_driver import MockDriver, RecordingDriver
\ No newline at end of file
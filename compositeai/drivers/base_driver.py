@@ -1,10 +1,17 @@
-from typing import Optional, List, Literal, Any
+from typing import TYPE_CHECKING, Callable, Dict, Generator, Iterator, Optional, List, Literal, Any, Union
 from abc import abstractmethod
-from pydantic import BaseModel, Field
+import asyncio
+import hashlib
+import json
+import threading
+from pydantic import BaseModel, Field, PrivateAttr
 from enum import Enum
 
 from compositeai.tools import BaseTool
 
+if TYPE_CHECKING:
+    from compositeai.blobs import BaseBlobStore
+
 
 ##### Classes relating to the response info of a driver
 
@@ -12,6 +19,7 @@ class DriverUsage(BaseModel):
     completion_tokens: int = Field("Completion tokens used for LLM response", ge=0)
     prompt_tokens: int = Field("Prompt tokens used to generate LLM response", ge=0)
     total_tokens: int = Field("Total tokens used to generate LLM response", ge=0)
+    cached_tokens: int = Field(default=0, ge=0, description="Prompt tokens served from the provider's prompt cache")
 
 
 class DriverToolCall(BaseModel):
@@ -24,6 +32,19 @@ class DriverResponse(BaseModel):
     content: Optional[Any] = Field(default=None, description="Text generated by the LLM")
     tool_calls: Optional[List[DriverToolCall]] = Field(default=None, description="Tool calls from the LLM")
     usage: DriverUsage = Field("Usage data to generate LLM response")
+    cached: bool = Field(default=False, description="Whether the response was reused from a cache")
+
+
+class DriverToolCallChunk(BaseModel):
+    index: int = Field(description="Position of the tool call this fragment belongs to")
+    id: Optional[str] = Field(default=None, description="ID of tool call, sent with the first fragment")
+    name: Optional[str] = Field(default=None, description="Name of tool/function called, sent with the first fragment")
+    args: str = Field(default="", description="Fragment of the JSON string of arguments")
+
+
+class DriverResponseChunk(BaseModel):
+    content: Optional[str] = Field(default=None, description="Incremental text generated by the LLM")
+    tool_calls: Optional[List[DriverToolCallChunk]] = Field(default=None, description="Incremental tool call fragments from the LLM")
 
 
 ##### Classes relating to the input data for a driver
@@ -63,13 +84,190 @@ class DriverToolChoice(Enum):
     REQUIRED = 'required'
 
 
+class DriverPriority(Enum):
+    # Requests of runs a user is waiting on are scheduled before batch work
+    INTERACTIVE = 'interactive'
+    BATCH = 'batch'
+
+
+class _SpilledMessage:
+    """Message whose content is in a blob store: its class, its other fields and the content digest"""
+    __slots__ = ("message_class", "fields", "digest")
+
+    def __init__(self, message_class: type, fields: Dict[str, Any], digest: str):
+        self.message_class = message_class
+        self.fields = fields
+        self.digest = digest
+
+
+class DriverMemory(BaseModel):
+    """Append-only conversation history shared across driver calls.
+
+    Drivers cache their converted form of each message here, so a call only converts
+    messages added since the previous call instead of the whole history.
+
+    With a blob store, contents of at least blob_min_chars characters are kept in the store
+    instead, and read back only when a message is accessed, e.g. while a driver converts the
+    history for a request. Conversions that keep the content are then not cached for those
+    messages, so the content does not stay in memory through them either.
+    """
+    _messages: List[Union[DriverMessage, _SpilledMessage]] = PrivateAttr(default_factory=list)
+    _converted: Dict[str, List[Any]] = PrivateAttr(default_factory=dict)
+    _hasher: Any = PrivateAttr(default_factory=hashlib.sha256)
+    _hashed: int = PrivateAttr(default=0)
+    _version: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _blob_store: Any = PrivateAttr(default=None)
+    _blob_min_chars: int = PrivateAttr(default=0)
+
+    def __init__(self, messages: Optional[List[DriverMessage]] = None, blob_store: Optional["BaseBlobStore"] = None, blob_min_chars: int = 4096, **data):
+        super().__init__(**data)
+        self._blob_store = blob_store
+        self._blob_min_chars = blob_min_chars
+        if messages:
+            self.extend(messages)
+
+    def __iter__(self) -> Iterator[DriverMessage]:
+        return (self._load(entry) for entry in list(self._messages))
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._load(entry) for entry in self._messages[index]]
+        return self._load(self._messages[index])
+
+    @property
+    def version(self) -> int:
+        """Incremented whenever existing messages are replaced, i.e. the history stops being append-only"""
+        return self._version
+
+    def append(self, message: DriverMessage) -> None:
+        # Contents go to the blob store before the lock is taken
+        entry = self._store(message)
+        with self._lock:
+            self._messages.append(entry)
+
+    def extend(self, messages: List[DriverMessage]) -> None:
+        entries = [self._store(message) for message in messages]
+        with self._lock:
+            self._messages.extend(entries)
+
+    def replace(self, start: int, end: int, messages: List[DriverMessage]) -> None:
+        """Replace the history between start and end, e.g. when compacting older messages into a summary"""
+        with self._lock:
+            self._messages[start:end] = [self._store(message) for message in messages]
+            # Conversions before start are still valid; the running hash has to start over
+            for converted in self._converted.values():
+                del converted[start:]
+            self._hasher = hashlib.sha256()
+            self._hashed = 0
+            self._version += 1
+
+    def derived(self, head_end: int, inserted: List[DriverMessage], start: int, base: Optional["DriverMemory"] = None) -> "DriverMemory":
+        """New memory of the messages before head_end, then inserted, then the messages from start on
+
+        Contents in the blob store stay there instead of being read back, and conversions made
+        in base (e.g. the previous memory derived this way) are kept for the messages the new
+        memory starts with that base also holds.
+        """
+        derived = DriverMemory(blob_store=self._blob_store, blob_min_chars=self._blob_min_chars)
+        inserted_entries = [self._store(message) for message in inserted]
+        with self._lock:
+            derived._messages = self._messages[:head_end] + inserted_entries + self._messages[start:]
+        if base is not None:
+            with base._lock:
+                # Entries are shared between memories, so the same object is the same message
+                positions = {id(entry): position for position, entry in enumerate(base._messages)}
+                for key, converted in base._converted.items():
+                    kept = []
+                    for entry in derived._messages:
+                        position = positions.get(id(entry))
+                        if position is None or position >= len(converted):
+                            break
+                        kept.append(converted[position])
+                    derived._converted[key] = kept
+        return derived
+
+    def converted(self, key: str, convert: Callable[[List[DriverMessage]], List[Any]], keeps_content: bool = True) -> List[Any]:
+        """Converted form of the whole history, running convert only on messages not yet seen under key
+
+        convert maps each message on its own, so conversions stay valid wherever the message is.
+        keeps_content says whether converted messages hold their content (e.g. request payloads
+        rather than token counts); such conversions of messages in the blob store are redone
+        on every call instead of being cached.
+        """
+        with self._lock:
+            converted = self._converted.setdefault(key, [])
+            # Conversions of spilled messages made by this call, by index
+            fresh: Dict[int, Any] = {}
+            if len(converted) < len(self._messages):
+                start = len(converted)
+                entries = self._messages[start:]
+                results = convert([self._load(entry) for entry in entries])
+                if keeps_content:
+                    # Spilled messages are cached as themselves, to be converted again when needed
+                    fresh = {start + offset: result for offset, (entry, result) in enumerate(zip(entries, results)) if isinstance(entry, _SpilledMessage)}
+                    results = [entry if isinstance(entry, _SpilledMessage) else result for entry, result in zip(entries, results)]
+                converted.extend(results)
+            if not keeps_content:
+                return converted
+            spilled = [index for index, entry in enumerate(converted) if isinstance(entry, _SpilledMessage) and index not in fresh]
+            if not spilled and not fresh:
+                return converted
+            results = list(converted)
+            results_by_index = dict(fresh)
+            if spilled:
+                # Older spilled messages are converted again in one call, like new messages
+                results_by_index.update(zip(spilled, convert([self._load(converted[index]) for index in spilled])))
+            for index, result in results_by_index.items():
+                results[index] = result
+            return results
+
+    def hasher(self) -> Any:
+        """Copy of a running sha256 over the serialized history, ready to be extended with more messages"""
+        with self._lock:
+            for entry in self._messages[self._hashed:]:
+                update_message_hash(self._hasher, self._load(entry))
+            self._hashed = len(self._messages)
+            return self._hasher.copy()
+
+    def _store(self, message: DriverMessage) -> Union[DriverMessage, _SpilledMessage]:
+        content = getattr(message, "content", None)
+        if self._blob_store is None or not isinstance(content, str) or len(content) < self._blob_min_chars:
+            return message
+        fields = {name: getattr(message, name) for name in type(message).model_fields if name != "content"}
+        return _SpilledMessage(type(message), fields, self._blob_store.put(content))
+
+    def _load(self, entry: Union[DriverMessage, _SpilledMessage]) -> DriverMessage:
+        if not isinstance(entry, _SpilledMessage):
+            return entry
+        # Fields were validated when the message was created
+        return entry.message_class.model_construct(**entry.fields, content=self._blob_store.get(entry.digest))
+
+
+def update_message_hash(hasher: Any, message: DriverMessage) -> None:
+    serialized = json.dumps(message.model_dump(mode="json"), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    hasher.update(serialized.encode("utf-8"))
+    hasher.update(b"\n")
+
+
 class DriverInput(BaseModel):
     messages: List[DriverMessage]
+    memory: Optional[DriverMemory] = Field(default=None, description="History sent before messages, which are then the per-call suffix")
     max_tokens: Optional[int] = Field(default=None, ge=0)
     temperature: Optional[float] = Field(default=0.0, ge=0.0, le=2.0)
     tools: Optional[List[BaseTool]] = Field(default=None)
     tool_choice: Optional[DriverToolChoice] = Field(default=None)
     response_format: Optional[Any] = Field(default="text")
+    priority: DriverPriority = Field(default=DriverPriority.INTERACTIVE, description="Scheduling priority when the driver is rate limited")
+
+    def get_messages(self) -> List[DriverMessage]:
+        """Full list of messages for the request - memory followed by messages"""
+        if self.memory is None:
+            return list(self.messages)
+        return list(self.memory) + list(self.messages)
 
 
 ##### Base driver class
@@ -85,4 +283,41 @@ class BaseDriver(BaseModel):
     ) -> DriverResponse:
         """Use driver LLM to generate a response (including function calling)"""
         raise NotImplementedError("Method must be implemented by a subclass")
-    
\ No newline at end of file
+
+    def supports_structured_output(self) -> bool:
+        """Whether a pydantic class as response_format is enforced by the LLM and returned as an instance (as text if it does not validate)"""
+        return False
+
+    def count_tokens(self, text: str) -> int:
+        """Estimate the number of tokens in text - roughly 4 characters per token unless overridden by the driver"""
+        return len(text) // 4 + 1
+
+    def estimate_prompt_tokens(self, input: DriverInput) -> int:
+        """Estimate the prompt tokens of a request - memory is counted once per message and cached"""
+        tokens = sum(self._message_tokens(message) for message in input.messages)
+        if input.memory is not None:
+            tokens += sum(input.memory.converted("prompt_tokens", lambda messages: [self._message_tokens(message) for message in messages], keeps_content=False))
+        for tool in input.tools or []:
+            tokens += self.count_tokens(tool.get_schema().model_dump_json())
+        return tokens
+
+    def _message_tokens(self, message: DriverMessage) -> int:
+        # Content, tool call arguments and a few tokens of per-message overhead
+        text = getattr(message, "content", None) or ""
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            text += tool_call.name + tool_call.args
+        return self.count_tokens(text) + 4
+
+    async def agenerate(
+        self,
+        input: DriverInput
+    ) -> DriverResponse:
+        """Async counterpart of generate - runs generate in a worker thread unless overridden by the driver"""
+        return await asyncio.to_thread(self.generate, input)
+
+    def generate_stream(
+        self,
+        input: DriverInput
+    ) -> Generator[Union[DriverResponseChunk, DriverResponse], None, None]:
+        """Stream DriverResponseChunk deltas as they are generated, followed by the complete DriverResponse"""
+        yield self.generate(input=input)
@@ -0,0 +1,117 @@
+from typing import Any, Generator, Optional, Union
+from pydantic import BaseModel, Field
+import hashlib
+import json
+
+from compositeai.cache import BaseCache, MemoryCache
+from compositeai.drivers.base_driver import (
+    BaseDriver,
+    DriverInput,
+    DriverResponse,
+    DriverResponseChunk,
+    update_message_hash,
+)
+
+
+class CachedDriver(BaseDriver):
+    """Wraps another driver and reuses its responses for identical requests"""
+    driver: BaseDriver
+    cache: BaseCache = Field(default_factory=MemoryCache)
+    model: Optional[str] = Field(default=None, description="Taken from the wrapped driver")
+    seed: Optional[int] = Field(default=None, description="Taken from the wrapped driver")
+
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self.model = self.driver.model
+        self.seed = self.driver.seed
+
+
+    def generate(
+        self,
+        input: DriverInput,
+    ) -> DriverResponse:
+        key = self.cache_key(input)
+        response = self._lookup(key, input)
+        if response is None:
+            response = self.driver.generate(input=input)
+            self._store(key, response)
+        return response
+
+
+    async def agenerate(
+        self,
+        input: DriverInput,
+    ) -> DriverResponse:
+        key = self.cache_key(input)
+        response = self._lookup(key, input)
+        if response is None:
+            response = await self.driver.agenerate(input=input)
+            self._store(key, response)
+        return response
+
+
+    def generate_stream(
+        self,
+        input: DriverInput,
+    ) -> Generator[Union[DriverResponseChunk, DriverResponse], None, None]:
+        key = self.cache_key(input)
+        response = self._lookup(key, input)
+        if response is not None:
+            yield response
+            return
+        for chunk in self.driver.generate_stream(input=input):
+            if isinstance(chunk, DriverResponse):
+                self._store(key, chunk)
+            yield chunk
+
+
+    def supports_structured_output(self) -> bool:
+        return self.driver.supports_structured_output()
+
+
+    def count_tokens(self, text: str) -> int:
+        return self.driver.count_tokens(text)
+
+
+    def cache_key(self, input: DriverInput) -> str:
+        """Stable hash of everything that determines the response to a request"""
+        # Memory keeps a running hash of its history, so only the per-call messages are serialized here
+        messages_hasher = input.memory.hasher() if input.memory is not None else hashlib.sha256()
+        for message in input.messages:
+            update_message_hash(messages_hasher, message)
+        request = {
+            "model": self.driver.model,
+            "seed": self.driver.seed,
+            "messages": messages_hasher.hexdigest(),
+            "max_tokens": input.max_tokens,
+            "temperature": input.temperature,
+            "tools": [tool.get_schema().model_dump(mode="json") for tool in input.tools] if input.tools else None,
+            "tool_choice": input.tool_choice.value if input.tool_choice else None,
+            "response_format": self._response_format_key(input.response_format),
+        }
+        serialized = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+    def _response_format_key(self, response_format: Any) -> Any:
+        if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+            return {"name": response_format.__qualname__, "schema": response_format.model_json_schema()}
+        return response_format
+
+
+    def _lookup(self, key: str, input: DriverInput) -> Optional[DriverResponse]:
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        response = DriverResponse.model_validate_json(cached)
+        response.cached = True
+        # Structured responses are stored as plain JSON, so rebuild the requested pydantic class
+        response_format = input.response_format
+        if isinstance(response_format, type) and issubclass(response_format, BaseModel) and isinstance(response.content, dict):
+            response.content = response_format.model_validate(response.content)
+        return response
+
+
+    def _store(self, key: str, response: DriverResponse) -> None:
+        self.cache.set(key, response.model_dump_json())
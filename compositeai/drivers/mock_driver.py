@@ -0,0 +1,204 @@
+from typing import Any, Callable, Dict, Generator, List, Optional, Union
+from pydantic import BaseModel, Field, PrivateAttr
+import asyncio
+import json
+import random
+import threading
+import time
+
+from compositeai.drivers.base_driver import (
+    BaseDriver,
+    DriverInput,
+    DriverResponse,
+    DriverResponseChunk,
+    DriverToolCall,
+    DriverUsage,
+)
+
+
+class MockDriver(BaseDriver):
+    """Offline driver that replays scripted or recorded responses, for tests and benchmarks.
+
+    Responses are returned in order, one per call, or come from responder if it is given.
+    Each call waits latency seconds (plus up to latency_jitter more) to simulate the LLM.
+    """
+    model: str = Field(default="mock", description="Model name reported in responses and traces")
+    seed: Optional[int] = Field(default=None, description="Seed for the simulated latency jitter")
+    responses: List[DriverResponse] = Field(default_factory=list, description="Responses returned in order, one per call")
+    responder: Optional[Callable[[DriverInput], DriverResponse]] = Field(default=None, description="Builds the response for each call instead of the scripted responses")
+    cycle: bool = Field(default=False, description="Start again from the first response once all have been returned")
+    latency: float = Field(default=0.0, ge=0, description="Seconds each call takes")
+    latency_jitter: float = Field(default=0.0, ge=0, description="Maximum random seconds added to latency")
+    stream_chunk_chars: int = Field(default=16, ge=1, description="Length of the content deltas yielded by generate_stream")
+    _index: int = PrivateAttr(default=0)
+    _random: random.Random = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._random = random.Random(self.seed)
+
+
+    @classmethod
+    def load(cls, path: str, **data: Any) -> "MockDriver":
+        """MockDriver replaying the responses saved to a JSON lines file with save"""
+        with open(path, encoding="utf-8") as file:
+            responses = [DriverResponse.model_validate_json(line) for line in file if line.strip()]
+        return cls(responses=responses, **data)
+
+
+    @staticmethod
+    def save(responses: List[DriverResponse], path: str) -> None:
+        """Write responses to a JSON lines file, e.g. those collected by a RecordingDriver"""
+        with open(path, "w", encoding="utf-8") as file:
+            for response in responses:
+                file.write(response.model_dump_json() + "\n")
+
+
+    @property
+    def calls(self) -> int:
+        """Number of responses returned so far"""
+        return self._index
+
+
+    def reset(self) -> None:
+        """Replay the scripted responses from the start"""
+        with self._lock:
+            self._index = 0
+
+
+    def generate(
+        self,
+        input: DriverInput,
+    ) -> DriverResponse:
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        return self._next_response(input)
+
+
+    async def agenerate(
+        self,
+        input: DriverInput,
+    ) -> DriverResponse:
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self._next_response(input)
+
+
+    def generate_stream(
+        self,
+        input: DriverInput,
+    ) -> Generator[Union[DriverResponseChunk, DriverResponse], None, None]:
+        response = self.generate(input=input)
+        if isinstance(response.content, str):
+            for start in range(0, len(response.content), self.stream_chunk_chars):
+                yield DriverResponseChunk(content=response.content[start:start + self.stream_chunk_chars])
+        yield response
+
+
+    def _delay(self) -> float:
+        if not self.latency_jitter:
+            return self.latency
+        with self._lock:
+            return self.latency + self._random.uniform(0, self.latency_jitter)
+
+
+    def _next_response(self, input: DriverInput) -> DriverResponse:
+        if self.responder is not None:
+            with self._lock:
+                self._index += 1
+            return self.responder(input)
+        with self._lock:
+            if self._index >= len(self.responses) and not (self.cycle and self.responses):
+                raise IndexError(f"MockDriver ran out of scripted responses after {self._index} calls.")
+            response = self.responses[self._index % len(self.responses)]
+            self._index += 1
+        # Copies, so callers mutating a response do not change the script
+        return response.model_copy(deep=True)
+
+
+class RecordingDriver(BaseDriver):
+    """Wraps another driver and keeps every response, to be saved and replayed with MockDriver"""
+    driver: BaseDriver
+    model: Optional[str] = Field(default=None, description="Taken from the wrapped driver")
+    seed: Optional[int] = Field(default=None, description="Taken from the wrapped driver")
+    responses: List[DriverResponse] = Field(default_factory=list, description="Responses in the order they were returned")
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self.model = self.driver.model
+        self.seed = self.driver.seed
+
+
+    def generate(
+        self,
+        input: DriverInput,
+    ) -> DriverResponse:
+        return self._record(self.driver.generate(input=input))
+
+
+    async def agenerate(
+        self,
+        input: DriverInput,
+    ) -> DriverResponse:
+        return self._record(await self.driver.agenerate(input=input))
+
+
+    def generate_stream(
+        self,
+        input: DriverInput,
+    ) -> Generator[Union[DriverResponseChunk, DriverResponse], None, None]:
+        for chunk in self.driver.generate_stream(input=input):
+            if isinstance(chunk, DriverResponse):
+                self._record(chunk)
+            yield chunk
+
+
+    def supports_structured_output(self) -> bool:
+        return self.driver.supports_structured_output()
+
+
+    def count_tokens(self, text: str) -> int:
+        return self.driver.count_tokens(text)
+
+
+    def save(self, path: str) -> None:
+        MockDriver.save(self.responses, path)
+
+
+    def _record(self, response: DriverResponse) -> DriverResponse:
+        with self._lock:
+            self.responses.append(response)
+        return response
+
+
+##### Helpers building scripted responses
+
+def text_response(content: str, usage: Optional[DriverUsage] = None) -> DriverResponse:
+    return DriverResponse(content=content, usage=usage or _usage(content))
+
+
+def json_response(content: Union[Dict[str, Any], BaseModel], usage: Optional[DriverUsage] = None) -> DriverResponse:
+    """Response with a JSON body, e.g. a plan or a step check"""
+    if isinstance(content, BaseModel):
+        content = content.model_dump(mode="json")
+    return text_response(json.dumps(content), usage)
+
+
+def tool_calls_response(calls: List[tuple], usage: Optional[DriverUsage] = None) -> DriverResponse:
+    """Response calling tools, given (name, args) pairs"""
+    tool_calls = [
+        DriverToolCall(id=f"call_{index}", name=name, args=json.dumps(args))
+        for index, (name, args) in enumerate(calls)
+    ]
+    return DriverResponse(tool_calls=tool_calls, usage=usage or _usage("".join(call.args for call in tool_calls)))
+
+
+def _usage(completion: str) -> DriverUsage:
+    completion_tokens = len(completion) // 4 + 1
+    return DriverUsage(prompt_tokens=0, completion_tokens=completion_tokens, total_tokens=completion_tokens)
\ No newline at end of file
@@ -0,0 +1,170 @@
+from typing import Any, Dict, Generator, List, Optional, Tuple, Union
+from concurrent.futures import Future
+from pydantic import BaseModel, Field, PrivateAttr, validator
+import asyncio
+import io
+import json
+import threading
+import time
+import uuid
+
+from openai.types.chat import ChatCompletion
+
+from compositeai.drivers.base_driver import (
+    DriverInput,
+    DriverResponse,
+    DriverResponseChunk,
+)
+from compositeai.drivers.openai_driver import OpenAIDriver
+
+
+class BatchStats(BaseModel):
+    batches: int = Field(default=0, description="Batches submitted")
+    requests: int = Field(default=0, description="Requests sent in batches")
+    failed: int = Field(default=0, description="Requests that came back with an error or not at all")
+    pending: int = Field(default=0, description="Requests waiting for the next batch to be submitted")
+
+
+class OpenAIBatchDriver(OpenAIDriver):
+    """OpenAIDriver that sends requests through the OpenAI Batch API, for offline bulk runs.
+
+    Each generate call queues its request and blocks until the result arrives, so an agent
+    run pauses at every driver call and resumes where it left off. Requests from all runs
+    (e.g. from execute_many) are collected into a JSONL batch, which is submitted once it has
+    batch_size requests or max_wait seconds after its first request, then polled until done.
+    Batch results are cheaper but can take up to the completion window to arrive. Batches
+    have their own rate limits at OpenAI, so the driver takes no scheduler.
+    """
+    batch_size: int = Field(default=1000, ge=1, description="Maximum requests per batch, submitted as soon as it is full")
+    max_wait: float = Field(default=5.0, ge=0, description="Seconds to collect requests before submitting a batch that is not full")
+    poll_interval: float = Field(default=30.0, gt=0, description="Seconds between checks of a submitted batch")
+    completion_window: str = Field(default="24h", description="Time OpenAI has to complete a batch")
+    stats: BatchStats = Field(default_factory=BatchStats)
+    _pending: List[Tuple[str, Dict[str, Any], DriverInput, Future]] = PrivateAttr(default_factory=list)
+    _timer: Optional[threading.Timer] = PrivateAttr(default=None)
+    _batch_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+
+    @validator("scheduler")
+    def check_scheduler(cls, v):
+        if v is not None:
+            raise ValueError("OpenAIBatchDriver does not use a scheduler, OpenAI rate limits batches separately.")
+        return v
+
+
+    def generate(
+        self,
+        input: DriverInput,
+    ) -> DriverResponse:
+        return self.submit(input).result()
+
+
+    async def agenerate(
+        self,
+        input: DriverInput,
+    ) -> DriverResponse:
+        return await asyncio.wrap_future(self.submit(input))
+
+
+    def generate_stream(
+        self,
+        input: DriverInput,
+    ) -> Generator[Union[DriverResponseChunk, DriverResponse], None, None]:
+        # Batch results arrive whole, there are no deltas to stream
+        yield self.generate(input=input)
+
+
+    def submit(self, input: DriverInput) -> Future:
+        """Queue a request for the next batch - the future resolves to its DriverResponse"""
+        future = Future()
+        request = (uuid.uuid4().hex, self._batch_body(input), input, future)
+        with self._batch_lock:
+            self._pending.append(request)
+            self.stats.pending = len(self._pending)
+            full = len(self._pending) >= self.batch_size
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.max_wait, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+        return future
+
+
+    def flush(self) -> None:
+        """Submit the queued requests now, without waiting for the batch to fill up"""
+        with self._batch_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            while self._pending:
+                requests = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                threading.Thread(target=self._run_batch, args=(requests,), daemon=True).start()
+            self.stats.pending = 0
+
+
+    def _batch_body(self, input: DriverInput) -> Dict[str, Any]:
+        params = self._create_params(input)
+        return {key: value for key, value in params.items() if value is not None}
+
+
+    def _run_batch(self, requests: List[Tuple[str, Dict[str, Any], DriverInput, Future]]) -> None:
+        futures = {custom_id: (input, future) for custom_id, _, input, future in requests}
+        try:
+            lines = [
+                json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body})
+                for custom_id, body, _, _ in requests
+            ]
+            batch_file = self._client.files.create(
+                file=("batch.jsonl", io.BytesIO("\n".join(lines).encode("utf-8"))),
+                purpose="batch",
+            )
+            batch = self._client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window=self.completion_window,
+            )
+            with self._batch_lock:
+                self.stats.batches += 1
+                self.stats.requests += len(requests)
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                time.sleep(self.poll_interval)
+                batch = self._client.batches.retrieve(batch.id)
+
+            # Expired and cancelled batches still return the results completed in time
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    for line in self._client.files.content(file_id).text.splitlines():
+                        if line.strip():
+                            self._resolve(json.loads(line), futures)
+            error = RuntimeError(f"OpenAI batch {batch.id} {batch.status} without a result for this request.")
+        except Exception as e:
+            error = e
+        for _, future in futures.values():
+            if not future.done():
+                with self._batch_lock:
+                    self.stats.failed += 1
+                future.set_exception(error)
+
+
+    def _resolve(self, result: Dict[str, Any], futures: Dict[str, Tuple[DriverInput, Future]]) -> None:
+        entry = futures.get(result.get("custom_id"))
+        if entry is None:
+            return
+        input, future = entry
+        response = result.get("response") or {}
+        if result.get("error") or response.get("status_code") != 200:
+            with self._batch_lock:
+                self.stats.failed += 1
+            future.set_exception(RuntimeError(f"OpenAI batch request failed: {result.get('error') or response.get('body')}"))
+            return
+        try:
+            completion = ChatCompletion.model_validate(response["body"])
+            driver_response = self._response_openai_to_driver(completion, input)
+        except Exception as e:
+            with self._batch_lock:
+                self.stats.failed += 1
+            future.set_exception(e)
+            return
+        future.set_result(driver_response)
\ No newline at end of file
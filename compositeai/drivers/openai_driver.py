@@ -1,7 +1,11 @@
-from typing import List, Optional
-from openai import OpenAI
-from pydantic import validator, PrivateAttr
-from dotenv import load_dotenv
+from typing import Any, Dict, Generator, List, Optional, Tuple, Union
+from openai import OpenAI, AsyncOpenAI
+from pydantic import validator, Field, PrivateAttr
+import asyncio
+import functools
+import os
+import threading
+import weakref
 
 from compositeai.drivers.base_driver import (
     BaseDriver,
@@ -9,23 +13,44 @@ from compositeai.drivers.base_driver import (
     DriverToolCall,
     DriverMessage,
     DriverResponse,
+    DriverResponseChunk,
+    DriverToolCallChunk,
     DriverInput,
     SystemMessage,
     UserMessage,
     AssistantMessage,
     ToolMessage,
 )
+from compositeai.config import load_env
+from compositeai.drivers.scheduler import RequestScheduler
 from compositeai.tools import BaseTool
+from compositeai.tools.base_tool import ToolSchema
 
 
 class OpenAIDriver(BaseDriver):
-    _client: OpenAI = PrivateAttr()
+    scheduler: Optional[RequestScheduler] = Field(default=None, description="Shared rate limit scheduler for requests to the OpenAI API key")
+    _openai_tools_cache: Dict[Tuple[int, ...], List[object]] = PrivateAttr(default_factory=dict)
+    _encoding: Any = PrivateAttr(default=None)
 
     
     def __init__(self, **data):
         super().__init__(**data)
-        load_dotenv()
-        self._client = OpenAI()
+        load_env()
+
+
+    @property
+    def _client(self) -> OpenAI:
+        return get_openai_client(self._max_retries())
+
+
+    @property
+    def _async_client(self) -> AsyncOpenAI:
+        return get_async_openai_client(self._max_retries())
+
+
+    def _max_retries(self) -> Optional[int]:
+        # With a scheduler, retries (rate limits, connection and server errors) happen there instead of in each client
+        return 0 if self.scheduler is not None else None
 
 
     @validator("model")
@@ -54,41 +79,158 @@ class OpenAIDriver(BaseDriver):
         self,
         input: DriverInput,
     ) -> DriverResponse:
-        messages = self._messages_driver_to_openai(input.messages)
-        max_tokens = input.max_tokens
-        temperature = input.temperature
-        tools = self._fc_schema_basetools_to_openai(input.tools)
+        if self.scheduler is None:
+            return self._generate(input)
+        estimated = self._estimate_tokens(input)
+        response = self.scheduler.call(lambda: self._generate(input), estimated, input.priority)
+        self.scheduler.record_usage(estimated, response.usage.total_tokens)
+        return response
+
+
+    async def agenerate(
+        self,
+        input: DriverInput,
+    ) -> DriverResponse:
+        if self.scheduler is None:
+            return await self._agenerate(input)
+        estimated = self._estimate_tokens(input)
+        response = await self.scheduler.acall(lambda: self._agenerate(input), estimated, input.priority)
+        self.scheduler.record_usage(estimated, response.usage.total_tokens)
+        return response
+
+
+    def generate_stream(
+        self,
+        input: DriverInput,
+    ) -> Generator[Union[DriverResponseChunk, DriverResponse], None, None]:
+        if self.scheduler is None:
+            yield from self._generate_stream(input)
+            return
+        estimated = self._estimate_tokens(input)
+        # Rate limit errors are raised when the stream is opened, so admission covers the first chunk
+        def _open() -> Tuple[Generator, Union[DriverResponseChunk, DriverResponse]]:
+            chunks = self._generate_stream(input)
+            return chunks, next(chunks)
+        chunks, chunk = self.scheduler.call(_open, estimated, input.priority)
+        yield chunk
+        for chunk in chunks:
+            yield chunk
+        self.scheduler.record_usage(estimated, chunk.usage.total_tokens)
+
+
+    def _estimate_tokens(self, input: DriverInput) -> int:
+        return self.scheduler.estimate_tokens(self.estimate_prompt_tokens(input), input.max_tokens)
+
+
+    def _generate(
+        self,
+        input: DriverInput,
+    ) -> DriverResponse:
+        response = self._client.chat.completions.create(**self._create_params(input))
+        return self._response_openai_to_driver(response, input)
+
+
+    async def _agenerate(
+        self,
+        input: DriverInput,
+    ) -> DriverResponse:
+        response = await self._async_client.chat.completions.create(**self._create_params(input))
+        return self._response_openai_to_driver(response, input)
+
+
+    def _generate_stream(
+        self,
+        input: DriverInput,
+    ) -> Generator[Union[DriverResponseChunk, DriverResponse], None, None]:
+        stream = self._client.chat.completions.create(
+            **self._create_params(input),
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        content = None
+        tool_calls = {}
+        usage = None
+        for chunk in stream:
+            # Usage arrives on its own final chunk with no choices
+            if chunk.usage is not None:
+                usage = self._usage_openai_to_driver(chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            tool_call_chunks = None
+            if delta.tool_calls:
+                tool_call_chunks = []
+                for tool_call in delta.tool_calls:
+                    name = tool_call.function.name if tool_call.function else None
+                    args = (tool_call.function.arguments if tool_call.function else None) or ""
+                    # Accumulate fragments of each tool call by index
+                    accumulated = tool_calls.setdefault(tool_call.index, {"id": None, "name": None, "args": ""})
+                    accumulated["id"] = tool_call.id or accumulated["id"]
+                    accumulated["name"] = name or accumulated["name"]
+                    accumulated["args"] += args
+                    tool_call_chunks.append(DriverToolCallChunk(index=tool_call.index, id=tool_call.id, name=name, args=args))
+            if delta.content:
+                content = (content or "") + delta.content
+            if delta.content or tool_call_chunks:
+                yield DriverResponseChunk(content=delta.content, tool_calls=tool_call_chunks)
+        driver_tool_calls = [
+            DriverToolCall(id=tool_call["id"], name=tool_call["name"], args=tool_call["args"])
+            for _, tool_call in sorted(tool_calls.items())
+        ] or None
+        if usage is None:
+            usage = DriverUsage(prompt_tokens=0, completion_tokens=0, total_tokens=0)
+        yield DriverResponse(content=self._structured_content(content, input), tool_calls=driver_tool_calls, usage=usage)
+
+
+    def supports_structured_output(self) -> bool:
+        return True
+
+
+    def count_tokens(self, text: str) -> int:
+        # Use tiktoken when it is installed and has the model's encoding, otherwise fall back to the estimate
+        if self._encoding is None:
+            try:
+                import tiktoken
+                self._encoding = tiktoken.encoding_for_model(self.model)
+            except Exception:
+                self._encoding = False
+        if self._encoding is False:
+            return super().count_tokens(text)
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+    def _create_params(self, input: DriverInput) -> dict:
         tool_choice = input.tool_choice
         if tool_choice:
             tool_choice = tool_choice.value
+        return dict(
+            model=self.model,
+            messages=self._input_messages_to_openai(input),
+            max_tokens=input.max_tokens,
+            temperature=input.temperature,
+            tools=self._fc_schema_basetools_to_openai(input.tools),
+            tool_choice=tool_choice,
+            response_format=_response_format_param(input.response_format),
+            seed=self.seed,
+        )
+
+
+    def _response_openai_to_driver(self, response: object, input: Optional[DriverInput] = None) -> DriverResponse:
+        content = response.choices[0].message.content
+        tool_calls = self._tool_calls_openai_to_driver(response.choices[0].message.tool_calls)
+        usage = self._usage_openai_to_driver(response.usage)
+        return DriverResponse(content=self._structured_content(content, input), tool_calls=tool_calls, usage=usage)
+
 
-        if isinstance(input.response_format, str):
-            response = self._client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                tools=tools,
-                tool_choice=tool_choice,
-                response_format={"type": input.response_format},
-                seed=self.seed,
-            )
-            content = response.choices[0].message.content
-            tool_calls = self._tool_calls_openai_to_driver(response.choices[0].message.tool_calls)
-            usage = self._usage_openai_to_driver(response.usage)
-            return DriverResponse(content=content, tool_calls=tool_calls, usage=usage)
-        else:
-            response = self._client.beta.chat.completions.parse(
-                model=self.model,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                response_format=input.response_format,
-                seed=self.seed,
-            )
-            content = response.choices[0].message.parsed
-            usage = self._usage_openai_to_driver(response.usage)
-            return DriverResponse(content=content, tool_calls=None, usage=usage)
+    def _structured_content(self, content: Optional[str], input: Optional[DriverInput]) -> Any:
+        # Instance of the requested class for a structured output request, but the text as it
+        # came if it does not validate (e.g. cut off at max_tokens), for the caller to repair
+        if input is None or isinstance(input.response_format, str) or content is None:
+            return content
+        try:
+            return input.response_format.model_validate_json(content)
+        except ValueError:
+            return content
     
     
     def _tool_calls_openai_to_driver(self, tool_calls: Optional[List[object]]) -> Optional[List[DriverToolCall]]:
@@ -103,6 +245,14 @@ class OpenAIDriver(BaseDriver):
         return [{"id": tool_call.id, "type": "function", "function": {"name": tool_call.name, "arguments": tool_call.args}} for tool_call in tool_calls]
 
 
+    def _input_messages_to_openai(self, input: DriverInput) -> List[object]:
+        # History in input.memory is converted once and reused; only the per-call messages are converted every time
+        messages = self._messages_driver_to_openai(input.messages)
+        if input.memory is None:
+            return messages
+        return input.memory.converted("openai", self._messages_driver_to_openai) + messages
+
+
     def _messages_driver_to_openai(self, messages: Optional[List[DriverMessage]]) -> Optional[List[object]]:
         if messages is None:
             return None
@@ -126,54 +276,136 @@ class OpenAIDriver(BaseDriver):
     def _fc_schema_basetools_to_openai(self, tools: Optional[List[BaseTool]]) -> Optional[List[object]]:
         if tools is None:
             return None
-        openai_fcs = []
-        for tool in tools:
-            # Get schema of tool/function
-            tool_schema = tool.get_schema()
-
-            # OpenAI function calling tool format
-            openai_fc = {
-                "type": "function",
-                "function": {
-                    "name": tool_schema.name,
-                    "description": tool_schema.description,
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                        },
-                        "required": []
-                    },
-                }
-            }
-
-            # Populate formatted arguments for tool
-            for arg in tool_schema.arguments:
-                openai_fc["function"]["parameters"]["properties"][arg.name] = {"type": self._type_conversion_openai(arg.type)}
-                if arg.type == "list":
-                    openai_fc["function"]["parameters"]["properties"][arg.name] = {"items": {"type": "string"}}
-                if arg.required:
-                    openai_fc["function"]["parameters"]["required"].append(arg.name)
-            
-            openai_fcs.append(openai_fc)
+        # The same tool list is sent on every action, so reuse the payload built the first time
+        # (schemas are memoized by BaseTool.get_schema, so their ids identify them)
+        tool_schemas = [tool.get_schema() for tool in tools]
+        key = tuple(id(tool_schema) for tool_schema in tool_schemas)
+        openai_fcs = self._openai_tools_cache.get(key)
+        if openai_fcs is None:
+            openai_fcs = [self._fc_schema_basetool_to_openai(tool_schema) for tool_schema in tool_schemas]
+            self._openai_tools_cache[key] = openai_fcs
         return openai_fcs
     
 
-    # Helper function converting python types to OpenAI function calling type format
-    def _type_conversion_openai(self, type: str) -> str:
-        conversions = {
-            "int": "integer",
-            "str": "string",
-            "float": "float",
-            "bool": "boolean",
-            "list": "array",
+    def _fc_schema_basetool_to_openai(self, tool_schema: ToolSchema) -> object:
+        # OpenAI function calling tool format
+        openai_fc = {
+            "type": "function",
+            "function": {
+                "name": tool_schema.name,
+                "description": tool_schema.description,
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                    },
+                    "required": []
+                },
+            }
         }
-        return conversions[type]
+
+        # Populate formatted arguments for tool, hoisting nested model definitions to the parameters object
+        parameters = openai_fc["function"]["parameters"]
+        for arg in tool_schema.arguments:
+            arg_schema = dict(arg.json_schema)
+            definitions = arg_schema.pop("$defs", None)
+            if definitions:
+                parameters.setdefault("$defs", {}).update(definitions)
+            parameters["properties"][arg.name] = arg_schema
+            if arg.required:
+                parameters["required"].append(arg.name)
+        return openai_fc
     
 
     def _usage_openai_to_driver(self, openai_usage_obj: object) -> DriverUsage:
+        # Older API versions and compatible servers may leave out the prompt token details
+        prompt_tokens_details = getattr(openai_usage_obj, "prompt_tokens_details", None)
         return DriverUsage(
             prompt_tokens=openai_usage_obj.prompt_tokens,
             completion_tokens=openai_usage_obj.completion_tokens,
             total_tokens=openai_usage_obj.total_tokens,
+            cached_tokens=getattr(prompt_tokens_details, "cached_tokens", None) or 0,
         )
-    
\ No newline at end of file
+
+
+_clients: Dict[tuple, OpenAI] = {}
+_async_clients: Any = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def get_openai_client(max_retries: Optional[int] = None) -> OpenAI:
+    """Process-wide OpenAI client shared by drivers, one per API key, base URL and retry setting"""
+    key = _client_key(max_retries)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = OpenAI(**_client_options(max_retries))
+                _clients[key] = client
+    return client
+
+
+def get_async_openai_client(max_retries: Optional[int] = None) -> AsyncOpenAI:
+    """AsyncOpenAI client shared by drivers on the running event loop, which its connections are bound to"""
+    loop = asyncio.get_running_loop()
+    key = _client_key(max_retries)
+    with _clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(**_client_options(max_retries))
+            clients[key] = client
+    return client
+
+
+def _client_key(max_retries: Optional[int]) -> tuple:
+    # Clients read their key and base URL from the environment when created
+    load_env()
+    return (os.environ.get("OPENAI_API_KEY"), os.environ.get("OPENAI_BASE_URL"), max_retries)
+
+
+def _client_options(max_retries: Optional[int]) -> Dict[str, Any]:
+    return {"max_retries": max_retries} if max_retries is not None else {}
+
+
+def _response_format_param(response_format: Union[str, type]) -> Dict[str, Any]:
+    if isinstance(response_format, str):
+        return {"type": response_format}
+    return _json_schema_format(response_format)
+
+
+@functools.lru_cache(maxsize=None)
+def _json_schema_format(model: type) -> Dict[str, Any]:
+    # Structured outputs request for a pydantic class, built once per class
+    schema = model.model_json_schema()
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": model.__name__, "strict": True, "schema": _strict_json_schema(schema, schema)},
+    }
+
+
+def _strict_json_schema(schema: Dict[str, Any], root: Dict[str, Any]) -> Dict[str, Any]:
+    # Strict mode needs every object closed with all of its properties required, and no
+    # keywords next to a $ref - e.g. the description of a field holding a nested model
+    if "$ref" in schema and len(schema) > 1:
+        definition = root
+        for part in schema["$ref"].lstrip("#/").split("/"):
+            definition = definition[part]
+        schema = {**definition, **{key: value for key, value in schema.items() if key != "$ref"}}
+    schema = dict(schema)
+    for key in ("$defs", "definitions"):
+        if key in schema:
+            schema[key] = {name: _strict_json_schema(definition, root) for name, definition in schema[key].items()}
+    if "properties" in schema:
+        schema["properties"] = {name: _strict_json_schema(property, root) for name, property in schema["properties"].items()}
+    if schema.get("type") == "object":
+        schema["required"] = list(schema.get("properties", {}))
+        schema["additionalProperties"] = False
+    if isinstance(schema.get("items"), dict):
+        schema["items"] = _strict_json_schema(schema["items"], root)
+    for key in ("anyOf", "allOf"):
+        if key in schema:
+            schema[key] = [_strict_json_schema(variant, root) for variant in schema[key]]
+    if "default" in schema and schema["default"] is None:
+        del schema["default"]
+    return schema
\ No newline at end of file
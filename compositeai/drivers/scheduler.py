@@ -0,0 +1,270 @@
+from typing import Any, Awaitable, Callable, List, Optional, TypeVar
+from pydantic import BaseModel, Field, PrivateAttr
+from email.utils import parsedate_to_datetime
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+from compositeai.drivers.base_driver import DriverPriority
+from compositeai.ratelimit import TokenBucket
+
+
+T = TypeVar("T")
+
+_PRIORITY_ORDER = {DriverPriority.INTERACTIVE: 0, DriverPriority.BATCH: 1}
+
+# Statuses retried besides 429, as the OpenAI client does: request timeout, conflict and server errors
+_TRANSIENT_STATUSES = (408, 409)
+
+
+class SchedulerStats(BaseModel):
+    requests: int = Field(default=0, description="Requests admitted, including retries")
+    completed: int = Field(default=0, description="Requests that got a response")
+    throttled: int = Field(default=0, description="Rate limit (429) responses received")
+    transient_errors: int = Field(default=0, description="Connection errors, timeouts and server (5xx) errors received")
+    retries: int = Field(default=0)
+    estimated_tokens: int = Field(default=0, description="Tokens reserved before requests were sent")
+    used_tokens: int = Field(default=0, description="Tokens reported in responses")
+    wait_seconds: float = Field(default=0.0, description="Total time requests waited for admission")
+    queue_depth: int = Field(default=0, description="Requests currently waiting for admission")
+    max_queue_depth: int = Field(default=0)
+    started_at: float = Field(default_factory=time.monotonic)
+
+    @property
+    def requests_per_minute(self) -> float:
+        return self.completed / max(time.monotonic() - self.started_at, 1e-9) * 60
+
+    @property
+    def tokens_per_minute(self) -> float:
+        return self.used_tokens / max(time.monotonic() - self.started_at, 1e-9) * 60
+
+
+class RequestScheduler(BaseModel):
+    """Admits driver requests within requests-per-minute and tokens-per-minute budgets.
+
+    Share one scheduler between every driver using the same API key. Waiting requests are
+    admitted in priority order (interactive before batch, then first come first served).
+    A rate limited (429) response pauses all requests for its Retry-After time, or an
+    exponential backoff, before the request is retried. Connection errors, timeouts and
+    server (5xx) errors are retried after the same backoff without pausing other requests -
+    drivers using a scheduler turn off their client's own retries.
+    """
+    requests_per_minute: Optional[float] = Field(default=None, gt=0, description="Request budget, unlimited if None")
+    tokens_per_minute: Optional[float] = Field(default=None, gt=0, description="Token budget (prompt plus completion), unlimited if None")
+    max_concurrency: Optional[int] = Field(default=None, ge=1, description="Maximum requests in flight, unlimited if None")
+    default_completion_tokens: int = Field(default=512, ge=0, description="Completion tokens reserved for requests without max_tokens")
+    max_retries: int = Field(default=6, ge=0, description="Retries of a rate limited or failed (connection error, timeout, 5xx) request")
+    backoff_factor: float = Field(default=1.0, ge=0, description="Exponential backoff base in seconds when there is no Retry-After")
+    max_backoff: float = Field(default=60.0, ge=0)
+    stats: SchedulerStats = Field(default_factory=SchedulerStats)
+    _request_bucket: Optional[TokenBucket] = PrivateAttr(default=None)
+    _token_bucket: Optional[TokenBucket] = PrivateAttr(default=None)
+    _waiting: List[tuple] = PrivateAttr(default_factory=list)
+    _sequence: Any = PrivateAttr(default_factory=itertools.count)
+    _in_flight: int = PrivateAttr(default=0)
+    _paused_until: float = PrivateAttr(default=0.0)
+    _condition: threading.Condition = PrivateAttr(default_factory=threading.Condition)
+
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        if self.requests_per_minute is not None:
+            self._request_bucket = TokenBucket.per_minute(self.requests_per_minute)
+        if self.tokens_per_minute is not None:
+            self._token_bucket = TokenBucket.per_minute(self.tokens_per_minute)
+
+
+    def call(self, send: Callable[[], T], tokens: int, priority: DriverPriority = DriverPriority.INTERACTIVE) -> T:
+        """Call send once admitted, retrying it when it raises a rate limit or transient error"""
+        for attempt in range(self.max_retries + 1):
+            self.admit(tokens, priority)
+            try:
+                result = send()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            finally:
+                self._release()
+            self._completed()
+            return result
+
+
+    async def acall(self, send: Callable[[], Awaitable[T]], tokens: int, priority: DriverPriority = DriverPriority.INTERACTIVE) -> T:
+        """Async call - waits for admission without blocking the event loop"""
+        for attempt in range(self.max_retries + 1):
+            await self.aadmit(tokens, priority)
+            try:
+                result = await send()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            finally:
+                self._release()
+            self._completed()
+            return result
+
+
+    def admit(self, tokens: int, priority: DriverPriority = DriverPriority.INTERACTIVE) -> None:
+        """Block until a request of tokens estimated tokens may be sent - pair with release"""
+        ticket = self._enqueue(priority)
+        start = time.monotonic()
+        with self._condition:
+            while True:
+                wait = self._try_admit(ticket, tokens)
+                if wait == 0:
+                    break
+                self._condition.wait(wait)
+        self.stats.wait_seconds += time.monotonic() - start
+
+
+    async def aadmit(self, tokens: int, priority: DriverPriority = DriverPriority.INTERACTIVE) -> None:
+        ticket = self._enqueue(priority)
+        start = time.monotonic()
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_admit(ticket, tokens)
+                if wait == 0:
+                    break
+                # Threads are woken by the condition; coroutines poll, a little more often than needed
+                await asyncio.sleep(min(wait, 0.05))
+        except BaseException:
+            # Leave the queue if cancelled while waiting
+            with self._condition:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self.stats.queue_depth = len(self._waiting)
+                    self._condition.notify_all()
+            raise
+        self.stats.wait_seconds += time.monotonic() - start
+
+
+    def record_usage(self, estimated: int, used: int) -> None:
+        """Correct the token budget once a response reports the tokens actually used"""
+        self.stats.used_tokens += used
+        if self._token_bucket is not None and estimated != used:
+            if estimated > used:
+                self._token_bucket.refund(estimated - used)
+            else:
+                self._token_bucket.reserve(used - estimated)
+
+
+    def estimate_tokens(self, prompt_tokens: int, max_tokens: Optional[int]) -> int:
+        """Tokens to reserve for a request - the prompt plus its maximum completion"""
+        return prompt_tokens + (max_tokens if max_tokens is not None else self.default_completion_tokens)
+
+
+    def _enqueue(self, priority: DriverPriority) -> tuple:
+        ticket = (_PRIORITY_ORDER[priority], next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            self.stats.queue_depth = len(self._waiting)
+            self.stats.max_queue_depth = max(self.stats.max_queue_depth, self.stats.queue_depth)
+        return ticket
+
+
+    def _try_admit(self, ticket: tuple, tokens: int) -> float:
+        # Called holding the condition; returns 0 once admitted, otherwise the seconds to wait
+        if self._waiting[0] != ticket:
+            return 1.0
+        wait = self._paused_until - time.monotonic()
+        if self.max_concurrency is not None and self._in_flight >= self.max_concurrency:
+            wait = max(wait, 1.0)
+        if self._request_bucket is not None:
+            wait = max(wait, self._request_bucket.wait_time(1))
+        if self._token_bucket is not None:
+            wait = max(wait, self._token_bucket.wait_time(tokens))
+        if wait > 0:
+            return wait
+        if self._request_bucket is not None:
+            self._request_bucket.reserve(1)
+        if self._token_bucket is not None:
+            self._token_bucket.reserve(tokens)
+        heapq.heappop(self._waiting)
+        self._in_flight += 1
+        self.stats.requests += 1
+        self.stats.estimated_tokens += tokens
+        self.stats.queue_depth = len(self._waiting)
+        # The next request in line may be admissible right away
+        self._condition.notify_all()
+        return 0
+
+
+    def _release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+
+    def _completed(self) -> None:
+        with self._condition:
+            self.stats.completed += 1
+
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        # Seconds to wait before retrying a failed request, or None if it should not be retried
+        response = getattr(error, "response", None)
+        status_code = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+        throttled = status_code == 429
+        if not throttled and not _is_transient(error, status_code):
+            return None
+        with self._condition:
+            if throttled:
+                self.stats.throttled += 1
+            else:
+                self.stats.transient_errors += 1
+            if attempt >= self.max_retries:
+                return None
+            self.stats.retries += 1
+            delay = _retry_after(getattr(response, "headers", None))
+            if delay is None:
+                delay = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+            if throttled:
+                # Every request waits, not only the one that was throttled
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                self._condition.notify_all()
+        return delay
+
+
+def _is_transient(error: Exception, status_code: Optional[int]) -> bool:
+    # Failures worth retrying: timeouts, conflicts and server errors, or no response at all
+    if status_code is not None:
+        return status_code in _TRANSIENT_STATUSES or status_code >= 500
+    try:
+        from openai import APIConnectionError
+    except ImportError:
+        return False
+    # Timeouts are connection errors too
+    return isinstance(error, APIConnectionError)
+
+
+def _retry_after(headers: Any) -> Optional[float]:
+    # OpenAI sends retry-after-ms as well as the standard Retry-After (seconds or an HTTP date)
+    if not headers:
+        return None
+    header = headers.get("retry-after-ms")
+    if header:
+        try:
+            return max(0.0, float(header) / 1000)
+        except ValueError:
+            pass
+    header = headers.get("retry-after")
+    if not header:
+        return None
+    try:
+        return max(0.0, float(header))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(header).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
\ No newline at end of file
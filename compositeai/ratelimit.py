@@ -0,0 +1,80 @@
+from typing import Optional
+from pydantic import BaseModel, Field, PrivateAttr
+import asyncio
+import threading
+import time
+
+
+class TokenBucket(BaseModel):
+    """Thread-safe token bucket rate limiter, shareable between threads and event loops.
+
+    Tokens refill continuously at rate per second up to capacity. Acquiring reserves tokens
+    right away, even if that leaves the bucket in debt, and then waits until the debt is
+    repaid - so callers are served in the order they arrive.
+    """
+    rate: float = Field(gt=0, description="Tokens added per second")
+    capacity: Optional[float] = Field(default=None, gt=0, description="Maximum tokens that can build up for a burst, rate if None")
+    _tokens: float = PrivateAttr(default=0.0)
+    _updated: float = PrivateAttr(default=0.0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._tokens = self.max_tokens
+        self._updated = time.monotonic()
+
+
+    @classmethod
+    def per_minute(cls, amount: float, capacity: Optional[float] = None) -> "TokenBucket":
+        """Bucket allowing amount tokens per minute, bursting up to a minute's worth by default"""
+        return cls(rate=amount / 60.0, capacity=capacity or amount)
+
+
+    @property
+    def max_tokens(self) -> float:
+        return self.capacity if self.capacity is not None else self.rate
+
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens, blocking until they are available - returns the seconds waited"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+    async def aacquire(self, tokens: float = 1.0) -> float:
+        """Async acquire that waits without blocking the event loop"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take tokens without waiting - returns the seconds until they are actually available"""
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Seconds until tokens (at most capacity) are available, without taking them"""
+        with self._lock:
+            self._refill()
+            return max(0.0, (min(tokens, self.max_tokens) - self._tokens) / self.rate)
+
+
+    def refund(self, tokens: float) -> None:
+        """Give back tokens that were reserved but not used"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + tokens)
+
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
\ No newline at end of file
@@ -0,0 +1,100 @@
+from typing import Any, Type, TypeVar, Union
+from pydantic import BaseModel
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+M = TypeVar("M", bound=BaseModel)
+
+_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+_TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+
+
+class StructuredOutputError(ValueError):
+    """Driver output that could not be parsed as the requested model, even after repair"""
+
+    def __init__(self, message: str, content: Any):
+        super().__init__(message)
+        self.content = content
+
+
+def loads(text: Union[str, bytes]) -> Any:
+    """json.loads, using orjson when it is installed - both raise ValueError on invalid JSON"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def repair_json(text: str) -> str:
+    """Cheap local fixes for common mistakes in JSON written by an LLM.
+
+    Takes the content of a code fence, drops text before and after the outermost object or
+    array, closes a string and brackets left open by an answer that was cut off, and removes
+    trailing commas. The result is not guaranteed to be valid JSON.
+    """
+    match = _FENCE_PATTERN.search(text)
+    if match:
+        text = match.group(1)
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        return text
+    text = text[min(starts):]
+
+    # Find where the outermost value ends, tracking the brackets still open
+    closing = []
+    in_string = False
+    escaped = False
+    end = None
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closing.append("}" if char == "{" else "]")
+        elif char in "}]" and closing:
+            closing.pop()
+            if not closing:
+                end = index + 1
+                break
+    if end is not None:
+        text = text[:end]
+    else:
+        if in_string:
+            text += '"'
+        text = text.rstrip().rstrip(",") + "".join(reversed(closing))
+    return _TRAILING_COMMA_PATTERN.sub(r"\1", text)
+
+
+def parse_model(content: Any, model: Type[M]) -> M:
+    """Validate content - an instance, a dict or JSON text - as model, repairing JSON text if needed"""
+    if isinstance(content, model):
+        return content
+    if isinstance(content, BaseModel):
+        content = content.model_dump()
+    if not isinstance(content, (str, bytes)):
+        try:
+            return model.model_validate(content)
+        except ValueError as e:
+            raise StructuredOutputError(f"Invalid {model.__name__}: {e}", content) from e
+    try:
+        return model.model_validate_json(content)
+    except ValueError as e:
+        error = e
+    repaired = repair_json(content if isinstance(content, str) else content.decode("utf-8", "replace"))
+    if repaired != content:
+        try:
+            return model.model_validate_json(repaired)
+        except ValueError as e:
+            error = e
+    raise StructuredOutputError(f"Invalid {model.__name__}: {error}", content) from error
\ No newline at end of file
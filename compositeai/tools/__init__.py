@@ -1,4 +1,24 @@
-from compositeai.tools.base_tool import BaseTool
-from compositeai.tools.google_tool import GoogleSerperApiTool
-from compositeai.tools.web_scraper_tool import WebScrapeTool
-from compositeai.tools.test_tool import TestTool
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+from compositeai._lazy import lazy_exports
+
+
+_EXPORTS = {
+    "BaseTool": "compositeai.tools.base_tool",
+    "GoogleSerperApiTool": "compositeai.tools.google_tool",
+    "WebScrapeTool": "compositeai.tools.web_scraper_tool",
+    "TestTool": "compositeai.tools.test_tool",
+    "FetchResponse": "compositeai.tools.http_client",
+    "HttpClient": "compositeai.tools.http_client",
+    "get_http_client": "compositeai.tools.http_client",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+if TYPE_CHECKING:
+    from compositeai.tools.base_tool import BaseTool
+    from compositeai.tools.google_tool import GoogleSerperApiTool
+    from compositeai.tools.web_scraper_tool import WebScrapeTool
+    from compositeai.tools.test_tool import TestTool
+    from compositeai.tools.http_client import FetchResponse, HttpClient, get_http_client
\ No newline at end of file
@@ -1,14 +1,24 @@
 import inspect
 import re
-from typing import List, Any
+from typing import Dict, List, Any, NamedTuple, Optional, Tuple
 from abc import abstractmethod
-from pydantic import BaseModel, validator, Field
+from concurrent.futures import Future
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from pydantic import BaseModel, TypeAdapter, validator, Field, PrivateAttr
+from pydantic_core import to_jsonable_python
+
+from compositeai.cache import BaseCache
 
 
 class ParamDesc(BaseModel):
     name: str
     type: str
     required: bool
+    json_schema: Dict[str, Any] = Field(default_factory=dict, description="JSON schema of the parameter")
 
 
 class ToolSchema(BaseModel):
@@ -16,15 +26,24 @@ class ToolSchema(BaseModel):
     description: str
     arguments: List[ParamDesc]
 
+
+class ToolRun(NamedTuple):
+    result: Any
+    # Whether the result came from the cache or an identical call in flight
+    cached: bool
+
     
 class BaseTool(BaseModel):
     name: str = Field("Name of the tool")
     description: str = Field("Description of what the tool does")
+    cache: Optional[BaseCache] = Field(default=None, description="Cache for results of run/arun, keyed on tool name and arguments - results are not cached if None")
+    _inflight: Dict[str, Future] = PrivateAttr(default_factory=dict)
+    _inflight_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
 
     @validator("name")
     def check_name(cls, v):
         # Satisfy OpenAI function calling requirements
-        if not re.fullmatch("^[a-zA-Z0-9_-]+$'.", v):
+        if not re.fullmatch("[a-zA-Z0-9_-]+", v):
             raise ValueError("Tool names must match pattern: '^[a-zA-Z0-9_-]+$'.")
         return v
 
@@ -33,11 +52,163 @@ class BaseTool(BaseModel):
         """Function of tool to be implemented by subclass"""
         raise NotImplementedError("Function of tool must be implemented by subclass")
 
-    def get_schema(self):
-        """Get schema of defined function for tool"""
-        signature = inspect.signature(self.func)
-        arguments = []
-        for name, param in signature.parameters.items():
-            required = True if param.default is inspect.Parameter.empty else False
-            arguments.append(ParamDesc(name=name, type=param.annotation.__name__, required=required))
-        return ToolSchema(name=self.name, description=self.description, arguments=arguments)
\ No newline at end of file
+    async def afunc(self, *args: Any, **kwargs: Any) -> Any:
+        """Async function of tool - runs func in a worker thread unless overridden by subclass"""
+        return await asyncio.to_thread(self.func, *args, **kwargs)
+
+    def run(self, **kwargs: Any) -> Any:
+        """Call func, reusing a cached result for the same arguments if the tool has a cache.
+
+        Identical calls made while one is already running wait for its result instead of
+        calling func again.
+        """
+        return self.invoke(kwargs).result
+
+    async def arun(self, **kwargs: Any) -> Any:
+        """Async version of run, calling afunc"""
+        return (await self.ainvoke(kwargs)).result
+
+    def invoke(self, kwargs: Dict[str, Any]) -> ToolRun:
+        """Like run, also telling whether the result was reused"""
+        if self.cache is None:
+            return ToolRun(self.func(**kwargs), False)
+        key = self.cache_key(kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            return ToolRun(cached[0], True)
+        future, leader = self._join(key)
+        if not leader:
+            return ToolRun(self._shared(future.result()), True)
+        try:
+            start = time.perf_counter()
+            result = self.func(**kwargs)
+            self._finish(key, future, result, time.perf_counter() - start)
+        except BaseException as e:
+            self._fail(key, future, e)
+            raise
+        return ToolRun(result, False)
+
+    async def ainvoke(self, kwargs: Dict[str, Any]) -> ToolRun:
+        """Async version of invoke, calling afunc"""
+        if self.cache is None:
+            return ToolRun(await self.afunc(**kwargs), False)
+        key = self.cache_key(kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            return ToolRun(cached[0], True)
+        future, leader = self._join(key)
+        if not leader:
+            return ToolRun(self._shared(await asyncio.wrap_future(future)), True)
+        try:
+            start = time.perf_counter()
+            result = await self.afunc(**kwargs)
+            self._finish(key, future, result, time.perf_counter() - start)
+        except BaseException as e:
+            self._fail(key, future, e)
+            raise
+        return ToolRun(result, False)
+
+    def cache_key(self, kwargs: Dict[str, Any]) -> str:
+        """Hash of the tool name and canonical JSON of the arguments"""
+        call = {"tool": self.name, "args": to_jsonable_python(kwargs, fallback=repr)}
+        serialized = json.dumps(call, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, result: Any) -> bool:
+        """Whether a result may be reused - error messages returned by the tool are not cached"""
+        return not (isinstance(result, str) and result.startswith(f"Error using {self.name}"))
+
+    def _cached(self, key: str) -> Optional[Tuple[Any]]:
+        # One-tuple of the cached result, so that a cached None is told apart from a miss
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        entry = json.loads(cached)
+        self.cache.stats.saved_seconds += entry["seconds"]
+        return (entry["result"],)
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        # Future of the identical call in flight, or a new one if this call is the first
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def _shared(self, outcome: Tuple[Any, float]) -> Any:
+        result, seconds = outcome
+        self.cache.stats.shared += 1
+        self.cache.stats.saved_seconds += seconds
+        return result
+
+    def _finish(self, key: str, future: Future, result: Any, seconds: float) -> None:
+        if self.is_cacheable(result):
+            try:
+                entry = json.dumps({"result": result, "seconds": seconds}, ensure_ascii=False)
+            except (TypeError, ValueError):
+                # Results that are not plain JSON are only shared with calls already in flight
+                entry = None
+            if entry is not None:
+                self.cache.set(key, entry)
+        with self._inflight_lock:
+            del self._inflight[key]
+        future.set_result((result, seconds))
+
+    def _fail(self, key: str, future: Future, error: BaseException) -> None:
+        with self._inflight_lock:
+            del self._inflight[key]
+        future.set_exception(error)
+
+    def get_schema(self) -> ToolSchema:
+        """Get schema of defined function for tool - computed once per tool class, name and description"""
+        key = (type(self), self.name, self.description)
+        schema = _schema_cache.get(key)
+        if schema is None:
+            arguments = []
+            for name, param in inspect.signature(self.func).parameters.items():
+                required = True if param.default is inspect.Parameter.empty else False
+                arguments.append(ParamDesc(
+                    name=name,
+                    type=_annotation_name(param.annotation),
+                    required=required,
+                    json_schema=_annotation_json_schema(param.annotation),
+                ))
+            schema = ToolSchema(name=self.name, description=self.description, arguments=arguments)
+            _schema_cache[key] = schema
+        return schema
+
+    def parse_args(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate JSON-decoded arguments against the func signature, e.g. building pydantic models from dicts"""
+        adapters = _adapters_cache.get(type(self))
+        if adapters is None:
+            adapters = {
+                name: TypeAdapter(param.annotation)
+                for name, param in inspect.signature(self.func).parameters.items()
+                if param.annotation is not inspect.Parameter.empty
+            }
+            _adapters_cache[type(self)] = adapters
+        return {
+            name: adapters[name].validate_python(value) if name in adapters else value
+            for name, value in args.items()
+        }
+
+
+_schema_cache: Dict[Tuple[type, str, str], ToolSchema] = {}
+_adapters_cache: Dict[type, Dict[str, TypeAdapter]] = {}
+
+
+def _annotation_name(annotation: Any) -> str:
+    if annotation is inspect.Parameter.empty:
+        return "str"
+    return getattr(annotation, "__name__", str(annotation))
+
+
+def _annotation_json_schema(annotation: Any) -> Dict[str, Any]:
+    # Unannotated parameters are passed as strings, and a bare list as a list of strings
+    if annotation is inspect.Parameter.empty:
+        return {"type": "string"}
+    if annotation is list:
+        return {"type": "array", "items": {"type": "string"}}
+    return TypeAdapter(annotation).json_schema()
@@ -1,34 +1,52 @@
-import requests
 import json
-import os
-from typing import Any
-from dotenv import load_dotenv
+from typing import Any, Optional
+from pydantic import Field
 
+from compositeai.config import get_env
 from compositeai.tools import BaseTool
+from compositeai.tools.http_client import HttpClient, get_http_client
 
 
 class GoogleSerperApiTool(BaseTool):
     name: str = "google_search"
     description: str = "Retrieve Google search results using the Googler Serper API"
+    http_client: Optional[HttpClient] = Field(default=None, description="HTTP client to use instead of the shared default")
+    url: str = Field(default="https://google.serper.dev/search", description="Serper API search endpoint")
 
 
     def __init__(self, **data):
         super().__init__(**data)
-        load_dotenv()
-        self._SERP_API_KEY = os.getenv("SERP_API_KEY")
+        self._SERP_API_KEY = get_env("SERP_API_KEY")
 
 
     def func(self, query: str) -> Any:
         try:
-            url = "https://google.serper.dev/search"
-            payload = json.dumps({
-                "q": query
-            })
-            headers = {
-                'X-API-KEY': self._SERP_API_KEY,
-                'Content-Type': 'application/json'
-            }
-            response = requests.request("POST", url, headers=headers, data=payload)
+            response = self._http_client().request("POST", self.url, headers=self._headers(), data=self._payload(query))
             return response.json()["organic"]
         except Exception as e:
-            return f"Error using google_search: {e}"
\ No newline at end of file
+            return f"Error using google_search: {e}"
+
+
+    async def afunc(self, query: str) -> Any:
+        try:
+            response = await self._http_client().arequest("POST", self.url, headers=self._headers(), data=self._payload(query))
+            return response.json()["organic"]
+        except Exception as e:
+            return f"Error using google_search: {e}"
+
+
+    def _http_client(self) -> HttpClient:
+        return self.http_client or get_http_client()
+
+
+    def _payload(self, query: str) -> str:
+        return json.dumps({
+            "q": query
+        })
+
+
+    def _headers(self) -> dict:
+        return {
+            'X-API-KEY': self._SERP_API_KEY,
+            'Content-Type': 'application/json'
+        }
\ No newline at end of file
@@ -0,0 +1,99 @@
+from typing import Callable, Dict, List, Optional, Union
+import re
+
+
+# Tags whose content is never useful page text (scripts, styling and page chrome)
+REMOVED_TAGS = ("script", "style", "noscript", "template", "svg", "iframe", "nav", "header", "footer", "aside", "form")
+
+_SPACES = re.compile(r"[ \t\r\f\v\xa0]+")
+# Block-level tags get a line break in front, so inline markup does not split lines
+_BLOCK_TAG = r"<(/?(?:p|div|br|hr|h[1-6]|li|ul|ol|dl|dt|dd|tr|table|section|article|main|blockquote|pre|figure|figcaption)\b)"
+_BLOCK_TAGS = re.compile(_BLOCK_TAG, re.IGNORECASE)
+_BLOCK_TAGS_BYTES = re.compile(_BLOCK_TAG.encode(), re.IGNORECASE)
+
+
+def html_to_text(html: Union[str, bytes], backend: Optional[str] = None) -> str:
+    """Extract readable text from an HTML document.
+
+    Uses the fastest installed parser (selectolax, then lxml, then BeautifulSoup's html.parser)
+    unless a backend is named. Script, style and boilerplate elements are dropped, and
+    whitespace is collapsed to one line per block of text.
+    """
+    backends = _backends()
+    if backend is None:
+        backend = next(iter(backends))
+    if backend not in backends:
+        raise ValueError(f"HTML backend must be one of {list(backends)}.")
+    if isinstance(html, bytes):
+        html = _BLOCK_TAGS_BYTES.sub(rb"\n<\1", html)
+    else:
+        html = _BLOCK_TAGS.sub(r"\n<\1", html)
+    return normalize_text(backends[backend](html))
+
+
+def available_backends() -> List[str]:
+    """Installed HTML backends, fastest first"""
+    return list(_backends())
+
+
+def normalize_text(text: str) -> str:
+    """Collapse runs of whitespace and drop empty lines"""
+    lines = (_SPACES.sub(" ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _selectolax(html: Union[str, bytes]) -> str:
+    try:
+        from selectolax.lexbor import LexborHTMLParser as HTMLParser
+    except ImportError:
+        # selectolax < 0.3 only ships the Modest backend
+        from selectolax.parser import HTMLParser
+    tree = HTMLParser(html)
+    tree.strip_tags(list(REMOVED_TAGS))
+    root = tree.body or tree.root
+    return root.text() if root is not None else ""
+
+
+def _lxml(html: Union[str, bytes]) -> str:
+    import lxml.html
+    if isinstance(html, str):
+        # lxml refuses str input that carries an encoding declaration
+        html = html.encode("utf-8")
+    if not html.strip():
+        return ""
+    root = lxml.html.document_fromstring(html)
+    for element in list(root.iter(*REMOVED_TAGS)):
+        element.drop_tree()
+    body = root.find("body")
+    return "".join((body if body is not None else root).itertext())
+
+
+def _bs4(html: Union[str, bytes]) -> str:
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    for element in soup(list(REMOVED_TAGS)):
+        element.decompose()
+    return (soup.body or soup).get_text()
+
+
+_BACKENDS: Optional[Dict[str, Callable[[Union[str, bytes]], str]]] = None
+
+
+def _backends() -> Dict[str, Callable[[Union[str, bytes]], str]]:
+    global _BACKENDS
+    if _BACKENDS is None:
+        backends = {}
+        for name, modules, extract in (
+            ("selectolax", ("selectolax.lexbor", "selectolax.parser"), _selectolax),
+            ("lxml", ("lxml.html",), _lxml),
+            ("bs4", ("bs4",), _bs4),
+        ):
+            for module in modules:
+                try:
+                    __import__(module)
+                except ImportError:
+                    continue
+                backends[name] = extract
+                break
+        _BACKENDS = backends
+    return _BACKENDS
\ No newline at end of file
@@ -0,0 +1,281 @@
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field, PrivateAttr
+from urllib.parse import urlsplit
+from email.utils import parsedate_to_datetime
+import asyncio
+import threading
+import time
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class FetchResponse(BaseModel):
+    """Response of a size-bounded fetch"""
+    url: str
+    status_code: int
+    headers: Dict[str, str] = Field(default_factory=dict, description="Response headers with lowercase names")
+    content: bytes = Field(default=b"", description="Body, cut off after max_bytes")
+    truncated: bool = Field(default=False, description="Whether the body was longer than max_bytes")
+
+    @property
+    def content_type(self) -> str:
+        """Media type without parameters, e.g. text/html"""
+        return self.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    @property
+    def encoding(self) -> Optional[str]:
+        """Charset declared in the Content-Type header, if any"""
+        for param in self.headers.get("content-type", "").split(";")[1:]:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "charset" and value.strip():
+                return value.strip().strip('"\'')
+        return None
+
+
+class HttpClient(BaseModel):
+    """Shared HTTP layer for tools, with connection pooling, timeouts and retries.
+
+    Sync requests go through one pooled requests.Session. Async requests use an
+    httpx.AsyncClient per event loop when httpx is installed, and otherwise run the
+    sync session in a worker thread.
+    """
+    connect_timeout: float = Field(default=5.0, gt=0, description="Seconds to wait for a connection")
+    read_timeout: float = Field(default=30.0, gt=0, description="Seconds to wait between bytes of the response")
+    max_retries: int = Field(default=3, ge=0, description="Retries on connection errors and retry statuses")
+    backoff_factor: float = Field(default=0.5, ge=0, description="Exponential backoff base in seconds between retries")
+    retry_statuses: List[int] = Field(default=[429, 500, 502, 503, 504], description="Response statuses that are retried")
+    max_hosts: int = Field(default=32, ge=1, description="Number of hosts to keep connection pools for")
+    max_connections_per_host: int = Field(default=10, ge=1, description="Maximum concurrent connections to a single host")
+    _session: Optional[requests.Session] = PrivateAttr(default=None)
+    _async_clients: Any = PrivateAttr(default_factory=weakref.WeakKeyDictionary)
+    _host_semaphores: Any = PrivateAttr(default_factory=weakref.WeakKeyDictionary)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+
+    @property
+    def timeout(self) -> tuple:
+        return (self.connect_timeout, self.read_timeout)
+
+
+    @property
+    def session(self) -> requests.Session:
+        """Pooled session, created on first use"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    retry = Retry(
+                        total=self.max_retries,
+                        backoff_factor=self.backoff_factor,
+                        status_forcelist=self.retry_statuses,
+                        allowed_methods=None,
+                        respect_retry_after_header=True,
+                        raise_on_status=False,
+                    )
+                    adapter = HTTPAdapter(
+                        pool_connections=self.max_hosts,
+                        pool_maxsize=self.max_connections_per_host,
+                        pool_block=True,
+                        max_retries=retry,
+                    )
+                    session = requests.Session()
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """Send a request through the pooled session, retrying connection errors and retry statuses"""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+
+    def fetch(self, url: str, max_bytes: int, content_types: Optional[List[str]] = None, **kwargs: Any) -> FetchResponse:
+        """GET url, streaming the body and reading at most max_bytes of it.
+
+        If content_types is given, the body of a successful response with any other media type
+        is not downloaded at all.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        with self.session.get(url, stream=True, **kwargs) as response:
+            fetched = FetchResponse(
+                url=response.url,
+                status_code=response.status_code,
+                headers={key.lower(): value for key, value in response.headers.items()},
+            )
+            if self._should_read(fetched, content_types):
+                chunks = []
+                size = 0
+                for chunk in response.iter_content(chunk_size=_CHUNK_SIZE):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size > max_bytes:
+                        break
+                self._set_content(fetched, chunks, max_bytes)
+        return fetched
+
+
+    async def afetch(self, url: str, max_bytes: int, content_types: Optional[List[str]] = None, **kwargs: Any) -> FetchResponse:
+        """Async fetch - see fetch"""
+        try:
+            import httpx
+        except ImportError:
+            return await asyncio.to_thread(self.fetch, url, max_bytes, content_types, **kwargs)
+
+        client = self._async_client(httpx)
+        semaphore = self._host_semaphore(url)
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with semaphore:
+                    async with client.stream("GET", url, **kwargs) as response:
+                        fetched = FetchResponse(
+                            url=str(response.url),
+                            status_code=response.status_code,
+                            headers={key.lower(): value for key, value in response.headers.items()},
+                        )
+                        if fetched.status_code in self.retry_statuses and attempt < self.max_retries:
+                            delay = self._retry_after(response.headers.get("Retry-After")) or self._backoff(attempt)
+                        else:
+                            if self._should_read(fetched, content_types):
+                                chunks = []
+                                size = 0
+                                async for chunk in response.aiter_bytes(_CHUNK_SIZE):
+                                    chunks.append(chunk)
+                                    size += len(chunk)
+                                    if size > max_bytes:
+                                        break
+                                self._set_content(fetched, chunks, max_bytes)
+                            return fetched
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            await asyncio.sleep(delay)
+        return fetched
+
+
+    async def arequest(self, method: str, url: str, **kwargs: Any) -> Any:
+        """Async request - returns an httpx.Response, or a requests.Response if httpx is not installed"""
+        try:
+            import httpx
+        except ImportError:
+            return await asyncio.to_thread(self.request, method, url, **kwargs)
+
+        client = self._async_client(httpx)
+        semaphore = self._host_semaphore(url)
+        # Accept requests-style keyword arguments (requests drops headers set to None)
+        if "data" in kwargs and isinstance(kwargs["data"], (str, bytes)):
+            kwargs["content"] = kwargs.pop("data")
+        if kwargs.get("headers"):
+            kwargs["headers"] = {key: value for key, value in kwargs["headers"].items() if value is not None}
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with semaphore:
+                    response = await client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            if response.status_code not in self.retry_statuses or attempt == self.max_retries:
+                return response
+            await asyncio.sleep(self._retry_after(response.headers.get("Retry-After")) or self._backoff(attempt))
+        return response
+
+
+    async def aget(self, url: str, **kwargs: Any) -> Any:
+        return await self.arequest("GET", url, **kwargs)
+
+
+    async def apost(self, url: str, **kwargs: Any) -> Any:
+        return await self.arequest("POST", url, **kwargs)
+
+
+    def close(self) -> None:
+        """Close pooled sync connections (async clients close with their event loop)"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+    def _async_client(self, httpx: Any) -> Any:
+        # httpx clients are bound to the event loop they were first used on
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_hosts * self.max_connections_per_host),
+                follow_redirects=True,
+            )
+            self._async_clients[loop] = client
+        return client
+
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        # Per-host connection limit for async requests, one set of semaphores per event loop
+        loop = asyncio.get_running_loop()
+        semaphores = self._host_semaphores.setdefault(loop, {})
+        host = urlsplit(url).netloc
+        if host not in semaphores:
+            semaphores[host] = asyncio.Semaphore(self.max_connections_per_host)
+        return semaphores[host]
+
+
+    def _should_read(self, response: FetchResponse, content_types: Optional[List[str]]) -> bool:
+        # Error pages are always read; successful responses only if their media type is wanted or unknown
+        if content_types is None or response.status_code != 200 or not response.content_type:
+            return True
+        return response.content_type in content_types
+
+
+    def _set_content(self, response: FetchResponse, chunks: List[bytes], max_bytes: int) -> None:
+        content = b"".join(chunks)
+        response.truncated = len(content) > max_bytes
+        response.content = content[:max_bytes]
+
+
+    def _backoff(self, attempt: int) -> float:
+        return self.backoff_factor * (2 ** attempt)
+
+
+    def _retry_after(self, header: Optional[str]) -> Optional[float]:
+        # Retry-After is either a number of seconds or an HTTP date
+        if not header:
+            return None
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(header).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+_CHUNK_SIZE = 64 * 1024
+
+_default_http_client: Optional[HttpClient] = None
+_default_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """Process-wide HttpClient shared by tools that are not given their own"""
+    global _default_http_client
+    if _default_http_client is None:
+        with _default_lock:
+            if _default_http_client is None:
+                _default_http_client = HttpClient()
+    return _default_http_client
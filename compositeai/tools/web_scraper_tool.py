@@ -1,23 +1,63 @@
-import requests
-from bs4 import BeautifulSoup
+from typing import List, Optional
+from pydantic import Field
 
 from compositeai.tools import BaseTool
+from compositeai.tools.html_text import html_to_text, normalize_text
+from compositeai.tools.http_client import FetchResponse, HttpClient, get_http_client
 
 
 class WebScrapeTool(BaseTool):
     name: str = "scrape_website"
-    description: str = "Scrape the content of a website given the URL as a string"
+    description: str = "Scrape the text content of a website given the URL as a string. Long pages are split into pages of text, starting at page 1."
+    http_client: Optional[HttpClient] = Field(default=None, description="HTTP client to use instead of the shared default")
+    max_bytes: int = Field(default=2_000_000, ge=1, description="Maximum number of bytes of the response body to download")
+    max_chars: int = Field(default=16000, ge=1, description="Maximum number of characters of text returned per page")
+    content_types: List[str] = Field(
+        default=["text/html", "application/xhtml+xml", "text/plain", "text/xml", "application/xml"],
+        description="Media types that are downloaded and converted to text",
+    )
+    html_backend: Optional[str] = Field(default=None, description="HTML parser to extract text with, the fastest installed one by default")
 
-    def func(self, url: str) -> str:
+    def func(self, url: str, page: int = 1) -> str:
         try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, "html.parser")
-                text = soup.get_text()
-                if len(text) > 16000:
-                    return "Requested content exceeds maximum length."
-                return text
-            else:
-                return f"Website scrape failed: status code {response.status_code}"
+            response = self._http_client().fetch(url, self.max_bytes, self.content_types)
+            return self._parse(response, page)
         except Exception as e:
-            return f"Error using scrape_website: {e}"
\ No newline at end of file
+            return f"Error using scrape_website: {e}"
+
+    async def afunc(self, url: str, page: int = 1) -> str:
+        try:
+            response = await self._http_client().afetch(url, self.max_bytes, self.content_types)
+            return self._parse(response, page)
+        except Exception as e:
+            return f"Error using scrape_website: {e}"
+
+    def _http_client(self) -> HttpClient:
+        return self.http_client or get_http_client()
+
+    def _parse(self, response: FetchResponse, page: int) -> str:
+        if response.status_code != 200:
+            return f"Website scrape failed: status code {response.status_code}"
+        if response.content_type and response.content_type not in self.content_types:
+            return f"Website scrape failed: unsupported content type {response.content_type}"
+
+        if response.content_type == "text/plain":
+            text = normalize_text(response.content.decode(response.encoding or "utf-8", errors="replace"))
+        else:
+            # Without a charset header the parser detects the encoding from the document itself
+            content = response.content.decode(response.encoding, errors="replace") if response.encoding else response.content
+            text = html_to_text(content, self.html_backend)
+
+        # Return one page of the text, telling the agent how to get the rest
+        pages = max(1, -(-len(text) // self.max_chars))
+        if page < 1 or page > pages:
+            return f"Website scrape failed: page {page} does not exist, the content has {pages} page(s)"
+        content = text[(page - 1) * self.max_chars:page * self.max_chars]
+        notes = []
+        if page < pages:
+            notes.append(f"Showing page {page} of {pages}; call {self.name} with page={page + 1} for more.")
+        if response.truncated:
+            notes.append(f"The website was cut off after {self.max_bytes} bytes.")
+        if notes:
+            content += "\n\n[" + " ".join(notes) + "]"
+        return content
\ No newline at end of file
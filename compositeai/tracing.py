@@ -0,0 +1,138 @@
+from typing import Any, Callable, Dict, List, Optional
+from abc import abstractmethod
+from pydantic import BaseModel, Field, PrivateAttr
+import threading
+
+
+class Span(BaseModel):
+    """One driver or tool call made by an agent"""
+    kind: str = Field(description="'generate' for driver calls, 'tool' for tool calls")
+    name: str = Field(description="Model of the driver or name of the tool")
+    phase: Optional[str] = Field(default=None, description="Agent phase the call was made in, e.g. plan, action, condense, observe, output")
+    agent: Optional[str] = Field(default=None, description="Name of the agent that made the call")
+    start_time: float = Field(description="Unix time the call started")
+    wall_seconds: float = Field(description="Time the call took")
+    queue_seconds: float = Field(default=0.0, description="Time the call waited for a free concurrency slot before starting")
+    prompt_tokens: int = Field(default=0)
+    completion_tokens: int = Field(default=0)
+    cached_tokens: int = Field(default=0, description="Prompt tokens served from the provider's prompt cache")
+    cached: bool = Field(default=False, description="Whether the result was reused from a cache")
+    error: Optional[str] = Field(default=None, description="Exception raised by the call, if any")
+
+
+class UsageTotals(BaseModel):
+    calls: int = Field(default=0)
+    prompt_tokens: int = Field(default=0)
+    completion_tokens: int = Field(default=0)
+    cached_tokens: int = Field(default=0)
+    cache_hits: int = Field(default=0)
+    errors: int = Field(default=0)
+    wall_seconds: float = Field(default=0.0, description="Summed time of all calls, which can exceed elapsed time when calls run concurrently")
+    queue_seconds: float = Field(default=0.0)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def prompt_cache_hit_rate(self) -> float:
+        """Share of prompt tokens served from the provider's prompt cache"""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def add(self, span: Span) -> None:
+        self.calls += 1
+        self.prompt_tokens += span.prompt_tokens
+        self.completion_tokens += span.completion_tokens
+        self.cached_tokens += span.cached_tokens
+        self.cache_hits += span.cached
+        self.errors += span.error is not None
+        self.wall_seconds += span.wall_seconds
+        self.queue_seconds += span.queue_seconds
+
+
+class ExecutionUsage(UsageTotals):
+    """Usage of an agent execution, in total and broken down by phase and by driver/tool"""
+    by_phase: Dict[str, UsageTotals] = Field(default_factory=dict)
+    by_name: Dict[str, UsageTotals] = Field(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def add(self, span: Span) -> None:
+        # Spans arrive from worker threads when tool calls run concurrently
+        with self._lock:
+            super().add(span)
+            self.by_phase.setdefault(span.phase or "other", UsageTotals()).add(span)
+            self.by_name.setdefault(f"{span.kind}:{span.name}", UsageTotals()).add(span)
+
+
+class BaseTracer(BaseModel):
+    """Receives a span for every driver and tool call of the agents it is given to"""
+
+    @abstractmethod
+    def on_span(self, span: Span) -> None:
+        """Handle a finished call - implemented by subclass, must be thread-safe"""
+        raise NotImplementedError("Method must be implemented by a subclass")
+
+
+class CollectingTracer(BaseTracer):
+    """Keeps every span in memory"""
+    _spans: List[Span] = PrivateAttr(default_factory=list)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def on_span(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def totals(self) -> ExecutionUsage:
+        usage = ExecutionUsage()
+        for span in self.spans:
+            usage.add(span)
+        return usage
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class CallbackTracer(BaseTracer):
+    """Passes every span to a callback, e.g. to log it or export metrics"""
+    callback: Callable[[Span], Any]
+
+    def on_span(self, span: Span) -> None:
+        self.callback(span)
+
+
+class OpenTelemetryTracer(BaseTracer):
+    """Records spans with OpenTelemetry - requires the opentelemetry-api package"""
+    tracer_name: str = Field(default="compositeai", description="Name of the OpenTelemetry tracer")
+    _tracer: Any = PrivateAttr(default=None)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        from opentelemetry import trace
+        self._tracer = trace.get_tracer(self.tracer_name)
+
+    def on_span(self, span: Span) -> None:
+        attributes = {
+            "compositeai.kind": span.kind,
+            "compositeai.name": span.name,
+            "compositeai.queue_seconds": span.queue_seconds,
+            "compositeai.cached": span.cached,
+            "gen_ai.usage.input_tokens": span.prompt_tokens,
+            "gen_ai.usage.output_tokens": span.completion_tokens,
+            "gen_ai.usage.cache_read.input_tokens": span.cached_tokens,
+        }
+        if span.phase is not None:
+            attributes["compositeai.phase"] = span.phase
+        if span.agent is not None:
+            attributes["compositeai.agent"] = span.agent
+        start_ns = int(span.start_time * 1e9)
+        otel_span = self._tracer.start_span(f"{span.kind} {span.name}", start_time=start_ns, attributes=attributes)
+        if span.error is not None:
+            from opentelemetry.trace import Status, StatusCode
+            otel_span.set_status(Status(StatusCode.ERROR, span.error))
+        otel_span.end(end_time=start_ns + int(span.wall_seconds * 1e9))
\ No newline at end of file
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+# Tests share the offline fixtures of the benchmarks (fake OpenAI API, simulated agent runs)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from fake_openai import fake_openai_server, plan_agent_responder
+from fixtures import fixture_server
+
+
+@pytest.fixture
+def openai_server(monkeypatch):
+    """Fake OpenAI API answering like a PlanAgent run - set state["responder"] to answer differently"""
+    state = {}
+    with fake_openai_server(lambda body: state.get("responder", plan_agent_responder)(body)) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server["base_url"])
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-fake")
+        state.update(server)
+        yield state
+
+
+@pytest.fixture
+def http_server():
+    """Base URL of the local page server - see fixtures.fixture_server for the URLs it answers"""
+    with fixture_server() as base_url:
+        yield base_url
\ No newline at end of file
@@ -0,0 +1,84 @@
+import asyncio
+from concurrent.futures import wait
+
+import pytest
+
+from compositeai.drivers import DriverInput, OpenAIBatchDriver, RequestScheduler, UserMessage
+
+
+def _answer(body):
+    return {"role": "assistant", "content": "Answer to " + body["messages"][-1]["content"]}
+
+
+def _driver(**data) -> OpenAIBatchDriver:
+    return OpenAIBatchDriver(model="gpt-4o-mini", max_wait=0.05, poll_interval=0.05, **data)
+
+
+def _submit(driver: OpenAIBatchDriver, count: int) -> list:
+    futures = [driver.submit(DriverInput(messages=[UserMessage(role="user", content=f"Question {index}")])) for index in range(count)]
+    # Every future resolves, with a response or an error
+    done, not_done = wait(futures, timeout=10)
+    assert not not_done
+    return futures
+
+
+def test_requests_sent_in_batches(openai_server):
+    openai_server["responder"] = _answer
+    driver = _driver(batch_size=3)
+    futures = _submit(driver, 5)
+    assert [future.result().content for future in futures] == [f"Answer to Question {index}" for index in range(5)]
+    assert futures[0].result().usage.total_tokens > 0
+    assert (driver.stats.batches, driver.stats.requests, driver.stats.failed, driver.stats.pending) == (2, 5, 0, 0)
+    assert not any(path.endswith("/chat/completions") for _, path in openai_server["requests"])
+
+
+def test_generate_and_agenerate(openai_server):
+    openai_server["responder"] = _answer
+    driver = _driver()
+    input = DriverInput(messages=[UserMessage(role="user", content="Question")])
+    assert driver.generate(input).content == "Answer to Question"
+
+    async def run():
+        return await asyncio.gather(*(driver.agenerate(input) for _ in range(3)))
+
+    assert [response.content for response in asyncio.run(run())] == ["Answer to Question"] * 3
+    assert driver.stats.batches == 2
+
+
+def test_failed_result_lines(openai_server):
+    openai_server["responder"] = _answer
+    openai_server["failures"].extend([500, 400])
+    driver = _driver()
+    futures = _submit(driver, 4)
+    for future in futures[:2]:
+        with pytest.raises(RuntimeError, match="OpenAI batch request failed: .*Fake error"):
+            future.result()
+    assert [future.result().content for future in futures[2:]] == ["Answer to Question 2", "Answer to Question 3"]
+    assert driver.stats.failed == 2
+
+
+def test_expired_batch_keeps_finished_results(openai_server):
+    openai_server["responder"] = _answer
+    openai_server["batch_statuses"].append("expired")
+    driver = _driver()
+    futures = _submit(driver, 4)
+    assert [future.result().content for future in futures[:2]] == ["Answer to Question 0", "Answer to Question 1"]
+    for future in futures[2:]:
+        with pytest.raises(RuntimeError, match="batch_expired"):
+            future.result()
+    assert driver.stats.failed == 2
+
+
+def test_failed_batch_fails_every_request(openai_server):
+    openai_server["batch_statuses"].append("failed")
+    driver = _driver()
+    futures = _submit(driver, 3)
+    for future in futures:
+        with pytest.raises(RuntimeError, match="failed without a result"):
+            future.result()
+    assert driver.stats.failed == 3
+
+
+def test_scheduler_rejected():
+    with pytest.raises(ValueError, match="does not use a scheduler"):
+        OpenAIBatchDriver(model="gpt-4o-mini", scheduler=RequestScheduler())
\ No newline at end of file
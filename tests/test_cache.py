@@ -0,0 +1,72 @@
+from compositeai.blobs import MemoryBlobStore
+from compositeai.cache import MemoryCache
+from compositeai.drivers import AssistantMessage, CachedDriver, DriverInput, DriverMemory, MockDriver, SystemMessage, ToolMessage, UserMessage
+from compositeai.drivers.mock_driver import text_response
+
+
+HISTORY = [
+    SystemMessage(role="system", content="You are a research agent."),
+    UserMessage(role="user", content="Find the revenue"),
+    AssistantMessage(role="assistant", content="Looking it up."),
+    ToolMessage(role="tool", content="Revenue was 10. " * 400, tool_call_id="call_0"),
+]
+PROMPT = [SystemMessage(role="system", content="GIVEN YOUR PROGRESS, PRODUCE A FINAL RESULT.")]
+
+
+def _driver() -> CachedDriver:
+    return CachedDriver(driver=MockDriver(responses=[text_response("Answer")], cycle=True), cache=MemoryCache())
+
+
+def test_key_same_with_and_without_memory():
+    driver = _driver()
+    flat = DriverInput(messages=HISTORY + PROMPT)
+    assert driver.cache_key(DriverInput(memory=DriverMemory(HISTORY), messages=PROMPT)) == driver.cache_key(flat)
+    # Where the history ends and the per-call messages start does not matter
+    assert driver.cache_key(DriverInput(memory=DriverMemory(HISTORY[:2]), messages=HISTORY[2:] + PROMPT)) == driver.cache_key(flat)
+
+
+def test_key_follows_memory_as_it_grows():
+    driver = _driver()
+    memory = DriverMemory(HISTORY[:2])
+    keys = [driver.cache_key(DriverInput(memory=memory, messages=PROMPT))]
+    for message in HISTORY[2:]:
+        memory.append(message)
+        keys.append(driver.cache_key(DriverInput(memory=memory, messages=PROMPT)))
+    assert len(set(keys)) == len(keys)
+    assert keys[-1] == driver.cache_key(DriverInput(memory=DriverMemory(HISTORY), messages=PROMPT))
+
+
+def test_key_after_memory_replaced():
+    driver = _driver()
+    memory = DriverMemory(HISTORY)
+    before = driver.cache_key(DriverInput(memory=memory, messages=PROMPT))
+    summary = UserMessage(role="user", content="Summary: revenue was 10.")
+    memory.replace(1, 4, [summary])
+    after = driver.cache_key(DriverInput(memory=memory, messages=PROMPT))
+    assert after != before
+    assert after == driver.cache_key(DriverInput(memory=DriverMemory([HISTORY[0], summary]), messages=PROMPT))
+    assert memory.version == 1
+
+
+def test_key_same_with_blob_store():
+    driver = _driver()
+    spilled = DriverMemory(HISTORY, blob_store=MemoryBlobStore(), blob_min_chars=1000)
+    assert driver.cache_key(DriverInput(memory=spilled, messages=PROMPT)) == driver.cache_key(DriverInput(memory=DriverMemory(HISTORY), messages=PROMPT))
+
+
+def test_key_depends_on_request_options():
+    driver = _driver()
+    memory = DriverMemory(HISTORY)
+    key = driver.cache_key(DriverInput(memory=memory, messages=PROMPT))
+    assert driver.cache_key(DriverInput(memory=memory, messages=PROMPT, temperature=0.5)) != key
+    assert driver.cache_key(DriverInput(memory=memory, messages=PROMPT, response_format="json_object")) != key
+
+
+def test_identical_requests_reuse_the_response():
+    driver = _driver()
+    memory = DriverMemory(HISTORY)
+    first = driver.generate(DriverInput(memory=memory, messages=PROMPT))
+    second = driver.generate(DriverInput(memory=DriverMemory(HISTORY), messages=PROMPT))
+    assert not first.cached and second.cached
+    assert second.content == "Answer"
+    assert driver.driver.calls == 1
\ No newline at end of file
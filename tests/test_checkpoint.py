@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from compositeai.checkpoint import CheckpointWriter, FileCheckpointStore, SQLiteCheckpointStore, message_from_dict
+from compositeai.drivers import AssistantMessage, DriverMemory, SystemMessage, ToolMessage, UserMessage
+
+
+HISTORY = [
+    SystemMessage(role="system", content="You are a research agent."),
+    UserMessage(role="user", content="Find the revenue"),
+    AssistantMessage(role="assistant", content="Looking it up."),
+    ToolMessage(role="tool", content="Revenue was 10.", tool_call_id="call_0"),
+]
+
+
+def _store(tmp_path, store_class):
+    if store_class is FileCheckpointStore:
+        return store_class(directory=str(tmp_path))
+    return store_class(path=str(tmp_path / "checkpoints.sqlite3"))
+
+
+def _resume(store) -> tuple:
+    # What an agent does when executed again with the same checkpoint ID
+    messages, state = store.load("run-1")
+    memory = DriverMemory([message_from_dict(message) for message in messages])
+    writer = CheckpointWriter(store, "run-1")
+    writer.resumed(memory)
+    return memory, writer, state
+
+
+@pytest.mark.parametrize("store_class", [FileCheckpointStore, SQLiteCheckpointStore])
+def test_saves_append_and_replace(tmp_path, store_class):
+    store = _store(tmp_path, store_class)
+    memory = DriverMemory(HISTORY[:2])
+    writer = CheckpointWriter(store, "run-1")
+    writer.save(memory, {"current_plan_index": 0})
+    memory.extend(HISTORY[2:])
+    writer.save(memory, {"current_plan_index": 1})
+    messages, state = store.load("run-1")
+    assert [message_from_dict(message) for message in messages] == HISTORY
+    assert state == {"current_plan_index": 1, "messages": 4}
+
+    summary = UserMessage(role="user", content="Summary: revenue was 10.")
+    memory.replace(1, 4, [summary])
+    writer.save(memory, {"current_plan_index": 2})
+    messages, state = store.load("run-1")
+    assert [message_from_dict(message) for message in messages] == [HISTORY[0], summary]
+    assert state["messages"] == 2
+
+    store.delete("run-1")
+    assert store.load("run-1") is None
+
+
+def _interrupted_save(tmp_path, tail: str) -> FileCheckpointStore:
+    # A run saved twice, then stopped in the middle of its third save
+    store = FileCheckpointStore(directory=str(tmp_path))
+    memory = DriverMemory(HISTORY[:2])
+    writer = CheckpointWriter(store, "run-1")
+    writer.save(memory, {"current_plan_index": 0})
+    memory.extend(HISTORY[2:])
+    writer.save(memory, {"current_plan_index": 1})
+    with open(store._path("run-1"), "a", encoding="utf-8") as file:
+        file.write(tail)
+    return store
+
+
+@pytest.mark.parametrize("tail", [
+    # Torn in the middle of a line
+    '{"m":{"role":"assistant","content":"Half writ',
+    # Whole message lines, but not the state line that completes the save
+    json.dumps({"m": {"role": "assistant", "content": "STALE"}}) + "\n",
+], ids=["torn", "partial"])
+def test_resume_after_interrupted_save(tmp_path, tail):
+    store = _interrupted_save(tmp_path, tail)
+    memory, writer, state = _resume(store)
+    assert list(memory) == HISTORY
+    assert state["current_plan_index"] == 1
+
+    # Progress after resuming is saved and loaded back in full, without the interrupted save
+    more = [AssistantMessage(role="assistant", content="Revenue was 10."), ToolMessage(role="tool", content="Done.", tool_call_id="call_1")]
+    memory.append(more[0])
+    writer.save(memory, {"current_plan_index": 2})
+    memory.append(more[1])
+    writer.save(memory, {"current_plan_index": 3})
+    messages, state = store.load("run-1")
+    assert [message_from_dict(message) for message in messages] == HISTORY + more
+    assert state == {"current_plan_index": 3, "messages": 6}
\ No newline at end of file
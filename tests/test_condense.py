@@ -0,0 +1,107 @@
+import re
+
+import pytest
+
+from compositeai.agents import CondenseMode, PlanAgent
+from compositeai.agents.condense import condense_locally, split_chunks
+from compositeai.drivers import DriverInput, DriverResponse, MockDriver, ToolMessage
+from compositeai.drivers.mock_driver import json_response, text_response, tool_calls_response
+from compositeai.tools import BaseTool
+
+from fixtures import WORDS
+
+
+# Notes combined from a long result, as long as a raw result worth condensing
+COMBINED = "Combined notes. " * 20
+
+
+class SizedTool(BaseTool):
+    name: str = "fetch"
+    description: str = "Fetch a page of the given size"
+
+    def func(self, chars: int) -> str:
+        text = " ".join(WORDS) + ". "
+        return (text * (chars // len(text) + 1))[:chars]
+
+
+class Responder:
+    """Plan of one step fetching pages of the given sizes, recording the condense prompts"""
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.prompts = []
+
+    def __call__(self, input: DriverInput) -> DriverResponse:
+        prompt = input.messages[-1].content
+        if "WRITE A BRIEF PLAN" in prompt:
+            return json_response({"steps": ["Fetch the pages"]})
+        if "DO YOU BELIEVE" in prompt:
+            return json_response({"complete": True})
+        if "WORK ON THE CURRENT STEP" in prompt:
+            return tool_calls_response([("fetch", {"chars": size}) for size in self.sizes])
+        if "EACH OF THE FOLLOWING RESULTS" in prompt:
+            self.prompts.append(("batch", prompt))
+            return json_response({tool_call_id: f"Batched {tool_call_id}" for tool_call_id in re.findall(r"RESULT (\S+):", prompt)})
+        if "PART (" in prompt:
+            self.prompts.append(("map", prompt))
+            return text_response("Note")
+        if "COMBINE THE FOLLOWING NOTES" in prompt:
+            self.prompts.append(("reduce", prompt))
+            return text_response(COMBINED)
+        if "EXTRACT" in prompt:
+            self.prompts.append(("condense", prompt))
+            return text_response("Condensed")
+        return text_response("Final answer")
+
+    def kinds(self):
+        return [kind for kind, _ in self.prompts]
+
+
+def _run(responder: Responder, **data) -> list:
+    agent = PlanAgent(driver=MockDriver(responder=responder), name="researcher", description="You are a research agent.", tools=[SizedTool()], **data)
+    agent.execute("Fetch the pages")
+    return [message.content for message in agent._memory if isinstance(message, ToolMessage)]
+
+
+def test_llm_mode_condenses_each_result_once_by_default():
+    responder = Responder([40000, 2000])
+    assert _run(responder, condense_mode=CondenseMode.LLM) == ["Condensed", "Condensed"]
+    assert responder.kinds() == ["condense", "condense"]
+
+
+def test_llm_mode_map_reduces_long_results():
+    responder = Responder([40000, 2000])
+    assert _run(responder, condense_mode=CondenseMode.LLM, condense_chunk_tokens=4000) == [COMBINED, "Condensed"]
+    assert responder.kinds().count("map") == 3
+    assert responder.kinds().count("reduce") == 1
+
+
+def test_batched_mode_skips_map_reduced_results():
+    responder = Responder([40000, 2000, 3000, 10])
+    observations = _run(responder, condense_mode=CondenseMode.BATCHED, condense_chunk_tokens=4000, condense_min_chars=100)
+    assert observations == [COMBINED, "Batched call_1", "Batched call_2", observations[3]]
+    assert len(observations[3]) == 10
+    batches = [prompt for kind, prompt in responder.prompts if kind == "batch"]
+    assert len(batches) == 1
+    assert re.findall(r"RESULT (\S+):", batches[0]) == ["call_1", "call_2"]
+
+
+def test_batched_mode_without_results_to_condense():
+    responder = Responder([40000])
+    assert _run(responder, condense_mode=CondenseMode.BATCHED, condense_chunk_tokens=4000) == [COMBINED]
+    assert "batch" not in responder.kinds()
+
+
+def test_split_chunks():
+    text = "\n\n".join(f"Paragraph {index}. " + "word " * 50 for index in range(20))
+    chunks = split_chunks(text, 100, lambda text: len(text) // 4)
+    assert all(len(chunk) // 4 <= 100 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+@pytest.mark.parametrize("max_chars", [50, 200])
+def test_condense_locally_keeps_relevant_passages(max_chars):
+    text = "The weather was fine. Revenue grew to 10 million in 2023. The office moved."
+    condensed = condense_locally(text, "Revenue in 2023", max_chars)
+    assert "Revenue grew to 10 million in 2023." in condensed
+    assert len(condensed) <= max_chars
\ No newline at end of file
@@ -0,0 +1,107 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+import requests
+
+from compositeai.tools import HttpClient
+
+
+def _requests(base_url: str, path: str) -> int:
+    return requests.get(f"{base_url}/stats").json()["requests"].get(path, 0)
+
+
+def _peak(base_url: str) -> int:
+    return requests.get(f"{base_url}/stats").json()["peak"]
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retries_honour_retry_after(http_server, status):
+    client = HttpClient(backoff_factor=0)
+    path = f"/page?paragraphs=1&failures=1&status={status}&retry_after=1"
+    start = time.perf_counter()
+    response = client.get(http_server + path)
+    assert response.status_code == 200
+    assert time.perf_counter() - start >= 1
+    assert _requests(http_server, path) == 2
+
+
+def test_retries_server_errors_with_backoff(http_server):
+    client = HttpClient(backoff_factor=0.05)
+    path = "/page?paragraphs=1&failures=2&status=500"
+    assert client.fetch(http_server + path, max_bytes=1000).status_code == 200
+    assert _requests(http_server, path) == 3
+
+
+def test_retries_give_up(http_server):
+    client = HttpClient(backoff_factor=0, max_retries=2)
+    path = "/page?paragraphs=1&failures=5&status=503"
+    assert client.get(http_server + path).status_code == 503
+    assert _requests(http_server, path) == 3
+    # Other statuses are returned as they are
+    path = "/page?paragraphs=1&failures=1&status=404"
+    assert client.get(http_server + path).status_code == 404
+    assert _requests(http_server, path) == 1
+
+
+def test_read_timeout(http_server):
+    client = HttpClient(read_timeout=0.2, max_retries=0)
+    start = time.perf_counter()
+    with pytest.raises(requests.exceptions.RequestException):
+        client.get(f"{http_server}/page?paragraphs=1&delay=1")
+    assert time.perf_counter() - start < 0.9
+
+
+def test_connections_per_host(http_server):
+    client = HttpClient(max_connections_per_host=2)
+    with ThreadPoolExecutor(6) as executor:
+        statuses = list(executor.map(lambda index: client.get(f"{http_server}/page?paragraphs=1&delay=0.1&n={index}").status_code, range(6)))
+    assert statuses == [200] * 6
+    assert _peak(http_server) == 2
+
+
+def test_async_retries_honour_retry_after(http_server):
+    client = HttpClient(backoff_factor=0)
+    request_path = "/page?paragraphs=1&failures=1&status=429&retry_after=1"
+    fetch_path = request_path + "&fetch=1"
+
+    async def run():
+        start = time.perf_counter()
+        response = await client.aget(http_server + request_path)
+        fetched = await client.afetch(http_server + fetch_path, max_bytes=1000)
+        return response, fetched, time.perf_counter() - start
+
+    response, fetched, elapsed = asyncio.run(run())
+    assert response.status_code == 200 and fetched.status_code == 200
+    assert elapsed >= 2
+    assert _requests(http_server, request_path) == 2
+    assert _requests(http_server, fetch_path) == 2
+
+
+def test_async_retries_give_up(http_server):
+    client = HttpClient(backoff_factor=0, max_retries=1)
+    path = "/page?paragraphs=1&failures=5&status=502"
+    fetched = asyncio.run(client.afetch(http_server + path, max_bytes=1000))
+    assert fetched.status_code == 502
+    assert _requests(http_server, path) == 2
+
+
+def test_async_read_timeout(http_server):
+    client = HttpClient(read_timeout=0.2, max_retries=1, backoff_factor=0)
+    path = "/page?paragraphs=1&delay=1"
+    with pytest.raises(httpx.TimeoutException):
+        asyncio.run(client.aget(http_server + path))
+    # Timeouts are retried like connection errors
+    assert _requests(http_server, path) == 2
+
+
+def test_async_connections_per_host(http_server):
+    client = HttpClient(max_connections_per_host=2)
+
+    async def run():
+        return await asyncio.gather(*(client.afetch(f"{http_server}/page?paragraphs=1&delay=0.1&n={index}", max_bytes=1000) for index in range(6)))
+
+    assert [fetched.status_code for fetched in asyncio.run(run())] == [200] * 6
+    assert _peak(http_server) == 2
\ No newline at end of file
@@ -0,0 +1,84 @@
+import threading
+
+from compositeai.agents import MemoryManager
+from compositeai.blobs import MemoryBlobStore
+from compositeai.drivers import DriverInput, DriverMemory, MockDriver, UserMessage
+
+
+def _message(index: int, chars: int = 10) -> UserMessage:
+    return UserMessage(role="user", content=f"{index:04d}" + "x" * chars)
+
+
+class RecordingConvert:
+    """Converts messages to their contents, recording the size of every batch"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, messages):
+        self.batches.append(len(messages))
+        return [message.content for message in messages]
+
+
+def test_converted_once_per_message():
+    memory = DriverMemory([_message(index) for index in range(3)])
+    convert = RecordingConvert()
+    assert memory.converted("contents", convert) == [message.content for message in memory]
+    memory.append(_message(3))
+    assert len(memory.converted("contents", convert)) == 4
+    assert convert.batches == [3, 1]
+
+
+def test_spilled_messages_converted_in_one_batch():
+    messages = [_message(index, chars=2000 if index % 2 else 10) for index in range(6)]
+    memory = DriverMemory(messages, blob_store=MemoryBlobStore(), blob_min_chars=1000)
+    convert = RecordingConvert()
+    assert memory.converted("contents", convert) == [message.content for message in messages]
+    # Spilled messages are converted again on later calls, all together
+    assert memory.converted("contents", convert) == [message.content for message in messages]
+    assert convert.batches == [6, 3]
+
+
+def test_concurrent_appends_keep_every_message():
+    memory = DriverMemory(blob_store=MemoryBlobStore(), blob_min_chars=1000)
+
+    def add(thread: int):
+        for index in range(200):
+            message = _message(thread * 1000 + index, chars=2000 if index % 10 == 0 else 10)
+            if index % 2:
+                memory.append(message)
+            else:
+                memory.extend([message])
+
+    threads = [threading.Thread(target=add, args=(thread,)) for thread in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(memory) == 1600
+    assert sorted(message.content[:4] for message in memory) == sorted(f"{thread * 1000 + index:04d}" for thread in range(8) for index in range(200))
+
+
+class CountingDriver(MockDriver):
+    """Counts the texts it is asked to count tokens of"""
+    counted: int = 0
+
+    def count_tokens(self, text: str) -> int:
+        self.counted += 1
+        return super().count_tokens(text)
+
+
+def test_history_tokens_counted_like_prompts():
+    memory = DriverMemory([_message(index, chars=400) for index in range(5)])
+    driver = CountingDriver(responses=[])
+    manager = MemoryManager(max_tokens=100, keep_recent=2)
+    tokens = manager.history_tokens(memory, driver)
+    assert tokens == driver.estimate_prompt_tokens(DriverInput(messages=list(memory)))
+    # The counts are kept in memory and shared with the driver's own prompt estimates
+    counted = driver.counted
+    assert driver.estimate_prompt_tokens(DriverInput(messages=[], memory=memory)) == tokens
+    assert manager.history_tokens(memory, driver) == tokens
+    assert driver.counted == counted
+    memory.append(_message(5, chars=400))
+    assert manager.history_tokens(memory, driver) > tokens
+    assert driver.counted == counted + 1
\ No newline at end of file
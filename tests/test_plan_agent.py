@@ -0,0 +1,199 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from compositeai.agents import CondenseMode, PlanAgent, StepCheckMode
+from compositeai.checkpoint import FileCheckpointStore, SQLiteCheckpointStore
+from compositeai.drivers import DriverInput, DriverResponse, MockDriver, ToolMessage
+from compositeai.drivers.mock_driver import json_response, text_response, tool_calls_response
+from compositeai.tools import BaseTool
+
+from fixtures import PlanAgentResponder
+
+
+class SlowTool(BaseTool):
+    """Returns its query after a delay, recording how many calls ran at the same time"""
+    name: str = "slow_search"
+    description: str = "Search for information given a query"
+    latency: float = 0.1
+    running: int = 0
+    peak: int = 0
+
+    def func(self, query: str) -> str:
+        with _lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.latency)
+        with _lock:
+            self.running -= 1
+        return f"Results for {query}"
+
+
+_lock = threading.Lock()
+
+
+def _agent(responder, tool: BaseTool = None, **data) -> PlanAgent:
+    return PlanAgent(
+        driver=MockDriver(responder=responder),
+        name="researcher",
+        description="You are a research agent.",
+        tools=[tool] if tool is not None else None,
+        condense_mode=CondenseMode.OFF,
+        **data,
+    )
+
+
+def _tool_messages(agent: PlanAgent):
+    return [message for message in agent._memory if isinstance(message, ToolMessage)]
+
+
+def test_tool_calls_run_in_parallel():
+    tool = SlowTool()
+    agent = _agent(PlanAgentResponder(1, 4, tool.name, {"query": "revenue"}), tool, max_concurrency=4)
+    agent.execute("Find the revenue")
+    assert tool.peak == 4
+    # Results stay matched to their calls, in order
+    assert [message.tool_call_id for message in _tool_messages(agent)] == ["call_0", "call_1", "call_2", "call_3"]
+
+
+def test_tool_calls_bounded_by_max_concurrency():
+    tool = SlowTool(latency=0.05)
+    agent = _agent(PlanAgentResponder(1, 4, tool.name, {"query": "revenue"}), tool, max_concurrency=2)
+    agent.execute("Find the revenue")
+    assert tool.peak == 2
+    assert len(_tool_messages(agent)) == 4
+
+
+def test_tool_calls_run_in_parallel_async():
+    tool = SlowTool()
+    agent = _agent(PlanAgentResponder(1, 4, tool.name, {"query": "revenue"}), tool, max_concurrency=4)
+    execution = asyncio.run(agent.aexecute("Find the revenue"))
+    assert execution.result.content == "Final answer"
+    assert tool.peak == 4
+    assert [message.tool_call_id for message in _tool_messages(agent)] == ["call_0", "call_1", "call_2", "call_3"]
+
+
+def _failing_on(word: str, responder):
+    def respond(input: DriverInput) -> DriverResponse:
+        if any(word in (getattr(message, "content", None) or "") for message in input.get_messages()):
+            raise RuntimeError(f"Failed on {word}")
+        return responder(input)
+    return respond
+
+
+def test_execute_many():
+    responder = _failing_on("task 3", PlanAgentResponder(1, 0, "none", {}))
+    agent = _agent(responder)
+    results = sorted(agent.execute_many([f"Research task {index}" for index in range(6)], concurrency=3), key=lambda result: result.index)
+    assert [result.index for result in results] == list(range(6))
+    assert results[3].execution is None and "Failed on task 3" in results[3].error
+    assert all(result.execution.result.content == "Final answer" for result in results if result.index != 3)
+    # Runs use copies, the agent itself is untouched
+    assert len(agent._memory) == 1
+
+
+def test_aexecute_many():
+    agent = _agent(PlanAgentResponder(1, 0, "none", {}))
+    async def run():
+        return [result async for result in agent.aexecute_many((f"Research task {index}" for index in range(5)), concurrency=2)]
+    results = asyncio.run(run())
+    assert sorted(result.index for result in results) == list(range(5))
+    assert all(result.error is None for result in results)
+
+
+class _Crash(Exception):
+    pass
+
+
+@pytest.mark.parametrize("store_class", [FileCheckpointStore, SQLiteCheckpointStore])
+def test_checkpoint_resume(tmp_path, store_class):
+    store = store_class(directory=str(tmp_path)) if store_class is FileCheckpointStore else store_class(path=str(tmp_path / "checkpoints.sqlite3"))
+    tool = SlowTool(latency=0)
+    responder = PlanAgentResponder(3, 1, tool.name, {"query": "revenue"})
+    prompts = []
+
+    def crash_after_step_one(input: DriverInput) -> DriverResponse:
+        prompt = input.messages[-1].content
+        if "Step 1" in prompt:
+            raise _Crash()
+        prompts.append(prompt)
+        return responder(input)
+
+    agent = _agent(crash_after_step_one, tool, checkpoint_store=store)
+    with pytest.raises(_Crash):
+        agent.execute("Find the revenue", checkpoint_id="run-1")
+    assert sum("WRITE A BRIEF PLAN" in prompt for prompt in prompts) == 1
+
+    # A new process would build the agent again and resume where the run stopped
+    resumed_prompts = []
+    def record(input: DriverInput) -> DriverResponse:
+        resumed_prompts.append(input.messages[-1].content)
+        return responder(input)
+    resumed = _agent(record, tool, checkpoint_store=store)
+    execution = resumed.execute("Find the revenue", checkpoint_id="run-1")
+    assert execution.result.content == "Final answer"
+    assert not any("WRITE A BRIEF PLAN" in prompt for prompt in resumed_prompts)
+    assert "Step 0" not in "".join(resumed_prompts)
+    # Step 0's tool result came back from the checkpoint
+    assert len(_tool_messages(resumed)) == 3
+    # Finished runs leave no checkpoint behind
+    assert store.load("run-1") is None
+
+
+@pytest.mark.parametrize("stable_prompt_prefix", [False, True])
+def test_stable_prompt_prefix_is_opt_in(stable_prompt_prefix):
+    tool = SlowTool(latency=0)
+    inputs = []
+    responder = PlanAgentResponder(1, 1, tool.name, {"query": "revenue"})
+    def record(input: DriverInput) -> DriverResponse:
+        inputs.append(input)
+        return responder(input)
+    agent = _agent(record, tool, stable_prompt_prefix=True) if stable_prompt_prefix else _agent(record, tool)
+    agent.execute("Find the revenue")
+    # Plan, action, step check and output: only the action can call tools either way
+    offered = [input.tool_choice.value if input.tools else None for input in inputs]
+    if stable_prompt_prefix:
+        assert offered == ["none", "auto", "none", "none"]
+    else:
+        assert offered == [None, "auto", None, None]
+
+
+def test_merged_step_check_completes_with_last_tools():
+    tool = SlowTool(latency=0)
+    prompts = []
+    responder = PlanAgentResponder(2, 2, tool.name, {"query": "revenue"})
+    def record(input: DriverInput) -> DriverResponse:
+        prompts.append(input.messages[-1].content)
+        return responder(input)
+    agent = _agent(record, tool, step_check_mode=StepCheckMode.MERGED)
+    execution = agent.execute("Find the revenue")
+    assert execution.result.content == "Final answer"
+    # Plan, one action per step and output: step_complete came with the tools, so no further call
+    assert len(prompts) == 4
+    assert not any("DO YOU BELIEVE" in prompt for prompt in prompts)
+    messages = _tool_messages(agent)
+    assert [message.content for message in messages] == ["Results for revenue", "Results for revenue", "Step marked complete."] * 2
+    assert [message.tool_call_id for message in messages[:3]] == ["call_0", "call_1", "call_2"]
+
+def test_merged_step_check_falls_back_to_separate_check():
+    tool = SlowTool(latency=0)
+    prompts = []
+    checks = iter([False, True, True])
+    def record(input: DriverInput) -> DriverResponse:
+        # A model that keeps calling tools and never calls step_complete
+        prompt = input.messages[-1].content
+        prompts.append(prompt.split()[0])
+        if "WRITE A BRIEF PLAN" in prompt:
+            return json_response({"steps": ["Step 0", "Step 1"]})
+        if "DO YOU BELIEVE" in prompt:
+            return json_response({"complete": next(checks)})
+        if "WORK ON THE CURRENT STEP" in prompt:
+            return tool_calls_response([(tool.name, {"query": "revenue"})])
+        return text_response("Final answer")
+    agent = _agent(record, tool, step_check_mode=StepCheckMode.MERGED, merged_check_after=2, max_iterations=20)
+    execution = agent.execute("Find the revenue")
+    assert execution.result.content == "Final answer"
+    # A separate step check after every two actions that only called tools, counted again after each check
+    assert prompts == ["WRITE"] + ["WORK", "WORK", "DO"] * 3 + ["GIVEN"]
\ No newline at end of file
@@ -0,0 +1,166 @@
+import json
+import math
+import random
+
+import pytest
+
+from compositeai.agents import HashingEmbedder, RetrievalMemory, VectorIndex
+from compositeai.agents import retrieval
+from compositeai.agents.retrieval import RETRIEVED_PREFIX
+from compositeai.blobs import MemoryBlobStore
+from compositeai.drivers import AssistantMessage, DriverMemory, DriverToolCall, SystemMessage, ToolMessage, UserMessage
+
+
+TOPICS = [
+    "acme revenue grew to 10 million",
+    "globex hired new staff",
+    "initech moved its office",
+    "acme revenue fell in the last quarter",
+    "umbrella opened a lab",
+    "hooli launched a phone",
+]
+
+
+def _turn(index: int, topic: str, padding: int = 0):
+    tool_call = DriverToolCall(id=f"call_{index}", name="search", args=json.dumps({"q": topic.split()[0]}))
+    return [
+        AssistantMessage(role="assistant", tool_calls=[tool_call]),
+        ToolMessage(role="tool", content=topic + "." + " filler" * padding, tool_call_id=tool_call.id),
+    ]
+
+
+def _memory(topics, padding: int = 0, **data) -> DriverMemory:
+    memory = DriverMemory([
+        SystemMessage(role="system", content="You are a research agent."),
+        UserMessage(role="user", content="Research the companies"),
+    ], **data)
+    for index, topic in enumerate(topics):
+        memory.extend(_turn(index, topic, padding))
+    return memory
+
+
+def _retrieved(view: DriverMemory) -> str:
+    return next(message.content for message in view if message.content and message.content.startswith(RETRIEVED_PREFIX))
+
+
+def test_short_history_sent_whole():
+    memory = _memory(TOPICS[:2])
+    assert RetrievalMemory(top_k=2, recent_messages=2).retriever().view(memory, "acme revenue") is memory
+
+
+def test_view_sends_head_relevant_observations_and_recent_turn():
+    memory = _memory(TOPICS)
+    view = RetrievalMemory(top_k=2, recent_messages=2).retriever().view(memory, "acme revenue")
+    messages = list(view)
+    assert messages[:2] == list(memory[:2])
+    assert messages[3:] == list(memory[-2:])
+    retrieved = _retrieved(view)
+    assert 'search({"q": "acme"}):\nacme revenue grew to 10 million.' in retrieved
+    assert "acme revenue fell in the last quarter." in retrieved
+    assert "globex" not in retrieved
+
+
+def test_view_reused_until_memory_changes():
+    memory = _memory(TOPICS)
+    retriever = RetrievalMemory(top_k=2, recent_messages=2).retriever()
+    view = retriever.view(memory, "acme revenue")
+    # The same observations retrieved for another query
+    assert retriever.view(memory, "acme revenue acme") is view
+    assert retriever.view(memory, "hooli phone") is not view
+
+    converted = []
+    def convert(messages):
+        converted.extend(messages)
+        return [message.content for message in messages]
+    view = retriever.view(memory, "acme revenue")
+    view.converted("contents", convert)
+    memory.extend(_turn(len(TOPICS), "soylent changed its recipe"))
+    grown = retriever.view(memory, "acme revenue")
+    assert grown is not view
+    assert grown.converted("contents", convert) == [message.content for message in grown]
+    # Only the new turn is converted again, the rest comes from the previous view
+    assert len(converted) == len(view) + 2
+
+
+def test_view_keeps_contents_in_blob_store():
+    blob_store = MemoryBlobStore()
+    memory = _memory(TOPICS, padding=200, blob_store=blob_store, blob_min_chars=1000)
+    retriever = RetrievalMemory(top_k=2, recent_messages=2).retriever()
+    view = retriever.view(memory, "acme revenue")
+    assert [message.content for message in view][3:] == [message.content for message in memory[-2:]]
+    reads = blob_store.stats.gets
+    memory.extend(_turn(len(TOPICS), "soylent changed its recipe", padding=200))
+    retriever.view(memory, "acme revenue")
+    # Indexing reads the new observation; the retrieved and recent messages are not read back
+    assert blob_store.stats.gets == reads + 1
+
+
+def test_view_after_compaction():
+    memory = _memory(TOPICS)
+    retriever = RetrievalMemory(top_k=2, recent_messages=2).retriever()
+    view = retriever.view(memory, "acme revenue")
+    # The first two turns are summarized, as MemoryManager does when the history gets too long
+    summary = UserMessage(role="user", content="Summary: acme revenue grew, globex hired.")
+    memory.replace(2, 6, [summary])
+    assert memory.version == 1
+    compacted = retriever.view(memory, "acme revenue")
+    assert compacted is not view
+    messages = list(compacted)
+    assert messages[2] == summary
+    retrieved = _retrieved(compacted)
+    assert "grew to 10 million" not in retrieved
+    assert 'search({"q": "acme"}):\nacme revenue fell in the last quarter.' in retrieved
+    assert messages[-2:] == list(memory[-2:])
+
+
+@pytest.fixture(params=["numpy", "python"])
+def vectors(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(retrieval, "_numpy", lambda: None)
+    elif retrieval._numpy() is None:
+        pytest.skip("numpy is not installed")
+    return request.param
+
+
+def _best(rows, query, top_k, limit=None):
+    # Brute force cosine similarity, best first
+    def cosine(row):
+        norms = math.sqrt(sum(value * value for value in row)) * math.sqrt(sum(value * value for value in query))
+        return sum(a * b for a, b in zip(row, query)) / norms if norms else 0.0
+    scores = [(cosine(row), position) for position, row in enumerate(rows[:limit])]
+    return [position for score, position in sorted(scores, key=lambda item: (-item[0], item[1]))[:top_k]]
+
+
+def test_index_search(vectors):
+    rng = random.Random(0)
+    embedder = HashingEmbedder(dimensions=64)
+    words = [f"word{index}" for index in range(200)]
+    texts = [" ".join(rng.choices(words, k=20)) for _ in range(150)]
+    rows = [list(vector) for vector in embedder.embed(texts)]
+    index = VectorIndex()
+    # Added in several batches, growing the matrix
+    for start in range(0, len(rows), 40):
+        index.add(rows[start:start + 40], list(range(start, min(start + 40, len(rows)))))
+    assert len(index) == 150
+    sparse = list(embedder.embed([" ".join(rng.choices(words, k=3))])[0])
+    dense = [rng.uniform(-1, 1) for _ in range(64)]
+    for query in (sparse, dense):
+        assert [item for score, item in index.search(query, 5)] == _best(rows, query, 5)
+        assert [item for score, item in index.search(query, 5, limit=50)] == _best(rows, query, 5, limit=50)
+
+
+def test_index_save_and_load(vectors, tmp_path):
+    rng = random.Random(1)
+    rows = [[rng.uniform(-1, 1) for _ in range(16)] for _ in range(70)]
+    index = VectorIndex()
+    index.add(rows, [{"position": position} for position in range(70)])
+    path = str(tmp_path / "index.bin")
+    index.save(path)
+    loaded = VectorIndex.load(path)
+    query = rows[7]
+    results = index.search(query, 3)
+    assert [item for score, item in loaded.search(query, 3)] == [item for score, item in results]
+    assert [score for score, item in loaded.search(query, 3)] == pytest.approx([score for score, item in results])
+    assert results[0][1] == {"position": 7}
+    loaded.add(rows[:1], ["again"])
+    assert len(loaded) == 71
\ No newline at end of file
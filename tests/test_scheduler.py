@@ -0,0 +1,95 @@
+import asyncio
+import socket
+
+import openai
+import pytest
+
+from compositeai.drivers import DriverInput, OpenAIDriver, RequestScheduler, UserMessage
+
+
+def _input() -> DriverInput:
+    return DriverInput(messages=[UserMessage(role="user", content="Hello")])
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def _failing(statuses):
+    # Raises an error with each of statuses in turn, then returns the number of calls
+    calls = []
+    def send():
+        calls.append(None)
+        if len(calls) <= len(statuses):
+            raise _StatusError(statuses[len(calls) - 1])
+        return len(calls)
+    return send
+
+
+def test_rate_limit_retried():
+    scheduler = RequestScheduler(backoff_factor=0)
+    assert scheduler.call(_failing([429, 429]), tokens=10) == 3
+    assert scheduler.stats.throttled == 2
+    assert scheduler.stats.retries == 2
+    assert scheduler.stats.completed == 1
+
+
+def test_transient_errors_retried_without_pausing():
+    scheduler = RequestScheduler(backoff_factor=0.01)
+    assert scheduler.call(_failing([500, 503, 408]), tokens=10) == 4
+    assert scheduler.stats.transient_errors == 3
+    assert scheduler.stats.throttled == 0
+    assert scheduler._paused_until == 0.0
+
+
+def test_client_errors_not_retried():
+    scheduler = RequestScheduler(backoff_factor=0)
+    with pytest.raises(_StatusError):
+        scheduler.call(_failing([400]), tokens=10)
+    assert scheduler.stats.retries == 0
+
+
+def test_retries_give_up():
+    scheduler = RequestScheduler(backoff_factor=0, max_retries=2)
+    with pytest.raises(_StatusError):
+        scheduler.call(_failing([429, 500, 429]), tokens=10)
+    assert scheduler.stats.retries == 2
+
+
+def test_async_rate_limit_retried():
+    scheduler = RequestScheduler(backoff_factor=0)
+    send = _failing([429, 502])
+    async def asend():
+        return send()
+    assert asyncio.run(scheduler.acall(asend, tokens=10)) == 3
+    assert scheduler.stats.throttled == 1
+    assert scheduler.stats.transient_errors == 1
+
+
+def test_driver_retries_through_scheduler(openai_server):
+    openai_server["failures"].extend([429, 500, 503])
+    scheduler = RequestScheduler(backoff_factor=0)
+    driver = OpenAIDriver(model="gpt-4o-mini", seed=0, scheduler=scheduler)
+    assert driver.generate(_input()).content == "Final answer."
+    assert scheduler.stats.throttled == 1
+    assert scheduler.stats.transient_errors == 2
+    assert scheduler.stats.completed == 1
+    # The client itself does not retry on top of the scheduler
+    assert len([request for request in openai_server["requests"] if request[1].endswith("/chat/completions")]) == 4
+
+
+def test_driver_retries_connection_errors(monkeypatch):
+    # Nothing listens on a port that was just freed
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{port}/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-fake")
+    scheduler = RequestScheduler(backoff_factor=0, max_retries=2)
+    driver = OpenAIDriver(model="gpt-4o-mini", seed=0, scheduler=scheduler)
+    with pytest.raises(openai.APIConnectionError):
+        driver.generate(_input())
+    assert scheduler.stats.transient_errors == 3
+    assert scheduler.stats.retries == 2
\ No newline at end of file
@@ -0,0 +1,160 @@
+import json
+from typing import List, Optional
+
+import pytest
+from pydantic import BaseModel, Field
+
+from compositeai.agents import CondenseMode, PlanAgent, StepCheckMode
+from compositeai.agents.plan_agent import Plan
+from compositeai.drivers import DriverInput, OpenAIDriver, SystemMessage
+from compositeai.drivers.openai_driver import _response_format_param
+from compositeai.structured import StructuredOutputError, parse_model, repair_json
+
+from fake_openai import plan_agent_responder
+
+
+TRUNCATED_PLAN = '{"steps": ["Look it up", "Answer"'
+TRUNCATED_REPORT = '{"title": "Revenue", "source": {"url": "https://example.com", "name": null}, "figures": [1.5, 2'
+FENCED_PLAN = 'Here is the plan:\n```json\n{"steps": ["Look it up", "Answer",]}\n```'
+
+
+class Source(BaseModel):
+    url: str
+    name: Optional[str] = None
+
+
+class Report(BaseModel):
+    title: str = Field(description="Title of the report")
+    source: Source = Field(description="Where the figures come from")
+    figures: List[float]
+
+
+def _answering_with(prompt: str, content: str, times: int = 1):
+    # Answers the first times requests with prompt with content, and everything else as usual
+    calls = {"count": 0}
+    def respond(body):
+        messages = body["messages"]
+        retry = "ANSWER AGAIN" in messages[-1]["content"]
+        if prompt in messages[-3 if retry else -1]["content"]:
+            calls["count"] += 1
+            if calls["count"] <= times:
+                return {"role": "assistant", "content": content}
+        return plan_agent_responder(body)
+    return respond, calls
+
+
+def _answering_plan_with(content: str, times: int = 1):
+    return _answering_with("WRITE A BRIEF PLAN", content, times)
+
+
+def test_repair_json():
+    assert json.loads(repair_json(TRUNCATED_PLAN)) == {"steps": ["Look it up", "Answer"]}
+    assert json.loads(repair_json(FENCED_PLAN)) == {"steps": ["Look it up", "Answer"]}
+    assert json.loads(repair_json('{"steps": ["Look it')) == {"steps": ["Look it"]}
+
+
+def test_parse_model():
+    assert parse_model(TRUNCATED_PLAN, Plan).steps == ["Look it up", "Answer"]
+    assert parse_model({"steps": ["a"]}, Plan).steps == ["a"]
+    with pytest.raises(StructuredOutputError) as error:
+        parse_model("no plan here", Plan)
+    assert error.value.content == "no plan here"
+
+
+def test_driver_returns_text_that_does_not_validate(openai_server):
+    openai_server["responder"] = lambda body: {"role": "assistant", "content": TRUNCATED_PLAN}
+    driver = OpenAIDriver(model="gpt-4o-mini", seed=0)
+    input = DriverInput(messages=[SystemMessage(role="system", content="WRITE A BRIEF PLAN")], response_format=Plan)
+    assert driver.generate(input).content == TRUNCATED_PLAN
+
+    openai_server["responder"] = lambda body: {"role": "assistant", "content": json.dumps({"steps": ["a"]})}
+    assert driver.generate(input).content == Plan(steps=["a"])
+
+
+@pytest.mark.parametrize("content", [TRUNCATED_PLAN, FENCED_PLAN])
+@pytest.mark.parametrize("stable_prompt_prefix", [False, True])
+def test_plan_repaired_locally(openai_server, content, stable_prompt_prefix):
+    openai_server["responder"], calls = _answering_plan_with(content)
+    agent = PlanAgent(
+        driver=OpenAIDriver(model="gpt-4o-mini", seed=0),
+        description="You are a research agent.",
+        condense_mode=CondenseMode.OFF,
+        stable_prompt_prefix=stable_prompt_prefix,
+    )
+    execution = agent.execute("Find the revenue")
+    assert execution.steps[0].content == "1. Look it up\n2. Answer\n"
+    # Repaired without asking again
+    assert calls["count"] == 1
+
+
+def test_plan_asked_again_once(openai_server):
+    openai_server["responder"], calls = _answering_plan_with("I cannot write a plan.")
+    agent = PlanAgent(
+        driver=OpenAIDriver(model="gpt-4o-mini", seed=0),
+        description="You are a research agent.",
+        condense_mode=CondenseMode.OFF,
+    )
+    execution = agent.execute("Find the revenue")
+    assert execution.steps[0].content == "1. Look it up\n2. Answer\n"
+    assert calls["count"] == 2
+
+
+def test_plan_error_after_retries(openai_server):
+    openai_server["responder"], calls = _answering_plan_with("I cannot write a plan.", times=10)
+    agent = PlanAgent(
+        driver=OpenAIDriver(model="gpt-4o-mini", seed=0),
+        description="You are a research agent.",
+        condense_mode=CondenseMode.OFF,
+        structured_retries=2,
+    )
+    with pytest.raises(StructuredOutputError):
+        agent.execute("Find the revenue")
+    assert calls["count"] == 3
+
+
+def test_response_format_is_strict():
+    response_format = _response_format_param(Report)
+    assert response_format["type"] == "json_schema"
+    assert response_format["json_schema"]["name"] == "Report"
+    assert response_format["json_schema"]["strict"] is True
+    schema = response_format["json_schema"]["schema"]
+    assert schema["additionalProperties"] is False
+    assert schema["required"] == ["title", "source", "figures"]
+    # The nested model is inlined next to the field's description, and closed as well
+    source = schema["properties"]["source"]
+    assert "$ref" not in source and source["description"] == "Where the figures come from"
+    assert source["required"] == ["url", "name"] and source["additionalProperties"] is False
+    assert "default" not in source["properties"]["name"]
+    assert _response_format_param("json_object") == {"type": "json_object"}
+
+
+def _report_agent(**data) -> PlanAgent:
+    return PlanAgent(
+        driver=OpenAIDriver(model="gpt-4o-mini", seed=0),
+        description="You are a research agent.",
+        condense_mode=CondenseMode.OFF,
+        response_format=Report,
+        **data,
+    )
+
+
+def test_output_repaired_locally(openai_server):
+    openai_server["responder"], calls = _answering_with("PRODUCE A FINAL RESULT", TRUNCATED_REPORT)
+    execution = _report_agent().execute("Find the revenue")
+    assert execution.result.content == Report(title="Revenue", source=Source(url="https://example.com"), figures=[1.5, 2])
+    assert calls["count"] == 1
+
+
+@pytest.mark.parametrize("step_check_mode", [StepCheckMode.SEPARATE, StepCheckMode.SPECULATIVE])
+def test_output_asked_again(openai_server, step_check_mode):
+    openai_server["responder"], calls = _answering_with("PRODUCE A FINAL RESULT", "The revenue was 1.5.")
+    execution = _report_agent(step_check_mode=step_check_mode).execute("Find the revenue")
+    assert isinstance(execution.result.content, Report)
+    assert calls["count"] == 2
+
+
+def test_output_error_after_retries(openai_server):
+    openai_server["responder"], calls = _answering_with("PRODUCE A FINAL RESULT", "The revenue was 1.5.", times=10)
+    with pytest.raises(StructuredOutputError):
+        _report_agent(structured_retries=1).execute("Find the revenue")
+    assert calls["count"] == 2
\ No newline at end of file
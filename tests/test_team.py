@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+import pytest
+
+from compositeai.agents import AgentTeam, CondenseMode, PlanAgent
+from compositeai.drivers import DriverInput, DriverResponse, MockDriver
+from compositeai.drivers.mock_driver import json_response, text_response, tool_calls_response
+
+
+def _responder(name: str, delegate: str = None, calls: int = 1):
+    # One step plan whose action delegates calls sub-tasks to delegate, if any
+    def respond(input: DriverInput) -> DriverResponse:
+        prompt = input.messages[-1].content
+        if "WRITE A BRIEF PLAN" in prompt:
+            return json_response({"steps": [f"Step of {name}"]})
+        if "DO YOU BELIEVE" in prompt:
+            return json_response({"complete": True})
+        if "WORK ON THE CURRENT STEP" in prompt and delegate is not None:
+            return tool_calls_response([(delegate, {"task": f"Sub-task {index}"}) for index in range(calls)])
+        return text_response(f"Answer of {name}")
+    return respond
+
+
+def _agent(name: str, delegate: str = None, calls: int = 1, is_entry: bool = False) -> PlanAgent:
+    return PlanAgent(
+        driver=MockDriver(responder=_responder(name, delegate, calls)),
+        name=name,
+        description=f"You are agent {name}.",
+        is_entry=is_entry,
+        condense_mode=CondenseMode.OFF,
+    )
+
+
+def _run_with_timeout(func, timeout: float = 10.0):
+    # A deadlocked run fails the test instead of hanging it
+    outcome = {}
+    def target():
+        try:
+            outcome["result"] = func()
+        except Exception as e:
+            outcome["error"] = e
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "team run did not finish"
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+def _chain_team(max_concurrency: int, calls: int = 1) -> AgentTeam:
+    return AgentTeam(
+        agents=[_agent("entry", "a", calls, is_entry=True), _agent("a", "b", calls), _agent("b")],
+        delegates={"entry": ["a"], "a": ["b"]},
+        max_concurrency=max_concurrency,
+    )
+
+
+def test_nested_delegation_with_one_slot():
+    team = _chain_team(max_concurrency=1)
+    execution = _run_with_timeout(lambda: team.execute("Task"))
+    assert execution.result.content == "Answer of entry"
+    assert "Answer of a" in execution.steps[1].content
+
+
+def test_nested_fan_out_filling_every_slot():
+    team = _chain_team(max_concurrency=4, calls=4)
+    execution = _run_with_timeout(lambda: team.execute("Task"))
+    assert execution.steps[1].content.count("Answer of a") == 4
+
+
+def test_nested_delegation_with_one_slot_async():
+    team = _chain_team(max_concurrency=1)
+    execution = _run_with_timeout(lambda: asyncio.run(team.aexecute("Task")))
+    assert execution.result.content == "Answer of entry"
+
+
+def test_depth_is_longest_delegation_chain():
+    # b is delegated to by the entry agent and by a, so its runs always take deeper slots than a's
+    team = AgentTeam(
+        agents=[_agent("entry", "a", is_entry=True), _agent("a", "b"), _agent("b")],
+        delegates={"entry": ["a", "b"], "a": ["b"]},
+        max_concurrency=1,
+    )
+    entry_limits = {tool.name: tool.limiter for tool in team.entry.tools}
+    a_limits = {tool.name: tool.limiter for tool in team.entry._tool_index["a"].agent.tools}
+    assert entry_limits["b"] is a_limits["b"]
+    assert entry_limits["a"] is not entry_limits["b"]
+    execution = _run_with_timeout(lambda: team.execute("Task"))
+    assert execution.result.content == "Answer of entry"
+
+
+def test_delegation_cycle_is_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        AgentTeam(
+            agents=[_agent("entry", "a", is_entry=True), _agent("a", "entry")],
+            delegates={"entry": ["a"], "a": ["entry"]},
+        )
\ No newline at end of file
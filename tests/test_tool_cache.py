@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pydantic import PrivateAttr
+
+from compositeai.cache import MemoryCache
+from compositeai.tools import BaseTool
+
+
+class CountingTool(BaseTool):
+    """Tool counting how many times it really runs"""
+    name: str = "counting_tool"
+    description: str = "Look up a query"
+    latency: float = 0.0
+    calls: int = 0
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def func(self, query: str) -> str:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return self._result(query)
+
+    async def afunc(self, query: str) -> str:
+        with self._lock:
+            self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self._result(query)
+
+    def _result(self, query: str) -> str:
+        if query == "fail":
+            return f"Error using {self.name}: no results"
+        return f"Results for {query}"
+
+
+def test_concurrent_identical_calls_run_once():
+    tool = CountingTool(cache=MemoryCache(), latency=0.2)
+    with ThreadPoolExecutor(8) as executor:
+        runs = list(executor.map(lambda _: tool.invoke({"query": "acme"}), range(8)))
+    assert tool.calls == 1
+    assert [run.result for run in runs] == ["Results for acme"] * 8
+    assert sorted(run.cached for run in runs) == [False] + [True] * 7
+    stats = tool.cache.stats
+    assert (stats.hits, stats.misses, stats.shared) == (0, 8, 7)
+    assert stats.saved_seconds >= 7 * 0.2
+
+    # Later calls are served from the cache, other arguments run the tool again
+    assert tool.invoke({"query": "acme"}) == ("Results for acme", True)
+    assert tool.run(query="globex") == "Results for globex"
+    assert tool.calls == 2
+    assert (stats.hits, stats.misses, stats.shared) == (1, 9, 7)
+    assert stats.hit_rate == pytest.approx(0.1)
+
+
+def test_async_concurrent_identical_calls_run_once():
+    tool = CountingTool(cache=MemoryCache(), latency=0.2)
+
+    async def run():
+        return await asyncio.gather(*(tool.ainvoke({"query": "acme"}) for _ in range(8)))
+
+    runs = asyncio.run(run())
+    assert tool.calls == 1
+    assert sorted(run.cached for run in runs) == [False] + [True] * 7
+    assert tool.cache.stats.shared == 7
+    assert asyncio.run(tool.arun(query="acme")) == "Results for acme"
+    assert tool.calls == 1
+    assert tool.cache.stats.hits == 1
+
+
+def test_entries_expire_after_ttl():
+    tool = CountingTool(cache=MemoryCache(ttl=0.1))
+    assert tool.invoke({"query": "acme"}).cached is False
+    assert tool.invoke({"query": "acme"}).cached is True
+    time.sleep(0.15)
+    assert tool.invoke({"query": "acme"}).cached is False
+    assert tool.calls == 2
+
+
+def test_errors_not_cached():
+    tool = CountingTool(cache=MemoryCache())
+    assert tool.run(query="fail") == "Error using counting_tool: no results"
+    assert tool.invoke({"query": "fail"}).cached is False
+    assert tool.calls == 2
+    assert len(tool.cache) == 0
+
+
+def test_without_cache_every_call_runs():
+    tool = CountingTool(latency=0.05)
+    with ThreadPoolExecutor(4) as executor:
+        runs = list(executor.map(lambda _: tool.invoke({"query": "acme"}), range(4)))
+    assert tool.calls == 4
+    assert not any(run.cached for run in runs)
\ No newline at end of file
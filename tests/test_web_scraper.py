@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from compositeai.tools import HttpClient, WebScrapeTool
+
+
+def test_fetch_reads_at_most_max_bytes(http_server):
+    client = HttpClient()
+    fetched = client.fetch(f"{http_server}/file?type=text/plain&bytes=100000", max_bytes=1000)
+    assert fetched.content == b"x" * 1000
+    assert fetched.truncated
+    fetched = client.fetch(f"{http_server}/file?type=text/plain&bytes=1000", max_bytes=1000)
+    assert len(fetched.content) == 1000
+    assert not fetched.truncated
+
+
+def test_async_fetch_reads_at_most_max_bytes(http_server):
+    client = HttpClient()
+    fetched = asyncio.run(client.afetch(f"{http_server}/file?type=text/plain&bytes=100000", max_bytes=1000))
+    assert fetched.content == b"x" * 1000
+    assert fetched.truncated
+
+
+def test_fetch_skips_unwanted_content_types(http_server):
+    client = HttpClient()
+    url = f"{http_server}/file?type=application/pdf&bytes=100000"
+    for fetched in (client.fetch(url, 1000, ["text/html"]), asyncio.run(client.afetch(url, 1000, ["text/html"]))):
+        assert fetched.status_code == 200
+        assert fetched.content_type == "application/pdf"
+        assert fetched.content == b""
+        assert not fetched.truncated
+
+
+@pytest.mark.parametrize("run", ["sync", "async"])
+def test_scrape_notes_truncation(http_server, run):
+    tool = WebScrapeTool(http_client=HttpClient(), max_bytes=500)
+    url = f"{http_server}/file?type=text/plain&bytes=100000"
+    result = tool.func(url) if run == "sync" else asyncio.run(tool.afunc(url))
+    assert result == "x" * 500 + "\n\n[The website was cut off after 500 bytes.]"
+
+
+def test_scrape_rejects_unsupported_content_types(http_server):
+    tool = WebScrapeTool(http_client=HttpClient())
+    result = tool.func(f"{http_server}/file?type=application/pdf&bytes=1000")
+    assert result == "Website scrape failed: unsupported content type application/pdf"
+    result = tool.func(f"{http_server}/page?paragraphs=1&failures=1&status=404")
+    assert result == "Website scrape failed: status code 404"
+
+
+def test_scrape_pages(http_server):
+    tool = WebScrapeTool(http_client=HttpClient(), max_chars=2000)
+    url = f"{http_server}/page?paragraphs=100"
+    first = tool.func(url)
+    assert "[Showing page 1 of " in first
+    pages = int(first.rsplit(" of ", 1)[1].split(";")[0])
+    assert pages > 2
+    assert first.endswith("call scrape_website with page=2 for more.]")
+    assert len(first.split("\n\n[")[0]) == 2000
+
+    # The last page has the rest of the text and no note
+    last = tool.func(url, page=pages)
+    assert "[Showing page" not in last
+    assert 0 < len(last) <= 2000
+    assert tool.func(url, page=pages + 1) == f"Website scrape failed: page {pages + 1} does not exist, the content has {pages} page(s)"
+    assert tool.func(url, page=0) == f"Website scrape failed: page 0 does not exist, the content has {pages} page(s)"
\ No newline at end of file